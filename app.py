@@ -28,8 +28,11 @@ class MultaCvmStack(core.Stack):
         layer_arn = self._lambdalayer.lambda_layer.layer_version_arn
 
         config["config"]["views"]["api"]["authorizer_function"]["origin"]["layers"].append(layer_arn)
-        for function in config["config"]["views"]["api"]["resource_trees"]:
+        resource_trees = list(config["config"]["views"]["api"]["resource_trees"])
+        while resource_trees:
+            function = resource_trees.pop()
             function["handler"]["layers"].append(layer_arn)
+            resource_trees.extend(function.get("resource_trees", []))
 
         self._api = AwsApiGatewayLambdaPipes(
             self,
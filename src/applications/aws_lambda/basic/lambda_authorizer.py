@@ -1,4 +1,6 @@
 from components.authorizers.api_gateway.custom.generic import AwsIoTGenericAuthorizer
+from handlers.aws.clients import CLIENTS
+from handlers.logs import log_request, set_request_fields
 from handlers.utils import Logger
 
 # Import Project Logger
@@ -10,9 +12,7 @@ AUTHORIZER_CLASS = AwsIoTGenericAuthorizer
 
 
 def lambda_handler(event, context):
-    logger.info(event)
-    logger.info("Client token: " + event["authorizationToken"])
-    logger.info("Method ARN: " + event["methodArn"])
+    CLIENTS.set_account_id_from_context(context)
     """
     Validate the incoming token and produce the principal user 
     identifier associated with the token this could be accomplished 
@@ -21,12 +21,16 @@ def lambda_handler(event, context):
     2. Decode a JWT token inline
     3. Lookup in a self-managed DB
     """
-    authorization_handler = AUTHORIZER_CLASS(authorization_request_data=event)
-    authorization_response = authorization_handler.execute()
+    with log_request("authorizer", context):
+        set_request_fields(methodArn=event.get("methodArn"))
 
-    if authorization_response is False:
-        logger.error("Authorization process failed...")
-        raise Exception("Unauthorized")
+        authorization_handler = AUTHORIZER_CLASS(authorization_request_data=event)
+        authorization_response = authorization_handler.execute()
 
-    logger.info(authorization_response)
-    return authorization_response
+        if authorization_response is False:
+            logger.error("Authorization process failed...")
+            set_request_fields(effect=None)
+            raise Exception("Unauthorized")
+
+        set_request_fields(effect=authorization_response["policyDocument"]["Statement"][0]["Effect"])
+        return authorization_response
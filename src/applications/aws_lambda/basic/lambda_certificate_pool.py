@@ -0,0 +1,33 @@
+from handlers.aws.clients import CLIENTS
+from handlers.aws.iot import ThingHandler
+from handlers.certificates.pool import CertificatePool
+from handlers.logs import log_request, set_request_fields
+from handlers.utils import Logger
+from settings.app import CERTIFICATE_POOL_MAX_FILL, CERTIFICATE_POOL_TARGET_SIZE
+
+# Import Project Logger
+project_logger = Logger()
+logger = project_logger.get_logger()
+
+# Set the Certificate Pool Class handler from the import to keep Lambda Code generic.
+CERTIFICATE_POOL_CLASS = CertificatePool
+
+
+def lambda_handler(event, context):
+    """
+    Scheduled function that keeps the pre-provisioned certificate pool filled with INACTIVE certificates.
+    """
+    CLIENTS.set_account_id_from_context(context)
+
+    with log_request("certificate_pool", context):
+        certificate_pool = CERTIFICATE_POOL_CLASS(thing_handler=ThingHandler())
+        if not certificate_pool.enabled:
+            logger.error("Certificate pool table or encryption key is not configured...")
+            return {"created": 0}
+
+        created = certificate_pool.fill(
+            target_size=CERTIFICATE_POOL_TARGET_SIZE, max_certificates=CERTIFICATE_POOL_MAX_FILL
+        )
+        set_request_fields(created=created)
+
+        return {"created": created}
@@ -1,9 +1,13 @@
-import json
 import time
 import traceback
 
+from components.registrators.aws_iot.batch import AwsIoTBatchRegistrator
 from components.registrators.aws_iot.generic import AwsIoTGenericRegistrator
-from handlers.utils import Logger, base_response
+from handlers import codec
+from handlers.aws.clients import CLIENTS
+from handlers.logs import log_phase, log_request, set_request_fields
+from handlers.utils import Logger, base_response, get_authorized_credential, get_header
+from settings.app import IDEMPOTENCY_HEADER
 
 # Import Project Logger
 project_logger = Logger()
@@ -11,22 +15,41 @@ logger = project_logger.get_logger()
 
 # Set the Registration Class handler from the import to keep Lambda Code generic.
 REGISTRATION_CLASS = AwsIoTGenericRegistrator
+BATCH_REGISTRATION_CLASS = AwsIoTBatchRegistrator
+BATCH_RESOURCE_SUFFIX = "/batch"
 
 
 def lambda_handler(event, context):
-    logger.info(event)
+    CLIENTS.set_account_id_from_context(context)
+    with log_request("register", context):
+        http_method = event["httpMethod"]
+        resource = event.get("resource") or event.get("path") or ""
+        set_request_fields(httpMethod=http_method, resource=resource)
 
-    http_method = event["httpMethod"]
+        response = handle_request(http_method=http_method, resource=resource, event=event)
 
+        set_request_fields(statusCode=response["statusCode"])
+        return response
+
+
+def handle_request(http_method: str, resource: str, event: dict) -> dict:
     # Ping Pong method to validate API.
     if http_method == "GET":
         return base_response(status_code=200, dict_body={"response": True, "time": round(time.time())})
 
     elif http_method == "POST":
         try:
-            request_body = json.loads(event["body"])
+            with log_phase("parse"):
+                request_body = codec.loads(event["body"])
 
-            registration_handler = REGISTRATION_CLASS(device_request_data=request_body)
+            if resource.rstrip("/").endswith(BATCH_RESOURCE_SUFFIX):
+                registration_handler = BATCH_REGISTRATION_CLASS(device_request_data=request_body)
+            else:
+                registration_handler = REGISTRATION_CLASS(
+                    device_request_data=request_body,
+                    idempotency_key=get_header(event, IDEMPOTENCY_HEADER),
+                    credential=get_authorized_credential(event),
+                )
             registration_code, registration_response = registration_handler.execute()
 
             return base_response(status_code=registration_code, dict_body=registration_response)
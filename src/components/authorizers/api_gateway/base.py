@@ -1,4 +1,10 @@
-from handlers.aws import ConfigurationHandler
+import copy
+import hashlib
+
+from handlers.aws.configuration import ConfigurationHandler
+from handlers.cache import LruCache
+from handlers.logs import log_phase, set_request_fields
+from settings.app import AUTHORIZER_DECISION_CACHE_SIZE, AUTHORIZER_DECISION_CACHE_TTL
 from settings.aws import APP_CONFIG_PATH
 from handlers.utils import Logger
 
@@ -6,6 +12,11 @@ from handlers.utils import Logger
 logs_handler = Logger()
 logger = logs_handler.get_logger()
 
+DECISION_CACHE = LruCache(max_size=AUTHORIZER_DECISION_CACHE_SIZE, ttl=AUTHORIZER_DECISION_CACHE_TTL)
+"""
+Authorization policies of the warm container keyed by the hash of the token and method ARN.
+"""
+
 
 class BaseApiGwAuthorizer:
     class Meta:
@@ -22,29 +33,67 @@ class BaseApiGwAuthorizer:
 
     def __init__(self, authorization_request_data: dict, *args, **kwargs):
         self.configuration_handler = None
-        self.configuration_data = self.get_configuration()
+        self.configuration_data = None
 
         self.authorization_request_data = authorization_request_data
 
         self.valid_request_data = None
         self.valid_token_data = None
+        self.token_validation_handler = None
         self.token_authorization_handler = None
 
         self.authorization_result = None
+        self.decision_ttl = None
 
     def execute(self):
         """
-        Executes flow of device registration request authorization.
+        Executes flow of device registration request authorization. Policies are cached by token and method ARN, a
+        repeated request is answered from the cache without loading the configuration or running the flow. Authorizers
+        set decision_ttl to 0 when the token check did not complete, so a deny caused by a failing backend is not reused.
         :return: API Gateway Policy.
         """
-        self.validate_request()
-        self.validate_token()
+        decision_key = self.get_decision_key()
+        if decision_key is not None:
+            cached_policy = DECISION_CACHE.get(decision_key)
+            set_request_fields(decisionCacheHit=cached_policy is not None)
+            if cached_policy is not None:
+                return copy.deepcopy(cached_policy)
+
+        with log_phase("configuration"):
+            self.configuration_data = self.get_configuration()
+        if not self.configuration_data:
+            self.decision_ttl = 0
+
+        with log_phase("validate"):
+            self.validate_request()
+        with log_phase("token"):
+            self.validate_token()
+
+        with log_phase("authorize"):
+            self.authorize_token()
+
+        with log_phase("policy"):
+            authorization_policy = self.generate_policy()
+
+        if decision_key is not None and authorization_policy is not False:
+            ttl = DECISION_CACHE.ttl if self.decision_ttl is None else min(self.decision_ttl, DECISION_CACHE.ttl)
+            if ttl > 0:
+                DECISION_CACHE.put(decision_key, copy.deepcopy(authorization_policy), ttl=ttl)
 
-        self.authorize_token()
+        return authorization_policy
 
-        authorization_policy = self.generate_policy()
+    def get_decision_key(self):
+        """
+        Key of the authorization decision in the decision cache.
+        :return: SHA-256 digest of the token and method ARN, or None if the request can not be cached.
+        """
+        try:
+            token = self.authorization_request_data["authorizationToken"]
+            method_arn = self.authorization_request_data["methodArn"]
+        except (KeyError, TypeError):
+            return None
 
-        return authorization_policy
+        return hashlib.sha256(f"{token}\n{method_arn}".encode("utf-8")).digest()
 
     def validate_request(self, **kwargs):
         raise NotImplementedError
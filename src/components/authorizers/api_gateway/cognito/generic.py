@@ -0,0 +1,75 @@
+import time
+import traceback
+
+from components.authorizers.api_gateway.custom.generic import AwsIoTGenericAuthorizer
+from handlers.aws.policies import IamAuthPolicyHandler
+from handlers.authorization.cognito.tokens import CognitoTokenVerifier
+from handlers.authorization.schemas import RequestRegistrationAuthorizationSchema
+from handlers.exceptions import InvalidAccessToken, UnknownTokenKey
+from handlers.utils import Logger
+
+
+project_logger = Logger()
+logger = project_logger.get_logger()
+
+
+class AwsIoTCognitoAuthorizer(AwsIoTGenericAuthorizer):
+    """
+    Authorizer of Cognito User Pool tokens sent as "Authorization: Bearer ${TOKEN}". Tokens are verified in process
+    with the cached key set of the User Pool, the policy principal is the user subject. Denies of unknown key ids or
+    verification errors are not cached, the key set may be refreshing.
+    """
+
+    class Meta:
+        WORKERS = {
+            "request_validation_handler": RequestRegistrationAuthorizationSchema,
+            "token_validation_handler": None,
+            "token_authorization_handler": CognitoTokenVerifier,
+            "policy_handler": IamAuthPolicyHandler,
+        }
+
+    TOKEN_PREFIX = "Bearer"
+
+    def __init__(self, authorization_request_data):
+        self.token_claims = None
+        super(AwsIoTCognitoAuthorizer, self).__init__(authorization_request_data)
+
+    def validate_token(self):
+        split_payload = self.authorization_request_data.get("authorizationToken", "").split(" ")
+        if len(split_payload) != 2 or split_payload[0] != self.TOKEN_PREFIX or split_payload[1].count(".") != 2:
+            logger.error("Error validating the received token...")
+            self.valid_token_data = False
+        else:
+            self.valid_token_data = True
+
+        return self.valid_token_data
+
+    def authorize_token(self):
+        if self.valid_token_data is not True:
+            self.authorization_result = False
+            return
+
+        try:
+            self.token_claims = self.token_authorization_handler.verify(
+                self.authorization_request_data["authorizationToken"].split(" ")[1]
+            )
+        except UnknownTokenKey as error:
+            logger.error(f"Error authorizing received token... {error}")
+            self.authorization_result = False
+            self.decision_ttl = 0
+        except InvalidAccessToken as error:
+            logger.error(f"Error authorizing received token... {error}")
+            self.authorization_result = False
+        except Exception:
+            logger.error("Error verifying received token...")
+            logger.error(traceback.format_exc())
+            self.authorization_result = False
+            self.decision_ttl = 0
+        else:
+            self.authorization_result = True
+            self.decision_ttl = self.token_claims["exp"] - time.time()
+
+    def get_principal_id(self) -> str:
+        if self.token_claims is None:
+            return "unauthorized"
+        return self.token_claims["sub"]
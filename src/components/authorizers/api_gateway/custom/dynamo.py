@@ -0,0 +1,36 @@
+from components.authorizers.api_gateway.custom.generic import AwsIoTGenericAuthorizer
+from handlers.aws.policies import IamAuthPolicyHandler
+from handlers.authorization.dynamo.tokens import DynamoTokenAuthorizationHandler
+from handlers.authorization.schemas import (
+    RequestRegistrationAuthorizationSchema,
+    RequestRegistrationAuthorizationTokenSchema,
+)
+
+
+class AwsIoTDynamoAuthorizer(AwsIoTGenericAuthorizer):
+    """
+    Authorizer that validates device tokens against the DynamoDB tokens table instead of the SSM configuration.
+    """
+
+    class Meta:
+        WORKERS = {
+            "request_validation_handler": RequestRegistrationAuthorizationSchema,
+            "token_validation_handler": RequestRegistrationAuthorizationTokenSchema,
+            "token_authorization_handler": DynamoTokenAuthorizationHandler,
+            "policy_handler": IamAuthPolicyHandler,
+        }
+
+    def authorize_token(self):
+        """
+        Authorizes the token and caps the decision TTL at the remaining TTL of the cached token decision, so a revoked
+        token is denied once TOKEN_CACHE_TTL elapsed instead of after the authorizer decision TTL.
+        """
+        super(AwsIoTDynamoAuthorizer, self).authorize_token()
+        if self.decision_ttl is not None or self.token_authorization_handler is None:
+            return
+
+        try:
+            received_token = self.authorization_request_data["authorizationToken"].split(" ")[1]
+        except Exception:
+            return
+        self.decision_ttl = self.token_authorization_handler.remaining_ttl(received_token)
@@ -1,18 +1,37 @@
+import copy
 import traceback
 
 from components.authorizers.api_gateway.base import BaseApiGwAuthorizer
-from handlers.aws import IamAuthPolicyHandler
+from handlers.aws.policies import POLICY_DOCUMENT_CACHE, IamAuthPolicyHandler, get_policy_handler_pool
+from handlers.logs import add_token_prefix
 from handlers.utils import HttpVerb, Logger
+from handlers.authorization.tokens import get_token_store
 from handlers.authorization.schemas import (
     RequestRegistrationAuthorizationSchema,
     RequestRegistrationAuthorizationTokenSchema,
 )
+from handlers.authorization.validators import get_schema, get_validator
 
 
 project_logger = Logger()
 logger = project_logger.get_logger()
 
 
+_token_authorization_handlers = dict()
+
+
+def get_token_authorization_handler(handler_class):
+    """
+    Returns the process wide instance of the token authorization handler class, so its cache outlives the request.
+    :param handler_class: Token authorization handler class.
+    :return: Token authorization handler.
+    """
+    handler = _token_authorization_handlers.get(handler_class)
+    if handler is None:
+        handler = _token_authorization_handlers.setdefault(handler_class, handler_class())
+    return handler
+
+
 class AwsIoTGenericAuthorizer(BaseApiGwAuthorizer):
     class Meta:
         WORKERS = {
@@ -25,10 +44,14 @@ class AwsIoTGenericAuthorizer(BaseApiGwAuthorizer):
     def __init__(self, authorization_request_data):
         super(AwsIoTGenericAuthorizer, self).__init__(authorization_request_data)
 
-        self.request_validation_handler = self.Meta.WORKERS["request_validation_handler"]()
-        self.token_validation_handler = self.Meta.WORKERS["token_validation_handler"]()
-        # self.token_authorization_handler = self.Meta.WORKERS["token_authorization_handler"]()
-        self.policy_handler = self.Meta.WORKERS["policy_handler"]()
+        self.request_validation_handler = get_validator(self.Meta.WORKERS["request_validation_handler"])
+        if self.Meta.WORKERS["token_validation_handler"] is not None:
+            self.token_validation_handler = get_schema(self.Meta.WORKERS["token_validation_handler"])
+        if self.Meta.WORKERS["token_authorization_handler"] is not None:
+            self.token_authorization_handler = get_token_authorization_handler(
+                self.Meta.WORKERS["token_authorization_handler"]
+            )
+        self.policy_handler_pool = get_policy_handler_pool(self.Meta.WORKERS["policy_handler"])
 
     def validate_request(self):
         """
@@ -46,6 +69,7 @@ class AwsIoTGenericAuthorizer(BaseApiGwAuthorizer):
 
     def validate_token(self):
         try:
+            add_token_prefix(self.configuration_data["DEVICE_AUTHORIZER_TOKEN_IDENTIFIER"])
             self.token_validation_handler.authorization_token_valid(
                 self.authorization_request_data,
                 token_length=int(self.configuration_data["DEVICE_AUTHORIZER_TOKEN_PAYLOAD_LENGTH"]),
@@ -68,39 +92,67 @@ class AwsIoTGenericAuthorizer(BaseApiGwAuthorizer):
             return
 
         try:
-            if received_token in self.configuration_data["DEVICE_AUTHORIZER_VALID_TOKENS"]:
-                self.authorization_result = True
+            if self.token_authorization_handler is not None:
+                self.authorization_result = self.token_authorization_handler.authorize(received_token)
             else:
-                self.authorization_result = False
+                token_store = get_token_store(self.configuration_data)
+                self.authorization_result, limited = token_store.check(received_token)
+                if limited:
+                    self.decision_ttl = 0
         except Exception:
             logger.error("Error authorizing recieved token...")
+            logger.error(traceback.format_exc())
             self.authorization_result = False
+            # The token could not be checked, the deny must not be reused once the backend recovers.
+            self.decision_ttl = 0
+
+    def get_principal_id(self) -> str:
+        return "".join(self.authorization_request_data["authorizationToken"].split(" "))
 
     def generate_policy(self):
+        """
+        Generates the API Gateway policy of the authorization decision. Built policies are memoized by account, region,
+        API, stage, principal and decision, a repeated decision only deep copies the cached policy so callers can not
+        change it.
+        :return: API Gateway Policy.
+        """
         tmp = self.authorization_request_data["methodArn"].split(":")
         api_gateway_arn_tmp = tmp[5].split("/")
         aws_account_id = tmp[4]
-        principal_id = "".join(self.authorization_request_data["authorizationToken"].split(" "))
+        principal_id = self.get_principal_id()
+        authorized = (
+            self.valid_request_data is True and self.valid_token_data is True and self.authorization_result is True
+        )
 
-        self.policy_handler.populate(aws_account_id, principal_id)
+        cache_key = (aws_account_id, tmp[3], api_gateway_arn_tmp[0], api_gateway_arn_tmp[1], principal_id, authorized)
+        cached_policy = POLICY_DOCUMENT_CACHE.get(cache_key)
+        if cached_policy is not None:
+            return copy.deepcopy(cached_policy)
 
-        self.policy_handler.rest_api_id = api_gateway_arn_tmp[0]
-        self.policy_handler.region = tmp[3]
-        self.policy_handler.stage = api_gateway_arn_tmp[1]
+        policy_handler = self.policy_handler_pool.acquire()
+        try:
+            policy_handler.populate(aws_account_id, principal_id)
 
-        if self.valid_request_data is True and self.valid_token_data is True and self.authorization_result is True:
-            self.policy_handler.allow_method(HttpVerb.POST, "/register")
-        else:
-            logger.error(
-                f"Denying all methods due to a failure in authorization - {self.valid_request_data} - {self.valid_token_data} - {self.authorization_result}"
-            )
-            self.policy_handler.deny_all_methods()
+            policy_handler.rest_api_id = api_gateway_arn_tmp[0]
+            policy_handler.region = tmp[3]
+            policy_handler.stage = api_gateway_arn_tmp[1]
 
-        try:
-            generated_policy = self.policy_handler.build()
+            if authorized:
+                policy_handler.allow_method(HttpVerb.POST, "/register")
+                policy_handler.allow_method(HttpVerb.POST, "/register/batch")
+            else:
+                logger.error(
+                    f"Denying all methods due to a failure in authorization - {self.valid_request_data} - {self.valid_token_data} - {self.authorization_result}"
+                )
+                policy_handler.deny_all_methods()
+
+            generated_policy = policy_handler.build()
         except Exception:
             logger.error("Error building IAM policy...")
             logger.error(traceback.format_exc())
             return False
+        finally:
+            self.policy_handler_pool.release(policy_handler)
 
-        return generated_policy
+        POLICY_DOCUMENT_CACHE.put(cache_key, generated_policy)
+        return copy.deepcopy(generated_policy)
@@ -0,0 +1,217 @@
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from components.registrators.aws_iot.generic import AwsIoTGenericRegistrator
+from handlers.authorization.schemas import RequestAwsIoTBatchThingSchema
+from handlers.exceptions import ThingNotExists
+from handlers.utils import Logger
+from settings.app import REGISTRATION_BATCH_MAX_SIZE, REGISTRATION_BATCH_MAX_WORKERS
+
+
+project_logger = Logger()
+logger = project_logger.get_logger()
+
+
+class AwsIoTBatchRegistrator(AwsIoTGenericRegistrator):
+    """
+    Registers several agents in a single request. The configuration, Thing Type and policy are resolved once for the
+    whole batch and the AWS IoT calls of every agent are executed concurrently. Every agent gets its own result, a
+    failing agent does not fail the rest of the batch. The batch is authorized by the request credentials, agents do
+    not carry their own account token.
+    """
+
+    class Meta:
+        WORKERS = dict(AwsIoTGenericRegistrator.Meta.WORKERS, request_validation_handler=RequestAwsIoTBatchThingSchema)
+
+    def __init__(self, device_request_data):
+        super(AwsIoTBatchRegistrator, self).__init__(device_request_data)
+
+        self.results = list()
+        self.certificate_requests = dict()
+        self.root_ca = None
+
+    def validate_request(self) -> bool:
+        """
+        Validates every agent of the HTTP batch request in a single pass. Invalid agents get an error result and are
+        left out of the registration.
+        :return: Boolean with result of the request validation process, True if at least one agent is valid.
+        """
+        devices = self.device_request_data.get("devices") if isinstance(self.device_request_data, dict) else None
+        if not isinstance(devices, list) or not 0 < len(devices) <= REGISTRATION_BATCH_MAX_SIZE:
+            logger.error(f"Batch registration requires between 1 and {REGISTRATION_BATCH_MAX_SIZE} devices...")
+            self.error = f"Batch registration requires between 1 and {REGISTRATION_BATCH_MAX_SIZE} devices"
+            self.valid_request_data = False
+            return self.valid_request_data
+
+        validation_errors = self.request_validation_handler.validate(devices, many=True)
+
+        self.results = [None] * len(devices)
+        self.device_registration_data["devices"] = list()
+        thing_names = set()
+        for index, device in enumerate(devices):
+            if index in validation_errors:
+                self.results[index] = self.device_error(device=device, error="Invalid device payload")
+            elif device["thingName"] in thing_names:
+                self.results[index] = self.device_error(device=device, error="Duplicated thing name in batch")
+            else:
+                thing_names.add(device["thingName"])
+                self.certificate_requests[device["thingName"]] = device.get("csr")
+                self.device_registration_data["devices"].append((index, device))
+
+        self.valid_request_data = len(self.device_registration_data["devices"]) > 0
+        return self.valid_request_data
+
+    def begin_registration(self):
+        """
+        Batch registrations are not idempotent, agents of a batch that already exist get an error result.
+        """
+        return None
+
+    def transform_request(self) -> bool:
+        """
+        Enriches every valid agent with the Thing Type and attributes, resolved once for the batch, and validates the
+        enrichment in a single pass.
+        :return: Boolean with result of the registration data validation process, True if at least one agent is valid.
+        """
+        if not self.valid_request_data:
+            self.valid_registration_data = False
+            return self.valid_registration_data
+
+        thing_type = self.get_thing_type()
+        creation_date = str(round(time.time()))
+
+        pending = self.device_registration_data["devices"]
+        registrations = [
+            {
+                "thingName": device["thingName"],
+                "thingTypeName": thing_type,
+                "thingAttributes": {"creationDate": creation_date, "version": device["version"]},
+            }
+            for _, device in pending
+        ]
+
+        validation_errors = self.registration_validation_handler.validate(registrations, many=True)
+
+        self.device_registration_data["thingTypeName"] = thing_type
+        self.device_registration_data["devices"] = list()
+        for position, ((index, device), registration) in enumerate(zip(pending, registrations)):
+            if position in validation_errors:
+                self.results[index] = self.device_error(device=device, error="Invalid device registration data")
+            else:
+                self.device_registration_data["devices"].append((index, registration))
+
+        self.valid_registration_data = len(self.device_registration_data["devices"]) > 0
+        return self.valid_registration_data
+
+    def register(self) -> bool:
+        """
+        Registers every valid agent into AWS IoT. The policy is validated once and the agents are registered
+        concurrently, each one following the same steps as a single registration.
+        :return: Status of the registration process, True if at least one agent was registered.
+        """
+        pending = self.device_registration_data.get("devices")
+        if not self.valid_request_data or not self.valid_registration_data or not pending:
+            self.registration_result = False
+            self.error = self.error or "No valid devices in batch registration request"
+            self.code = 400
+
+            return False
+
+        thing_type = self.device_registration_data["thingTypeName"]
+        policy = self.get_policy(thing_type=thing_type)
+        defined_attributes = self.get_defined_attributes(thing_type=thing_type)
+
+        logger.info("Starting batch registration of %d things in AWS IoT", len(pending))
+        try:
+            self.thing_handler.get_preconfigured_policy(policy_name=policy)
+        except (Exception, RuntimeError):
+            logger.error("Error getting the AWS IoT policy of the batch")
+            logger.error(traceback.format_exc())
+            for index, registration in pending:
+                self.results[index] = self.device_error(
+                    device=registration, error="Error registering thing agent in AWS IoT"
+                )
+            self.registration_result = False
+            self.code = 400
+
+            return False
+
+        def register_device(registration: dict) -> dict:
+            thing_attributes = {
+                attribute: value
+                for attribute, value in registration["thingAttributes"].items()
+                if attribute in defined_attributes
+            }
+            return self.register_device(registration=registration, thing_attributes=thing_attributes, policy=policy)
+
+        with ThreadPoolExecutor(max_workers=min(REGISTRATION_BATCH_MAX_WORKERS, len(pending))) as executor:
+            device_results = executor.map(register_device, [registration for _, registration in pending])
+            for (index, _), device_result in zip(pending, device_results):
+                self.results[index] = device_result
+
+        registered = sum(1 for result in self.results if result["status"] is True)
+        if registered > 0:
+            self.root_ca = self.get_root_ca()
+
+        if registered == len(self.results):
+            self.code = 200
+        elif registered > 0:
+            self.code = 207
+        else:
+            self.code = 400
+
+        self.registration_result = registered > 0
+        return self.registration_result
+
+    def register_device(self, registration: dict, thing_attributes: dict, policy: str) -> dict:
+        """
+        Registers a single agent of the batch. Validation occurs in case that the AWS IoT Thing already exists by name.
+        :return: Result of the agent registration.
+        """
+        thing_name = registration["thingName"]
+        try:
+            self.thing_handler.describe_thing_(thing_name=thing_name)
+
+        except ThingNotExists:
+            try:
+                results = self.provision_device(
+                    thing_name=thing_name,
+                    thing_type=registration["thingTypeName"],
+                    thing_attributes=thing_attributes,
+                    policy=policy,
+                    csr=self.certificate_requests.get(thing_name),
+                )
+                certificate_data, _ = results["certificate"]
+            except (Exception, RuntimeError):
+                logger.error(f"Error registering thing agent {thing_name} in AWS IoT")
+                logger.error(traceback.format_exc())
+                return self.device_error(device=registration, error="Error registering thing agent in AWS IoT")
+
+            return {"thingName": thing_name, "status": True, "certificateData": certificate_data}
+
+        except (Exception, RuntimeError):
+            logger.error(f"Uncaught exception registering {thing_name}...")
+            return self.device_error(device=registration, error="Uncaught exception... Exiting...")
+
+        else:
+            logger.error(f"Thing {thing_name} exists in the AWS IoT Account...")
+            return self.device_error(device=registration, error="Thing exists in the AWS IoT Account, exiting...")
+
+    @staticmethod
+    def device_error(device, error: str) -> dict:
+        thing_name = device.get("thingName") if isinstance(device, dict) else None
+        return {"thingName": thing_name, "status": False, "error": error}
+
+    def generate_response(self) -> tuple:
+        """
+        Generates the response that will contain the HTTP Response CODE and the HTTP Response Body. The body contains
+        the result of every agent in the same order as the request and the root CA once for the whole batch.
+        :return: HTTP Response Code; HTTP Response Body.
+        """
+        if self.registration_result is False and not any(self.results):
+            response = {"status": self.registration_result, "error": self.error}
+        else:
+            response = {"results": self.results, "rootCa": self.root_ca}
+
+        return self.code, response
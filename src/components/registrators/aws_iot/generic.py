@@ -2,10 +2,16 @@ import time
 import traceback
 
 from components.registrators.base import BaseRegistrator
-from handlers.aws import ThingHandler
-from handlers.exceptions import ThingNotExists
+from handlers.aws.iot import ThingHandler
+from handlers.certificates.pool import CertificatePool
+from handlers.exceptions import IdempotencyRecordError, RegistrationInProgress, StepExecutionError, ThingNotExists
+from handlers.executors import Step, StepGraphExecutor
+from handlers.idempotency import IdempotencyHandler
+from handlers.logs import set_request_fields
 from handlers.utils import Logger
 from handlers.authorization.schemas import RegisterAwsIoTThingSchema, RequestAwsIoTThingSchema
+from handlers.authorization.validators import get_validator
+from settings.app import CERTIFICATE_ISSUANCE_MODE
 
 
 project_logger = Logger()
@@ -18,14 +24,21 @@ class AwsIoTGenericRegistrator(BaseRegistrator):
             "request_validation_handler": RequestAwsIoTThingSchema,
             "registration_validation_handler": RegisterAwsIoTThingSchema,
             "thing_handler": ThingHandler,
+            "certificate_pool_handler": CertificatePool,
+            "idempotency_handler": IdempotencyHandler,
         }
 
-    def __init__(self, device_request_data):
-        super(AwsIoTGenericRegistrator, self).__init__(device_request_data)
+    def __init__(self, device_request_data, idempotency_key: str = None, credential: str = None):
+        super(AwsIoTGenericRegistrator, self).__init__(
+            device_request_data, idempotency_key=idempotency_key, credential=credential
+        )
 
-        self.request_validation_handler = self.Meta.WORKERS["request_validation_handler"]()
-        self.registration_validation_handler = self.Meta.WORKERS["registration_validation_handler"]()
+        self.request_validation_handler = get_validator(self.Meta.WORKERS["request_validation_handler"])
+        self.registration_validation_handler = get_validator(self.Meta.WORKERS["registration_validation_handler"])
         self.thing_handler = self.Meta.WORKERS["thing_handler"]()
+        self.certificate_pool_handler = self.Meta.WORKERS["certificate_pool_handler"](thing_handler=self.thing_handler)
+        self.idempotency_handler = self.Meta.WORKERS["idempotency_handler"]()
+        self.registration_key = None
 
     def validate_request(self) -> bool:
         """
@@ -85,19 +98,20 @@ class AwsIoTGenericRegistrator(BaseRegistrator):
 
             logger.info("Thing does not exist, preceding to registration!")
             try:
-                self.thing_handler.get_preconfigured_policy(policy_name=policy)
-                certificate_data, certificate_arn = self.thing_handler.provision_thing()
-                self.thing_handler.attach_policy_(policy_name=policy, certificate_arn=certificate_arn)
-                self.thing_handler.create_thing_(
-                    thing_name=thing_name, thing_type=thing_type, thing_attributes=thing_attributes,
-                )
-                self.thing_handler.attach_thing_principal_(thing_name=thing_name, certificate_arn=certificate_arn)
-                root_ca = self.thing_handler.get_root_ca(
-                    preferred_endpoint=self.configuration_data["AWS_ROOT_CA"]["PREFERRED"],
-                    backup_endpoint=self.configuration_data["AWS_ROOT_CA"]["BACKUP"],
+                results = self.provision_device(
+                    thing_name=thing_name,
+                    thing_type=thing_type,
+                    thing_attributes=thing_attributes,
+                    policy=policy,
+                    csr=self.device_request_data.get("csr"),
+                    steps=[
+                        Step("policy", lambda _: self.thing_handler.get_preconfigured_policy(policy_name=policy)),
+                        Step("root_ca", lambda _: self.get_root_ca()),
+                    ],
                 )
+                certificate_data, _ = results["certificate"]
 
-                self.registration_result = dict(certificate_data=certificate_data, root_ca=root_ca)
+                self.registration_result = dict(certificate_data=certificate_data, root_ca=results["root_ca"])
                 self.code = 200
 
                 return True
@@ -105,6 +119,7 @@ class AwsIoTGenericRegistrator(BaseRegistrator):
             except (Exception, RuntimeError):
                 logger.error("Error registering thing agent in AWS IoT")
                 logger.error(traceback.format_exc())
+                self.registration_result = False
                 self.error = "Error registering thing agent in AWS IoT"
                 self.code = 400
 
@@ -126,6 +141,136 @@ class AwsIoTGenericRegistrator(BaseRegistrator):
 
             return False
 
+    def begin_registration(self):
+        """
+        Reserves the idempotency key of the registration, derived from the thing name, the credential checked by the
+        authorizer and the idempotency key header. A retry of a completed registration gets its stored response back
+        without any AWS IoT call, a retry while it runs or whose response can not be replayed gets a 409. Idempotency
+        is skipped for requests without credential or if its store fails.
+        :return: Tuple of HTTP code and response body to return without registering, or None to register.
+        """
+        if not self.valid_request_data:
+            return None
+        if not self.credential:
+            logger.warning("Request without authorized credential, registering without idempotency...")
+            return None
+
+        registration_key = self.idempotency_handler.get_key(
+            thing_name=self.device_request_data["thingName"],
+            credential=self.credential,
+            idempotency_key=self.idempotency_key,
+        )
+        try:
+            replayed_response = self.idempotency_handler.begin(registration_key)
+        except RegistrationInProgress:
+            logger.warning("Registration with the same idempotency key in progress...")
+            return 409, {"status": False, "error": "Registration in progress, retry later"}
+        except IdempotencyRecordError:
+            logger.error("Completed registration with the same idempotency key can not be replayed...")
+            return 409, {"status": False, "error": "Registration already completed, its response can not be replayed"}
+        except Exception:
+            logger.error("Unable to check registration idempotency, registering...")
+            logger.error(traceback.format_exc())
+            return None
+
+        if replayed_response is not None:
+            logger.info("Replaying completed registration...")
+            set_request_fields(idempotentReplay=True)
+            return replayed_response
+
+        self.registration_key = registration_key
+        return None
+
+    def end_registration(self, code: int = None, response: dict = None):
+        """
+        Stores the response of a successful registration for its retries, otherwise releases the idempotency key so
+        the agent can retry.
+        """
+        registration_key, self.registration_key = self.registration_key, None
+        if registration_key is None:
+            return
+
+        try:
+            if code == 200:
+                self.idempotency_handler.complete(registration_key, code=code, response=response)
+            else:
+                self.idempotency_handler.release(registration_key)
+        except Exception:
+            logger.error("Unable to store registration idempotency record...")
+            logger.error(traceback.format_exc())
+
+    def provision_device(
+        self, thing_name: str, thing_type: str, thing_attributes: dict, policy: str, csr: str = None, steps: list = ()
+    ) -> dict:
+        """
+        Executes the AWS IoT calls that register a single agent as a dependency graph: the certificate and the AWS IoT
+        Thing are created concurrently, then the policy is attached to the certificate and the certificate to the
+        Thing. Additional independent steps run alongside. Every completed AWS IoT call is recorded in a provisioning
+        saga and if any step fails the created resources are rolled back.
+        :return: Results of the executed steps by name, "certificate" holds the certificate data and ARN.
+        """
+        thing_handler = self.thing_handler
+        saga = thing_handler.start_saga(thing_name=thing_name)
+        registration_steps = [
+            *steps,
+            Step("certificate", lambda _: self.provision_certificate(thing_name=thing_name, csr=csr, saga=saga)),
+            Step(
+                "attach_policy",
+                lambda results: thing_handler.attach_policy_(
+                    policy_name=policy, certificate_arn=results["certificate"][1], saga=saga
+                ),
+                depends_on=("certificate",),
+            ),
+            Step(
+                "thing",
+                lambda _: thing_handler.create_thing_(
+                    thing_name=thing_name, thing_type=thing_type, thing_attributes=thing_attributes, saga=saga
+                ),
+            ),
+            Step(
+                "attach_principal",
+                lambda results: thing_handler.attach_thing_principal_(
+                    thing_name=thing_name, certificate_arn=results["certificate"][1], saga=saga
+                ),
+                depends_on=("certificate", "thing"),
+            ),
+        ]
+
+        try:
+            return StepGraphExecutor(steps=registration_steps).execute()
+        except StepExecutionError:
+            saga.rollback()
+            raise
+
+    def provision_certificate(self, thing_name: str, csr: str = None, saga=None) -> tuple:
+        """
+        Gets the agent certificate. If the agent sent a certificate signing request the certificate is issued for it,
+        by AWS IoT or by the local CA depending on the issuance mode, and no private key is returned. Otherwise it is
+        claimed from the pre-provisioned certificate pool when enabled and not empty, or created in AWS IoT with a new
+        key pair.
+        :return: Certificate data; Certificate ARN.
+        """
+        if csr:
+            if CERTIFICATE_ISSUANCE_MODE == "local_ca":
+                from handlers.certificates.local_ca import get_local_ca
+
+                certificate_pem = get_local_ca().sign(csr_pem=csr, thing_name=thing_name)
+                return self.thing_handler.register_certificate_without_ca_(certificate_pem=certificate_pem, saga=saga)
+
+            return self.thing_handler.provision_thing_from_csr(csr=csr, saga=saga)
+
+        certificate = self.certificate_pool_handler.claim(saga=saga)
+        if certificate is not None:
+            return certificate
+
+        return self.thing_handler.provision_thing(saga=saga)
+
+    def get_root_ca(self):
+        return self.thing_handler.get_root_ca(
+            preferred_endpoint=self.configuration_data["AWS_ROOT_CA"]["PREFERRED"],
+            backup_endpoint=self.configuration_data["AWS_ROOT_CA"]["BACKUP"],
+        )
+
     def get_thing_type(self) -> str:
         """
         Rule that will return the thing type that the registration process will assign.
@@ -1,4 +1,5 @@
-from handlers.aws import ConfigurationHandler
+from handlers.aws.configuration import ConfigurationHandler
+from handlers.logs import log_phase
 from settings.aws import APP_CONFIG_PATH
 
 
@@ -8,13 +9,22 @@ class BaseRegistrator:
         Define the Worker Classes for the base steps in the registration process.
         """
 
-        WORKERS = {"request_validation_handler": None, "registration_validation_handler": None, "thing_handler": None}
+        WORKERS = {
+            "request_validation_handler": None,
+            "registration_validation_handler": None,
+            "thing_handler": None,
+            "certificate_pool_handler": None,
+            "idempotency_handler": None,
+        }
 
-    def __init__(self, device_request_data: dict, **kwargs):
+    def __init__(self, device_request_data: dict, idempotency_key: str = None, credential: str = None, **kwargs):
         self.configuration_handler = None
-        self.configuration_data = self.get_configuration()
+        with log_phase("configuration"):
+            self.configuration_data = self.get_configuration()
 
         self.device_request_data = device_request_data
+        self.idempotency_key = idempotency_key
+        self.credential = credential
         self.device_registration_data = dict()
         self.valid_request_data = None
         self.valid_registration_data = None
@@ -28,12 +38,26 @@ class BaseRegistrator:
         :return: Registration Code (HTTP Code) that will be used in response; Response dictionary that will be returned
         to the agent executing the registration request.
         """
-        self.validate_request()
-        self.transform_request()
+        with log_phase("validate"):
+            self.validate_request()
 
-        self.register()
+        with log_phase("idempotency"):
+            replayed_response = self.begin_registration()
+        if replayed_response is not None:
+            return replayed_response
 
-        registration_code, registration_response = self.generate_response()
+        registration_code, registration_response = None, None
+        try:
+            with log_phase("transform"):
+                self.transform_request()
+
+            with log_phase("register"):
+                self.register()
+
+            with log_phase("generate_response"):
+                registration_code, registration_response = self.generate_response()
+        finally:
+            self.end_registration(code=registration_code, response=registration_response)
 
         return registration_code, registration_response
 
@@ -46,6 +70,20 @@ class BaseRegistrator:
     def register(self, **kwargs):
         raise NotImplementedError
 
+    def begin_registration(self):
+        """
+        Called once the request is validated, before any registration step. Registrators supporting idempotency
+        return the response of a completed registration with the same idempotency key here.
+        :return: Tuple of HTTP code and response body to return without registering, or None to register.
+        """
+        return None
+
+    def end_registration(self, code: int = None, response: dict = None):
+        """
+        Called once the registration finished, with no code if it raised.
+        """
+        pass
+
     def generate_response(self) -> tuple:
         """
         Generates the response that will contain the HTTP Response CODE and the HTTP Response Body.
@@ -0,0 +1,209 @@
+import base64
+import json
+import threading
+import time
+import traceback
+
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import padding, rsa
+except ImportError:
+    rsa = None
+
+from handlers.exceptions import InvalidAccessToken, UnknownTokenKey
+from handlers.utils import Logger
+from settings.app import COGNITO_JWKS_REFRESH_INTERVAL, COGNITO_TOKEN_LEEWAY, COGNITO_TOKEN_USE
+from settings.aws import COGNITO_JWKS_BUNDLED_PATH, COGNITO_JWKS_TIMEOUT, USER_POOL_APP_CLIENT_ID, USER_POOL_ID
+
+
+project_logger = Logger()
+logger = project_logger.get_logger()
+
+
+def base64url_decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def get_user_pool_issuer(user_pool_id: str) -> str:
+    if not user_pool_id:
+        raise RuntimeError("The Cognito User Pool id is not defined")
+    region = user_pool_id.split("_")[0]
+    return f"https://cognito-idp.{region}.amazonaws.com/{user_pool_id}"
+
+
+class JwksCache:
+    """
+    Public keys of the JSON Web Key Set of an issuer, parsed once and indexed by key id. The key set is read from the
+    bundled file or downloaded on the first lookup, afterwards it is refreshed in a background thread when older than
+    the refresh interval or when an unknown key id is received, lookups never wait for a refresh. Requires the
+    optional cryptography package.
+    """
+
+    def __init__(
+        self,
+        jwks_url: str,
+        bundled_path: str = COGNITO_JWKS_BUNDLED_PATH,
+        refresh_interval: float = COGNITO_JWKS_REFRESH_INTERVAL,
+        timeout: float = COGNITO_JWKS_TIMEOUT,
+    ):
+        """
+        :param jwks_url: URL of the JSON Web Key Set.
+        :param bundled_path: Optional path of the JSON Web Key Set shipped with the package.
+        :param refresh_interval: Seconds after which the key set is refreshed in background.
+        :param timeout: Seconds used as connect and read timeout of the HTTP requests.
+        """
+        if rsa is None:
+            raise RuntimeError("The cryptography package is required to verify JSON Web Tokens")
+
+        self.jwks_url = jwks_url
+        self.bundled_path = bundled_path
+        self.refresh_interval = refresh_interval
+        self.timeout = timeout
+        self._keys = None
+        self._loaded_at = 0
+        self._refreshing = False
+        self._session = None
+        self._lock = threading.Lock()
+
+    def get_key(self, kid: str):
+        """
+        :param kid: Key id of the token header.
+        :return: RSA public key or None if the key id is unknown.
+        """
+        if self._keys is None:
+            with self._lock:
+                if self._keys is None:
+                    self.load_initial()
+
+        key = self._keys.get(kid)
+        if key is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+            self.refresh_in_background()
+
+        return key
+
+    def load(self, jwks: dict):
+        """
+        Parses the keys of the key set and swaps them in.
+        :param jwks: JSON Web Key Set document.
+        """
+        keys = dict()
+        for jwk in jwks.get("keys", []):
+            if jwk.get("kty") != "RSA" or jwk.get("use", "sig") != "sig":
+                continue
+            public_numbers = rsa.RSAPublicNumbers(
+                e=int.from_bytes(base64url_decode(jwk["e"]), "big"),
+                n=int.from_bytes(base64url_decode(jwk["n"]), "big"),
+            )
+            keys[jwk["kid"]] = public_numbers.public_key(default_backend())
+
+        self._keys = keys
+        self._loaded_at = time.monotonic()
+
+    def load_initial(self):
+        if self.bundled_path:
+            try:
+                with open(self.bundled_path, "r") as jwks_file:
+                    return self.load(json.load(jwks_file))
+            except (OSError, ValueError):
+                logger.error(f"Unable to read bundled JSON Web Key Set from {self.bundled_path}")
+        self.refresh()
+
+    def refresh(self):
+        try:
+            if self._session is None:
+                import requests
+
+                self._session = requests.Session()
+            response = self._session.get(self.jwks_url, timeout=self.timeout)
+            response.raise_for_status()
+            self.load(response.json())
+        except Exception:
+            logger.error(f"Unable to refresh JSON Web Key Set from {self.jwks_url}")
+            logger.error(traceback.format_exc())
+            if self._keys is None:
+                self._keys = dict()
+            self._loaded_at = time.monotonic()
+
+    def refresh_in_background(self):
+        with self._lock:
+            if self._refreshing or time.monotonic() - self._loaded_at < 1:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="jwks-refresh", daemon=True).start()
+
+
+class CognitoTokenVerifier:
+    """
+    Verifies Cognito User Pool tokens locally: RS256 signature with the cached key set, expiration, issuer, token use
+    and app client. No call to Cognito is done per token.
+    """
+
+    def __init__(
+        self,
+        user_pool_id: str = USER_POOL_ID,
+        app_client_id: str = USER_POOL_APP_CLIENT_ID,
+        token_use: str = COGNITO_TOKEN_USE,
+        leeway: float = COGNITO_TOKEN_LEEWAY,
+        jwks_cache: JwksCache = None,
+    ):
+        self.issuer = get_user_pool_issuer(user_pool_id)
+        self.app_client_id = app_client_id
+        self.token_use = token_use
+        self.leeway = leeway
+        self.jwks_cache = jwks_cache or JwksCache(jwks_url=f"{self.issuer}/.well-known/jwks.json")
+
+    def verify(self, token: str) -> dict:
+        """
+        :param token: Encoded JSON Web Token.
+        :return: Verified claims of the token.
+        """
+        try:
+            encoded_header, encoded_claims, encoded_signature = token.split(".")
+            header = json.loads(base64url_decode(encoded_header))
+            claims = json.loads(base64url_decode(encoded_claims))
+            signature = base64url_decode(encoded_signature)
+        except Exception:
+            raise InvalidAccessToken("Malformed token")
+
+        if not isinstance(header, dict) or not isinstance(claims, dict):
+            raise InvalidAccessToken("Malformed token")
+        if header.get("alg") != "RS256":
+            raise InvalidAccessToken("Unsupported token algorithm")
+        if not isinstance(header.get("kid"), str):
+            raise InvalidAccessToken("Malformed token key id")
+
+        public_key = self.jwks_cache.get_key(header["kid"])
+        if public_key is None:
+            raise UnknownTokenKey("Unknown token key id")
+
+        try:
+            public_key.verify(
+                signature, f"{encoded_header}.{encoded_claims}".encode("ascii"), padding.PKCS1v15(), hashes.SHA256()
+            )
+        except InvalidSignature:
+            raise InvalidAccessToken("Invalid token signature")
+
+        self.verify_claims(claims)
+        return claims
+
+    def verify_claims(self, claims: dict):
+        now = time.time()
+        if not isinstance(claims.get("exp"), (int, float)) or claims["exp"] + self.leeway < now:
+            raise InvalidAccessToken("Expired token")
+        if claims.get("iss") != self.issuer:
+            raise InvalidAccessToken("Invalid token issuer")
+        if claims.get("token_use") != self.token_use:
+            raise InvalidAccessToken("Invalid token use")
+
+        client_id = claims.get("client_id") if self.token_use == "access" else claims.get("aud")
+        if self.app_client_id and client_id != self.app_client_id:
+            raise InvalidAccessToken("Invalid token app client")
@@ -0,0 +1,170 @@
+import hashlib
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+from botocore.exceptions import ClientError
+
+from handlers.aws.clients import CLIENTS
+from handlers.cache import LruCache
+from handlers.utils import Logger
+from settings.app import TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL, TOKEN_NEGATIVE_CACHE_TTL
+from settings.aws import DEVICE_TOKENS_TABLE
+
+
+project_logger = Logger()
+logger = project_logger.get_logger()
+
+
+class DynamoTokenAuthorizationHandler:
+    """
+    Authorizes device tokens stored in a DynamoDB table. The table partition key is tokenHash (String), the
+    hexadecimal SHA-256 digest of the token, so plain tokens are never stored. Optional attributes are revoked
+    (Boolean) and expiresAt (Number, epoch seconds). Revoking a token is an update of its item.
+
+    Decisions are kept in an in process LRU cache, unknown tokens are cached too for a shorter time so repeated
+    invalid tokens do not reach DynamoDB. Tokens are read with BatchGetItem: a cache miss also revalidates the
+    tokens whose cached decision expired, in the same request.
+    """
+
+    BATCH_SIZE = 100
+    BATCH_MAX_ATTEMPTS = 3
+
+    def __init__(
+        self,
+        table_name: str = DEVICE_TOKENS_TABLE,
+        cache: LruCache = None,
+        negative_ttl: float = TOKEN_NEGATIVE_CACHE_TTL,
+        dynamodb_client=None,
+    ):
+        self.table_name = table_name
+        self.cache = cache or LruCache(max_size=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+        self.negative_ttl = negative_ttl
+        self.dynamodb_client = dynamodb_client or CLIENTS.client("dynamodb")
+        self._expirations = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def token_key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def authorize(self, token: str) -> bool:
+        """
+        Returns the cached decision of the token or loads it from DynamoDB.
+        :param token: Received device token.
+        :return: Authorization result.
+        """
+        key = self.token_key(token)
+        decision = self.cache.get(key)
+        if decision is not None:
+            return decision
+
+        decisions = self.load([key, *self.stale_keys(limit=self.BATCH_SIZE - 1, exclude=key)])
+        if key not in decisions:
+            raise RuntimeError("Unable to read token from DynamoDB")
+
+        return decisions[key]
+
+    def remaining_ttl(self, token: str):
+        """
+        Seconds until the cached decision of the token expires, callers must not keep the decision for longer.
+        :param token: Received device token.
+        :return: Remaining seconds, or None if the decision is not cached with an expiration.
+        """
+        with self._lock:
+            expires_at = self._expirations.get(self.token_key(token))
+        return None if expires_at is None else max(expires_at - time.monotonic(), 0)
+
+    def warm_up(self, tokens: list) -> dict:
+        """
+        Loads the decisions of the tokens into the cache with batched reads.
+        :param tokens: Device tokens.
+        :return: Decisions by token hash.
+        """
+        return self.load([self.token_key(token) for token in tokens])
+
+    def stale_keys(self, limit: int, exclude: str = None) -> list:
+        """
+        Token hashes that were cached and whose decision expired, most recently used first.
+        """
+        now = time.monotonic()
+        with self._lock:
+            stale = [
+                key for key, expires_at in reversed(self._expirations.items()) if expires_at <= now and key != exclude
+            ]
+        return stale[:limit]
+
+    def load(self, keys: list) -> dict:
+        """
+        Reads the token items with BatchGetItem, in chunks of 100 keys and retrying unprocessed keys, and caches the
+        decisions. Keys that could not be read are not cached.
+        :param keys: Token hashes.
+        :return: Decisions by token hash.
+        """
+        keys = list(dict.fromkeys(keys))
+        decisions = dict()
+        for start in range(0, len(keys), self.BATCH_SIZE):
+            chunk = keys[start : start + self.BATCH_SIZE]
+            items = self.batch_get_items(chunk)
+            if items is None:
+                continue
+
+            for key in chunk:
+                if key in items:
+                    decisions[key] = self.cache_decision(key, items[key])
+
+        return decisions
+
+    def batch_get_items(self, keys: list):
+        """
+        :return: Items by token hash, a missing token is stored as None. None if the batch could not be read.
+        """
+        request_items = {self.table_name: {"Keys": [{"tokenHash": {"S": key}} for key in keys]}}
+        items = {key: None for key in keys}
+        for attempt in range(self.BATCH_MAX_ATTEMPTS):
+            try:
+                response = self.dynamodb_client.batch_get_item(RequestItems=request_items)
+            except ClientError:
+                logger.error("Boto3 error... Unable to read device tokens!")
+                logger.error(traceback.format_exc())
+                return None
+
+            for item in response.get("Responses", {}).get(self.table_name, []):
+                items[item["tokenHash"]["S"]] = item
+
+            request_items = response.get("UnprocessedKeys")
+            if not request_items:
+                return items
+            time.sleep(0.05 * 2 ** attempt)
+
+        for key in request_items[self.table_name]["Keys"]:
+            items.pop(key["tokenHash"]["S"], None)
+        return items
+
+    def cache_decision(self, key: str, item: dict) -> bool:
+        """
+        Evaluates the token item and caches the decision, a valid token is never cached beyond its expiration.
+        :return: Authorization decision.
+        """
+        now = time.time()
+        expires_at = float(item["expiresAt"]["N"]) if item is not None and "expiresAt" in item else None
+        decision = (
+            item is not None
+            and item.get("revoked", {}).get("BOOL", False) is False
+            and (expires_at is None or expires_at > now)
+        )
+
+        ttl = self.cache.ttl if decision else self.negative_ttl
+        if decision and expires_at is not None:
+            ttl = expires_at - now if ttl is None else min(ttl, expires_at - now)
+
+        self.cache.put(key, decision, ttl=ttl)
+        if ttl is not None:
+            with self._lock:
+                self._expirations[key] = time.monotonic() + ttl
+                self._expirations.move_to_end(key)
+                while len(self._expirations) > self.cache.max_size:
+                    self._expirations.popitem(last=False)
+
+        return decision
@@ -23,6 +23,13 @@ class RequestAwsIoTThingSchema(Schema):
     thing_name = fields.Str(required=True, data_key="thingName")
     account_token = fields.Str(required=True, data_key="accountToken")
     version = fields.Str(required=True, data_key="version")
+    csr = fields.Str(required=False, data_key="csr")
+
+
+class RequestAwsIoTBatchThingSchema(Schema):
+    thing_name = fields.Str(required=True, data_key="thingName")
+    version = fields.Str(required=True, data_key="version")
+    csr = fields.Str(required=False, data_key="csr")
 
 
 class RegisterAwsIoTThingSchema(Schema):
@@ -0,0 +1,107 @@
+import hashlib
+import os
+import threading
+import time
+
+from handlers.utils import Logger
+
+
+project_logger = Logger()
+logger = project_logger.get_logger()
+
+
+class HashedTokenStore:
+    """
+    Set of device tokens kept as SHA-256 digests salted with a random salt of the container. Tokens are hashed once when
+    the configuration is loaded, a lookup hashes the received token once and finds its digest in a set so the cost does
+    not depend on the number of tokens. Plain tokens are not kept in memory and, the salt being secret, the lookup time
+    tells nothing about the stored tokens.
+
+    Tokens are defined as strings, or as objects with optional limits:
+    {"token": "...", "expiresAt": <epoch seconds>, "quota": <authorizations per container>}.
+    Quotas are counted in memory, every warm container enforces its own quota.
+    """
+
+    def __init__(self, tokens: list, salt: bytes = None):
+        self.salt = salt or os.urandom(16)
+        self._digests = set()
+        self._limits = dict()
+        self._lock = threading.Lock()
+
+        for token in tokens:
+            if isinstance(token, dict):
+                digest = self.digest(token["token"])
+                expires_at, quota = token.get("expiresAt"), token.get("quota")
+                if expires_at is not None or quota is not None:
+                    self._limits[digest] = [expires_at, quota]
+            else:
+                digest = self.digest(token)
+            self._digests.add(digest)
+
+    def __len__(self):
+        return len(self._digests)
+
+    def digest(self, token: str) -> bytes:
+        return hashlib.sha256(self.salt + token.encode("utf-8")).digest()
+
+    def authorize(self, token: str) -> bool:
+        """
+        :param token: Received device token.
+        :return: Authorization result.
+        """
+        authorized, _ = self.check(token)
+        return authorized
+
+    def check(self, token: str) -> tuple:
+        """
+        Checks that the token is defined, not expired and with remaining quota. A successful authorization consumes
+        one use of the token quota.
+        :param token: Received device token.
+        :return: Authorization result; True if the token has an expiration or a quota, its decisions must not be reused.
+        """
+        digest = self.digest(token)
+        if digest not in self._digests:
+            return False, False
+
+        limits = self._limits.get(digest)
+        if limits is None:
+            return True, False
+
+        with self._lock:
+            expires_at, quota = limits
+            if expires_at is not None and time.time() >= float(expires_at):
+                logger.error("Received token is expired...")
+                return False, True
+            if quota is not None:
+                if quota <= 0:
+                    logger.error("Received token quota is exhausted...")
+                    return False, True
+                limits[1] = quota - 1
+
+        return True, True
+
+
+_token_store_lock = threading.Lock()
+_token_store = (None, None)
+
+
+def get_token_store(configuration_data: dict) -> HashedTokenStore:
+    """
+    Returns the token store of the configuration. The store is built once per configuration object, the cached
+    configuration is the same object until its SSM parameter version changes.
+    :param configuration_data: Configuration data dictionary.
+    :return: Hashed token store.
+    """
+    global _token_store
+
+    configuration, token_store = _token_store
+    if configuration is configuration_data:
+        return token_store
+
+    with _token_store_lock:
+        configuration, token_store = _token_store
+        if configuration is not configuration_data:
+            token_store = HashedTokenStore(tokens=configuration_data["DEVICE_AUTHORIZER_VALID_TOKENS"])
+            _token_store = (configuration_data, token_store)
+
+    return token_store
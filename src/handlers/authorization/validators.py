@@ -0,0 +1,79 @@
+import functools
+
+from marshmallow import fields
+
+
+class PrecompiledValidator:
+    """
+    Validator of flat payloads compiled once from a marshmallow schema. Payloads with the required keys, no unknown
+    keys and values of the field types are accepted without running marshmallow, anything else is validated by the
+    schema so the reported errors are the marshmallow ones. The schema is only instantiated on the first error.
+    Schemas declaring field validators or hooks (validates, validates_schema, pre_load...) are always validated by
+    marshmallow.
+    """
+
+    FIELD_TYPES = {fields.String: str, fields.Dict: dict}
+
+    def __init__(self, schema_class):
+        self.schema_class = schema_class
+        self._schema = None
+
+        self.types = dict()
+        self.required = set()
+        self.compiled = not any(schema_class._hooks.values())
+        for name, field in schema_class._declared_fields.items():
+            key = field.data_key or name
+            self.types[key] = self.FIELD_TYPES.get(type(field))
+            if field.required:
+                self.required.add(key)
+            if field.validators:
+                self.compiled = False
+
+    @property
+    def schema(self):
+        if self._schema is None:
+            self._schema = get_schema(self.schema_class)
+        return self._schema
+
+    def is_valid(self, data) -> bool:
+        if not self.compiled or not isinstance(data, dict) or len(data) > len(self.types):
+            return False
+
+        required = len(self.required)
+        for key, value in data.items():
+            expected_type = self.types.get(key)
+            if expected_type is None or type(value) is not expected_type:
+                return False
+            if key in self.required:
+                required -= 1
+
+        return required == 0
+
+    def validate(self, data, many: bool = False) -> dict:
+        """
+        Same contract as marshmallow Schema.validate.
+        :return: Dictionary of validation errors, empty if the payload is valid.
+        """
+        if many:
+            if isinstance(data, list) and all(self.is_valid(item) for item in data):
+                return {}
+        elif self.is_valid(data):
+            return {}
+
+        return self.schema.validate(data, many=many)
+
+
+@functools.lru_cache(maxsize=None)
+def get_schema(schema_class):
+    """
+    :return: Process wide instance of the schema class.
+    """
+    return schema_class()
+
+
+@functools.lru_cache(maxsize=None)
+def get_validator(schema_class) -> PrecompiledValidator:
+    """
+    :return: Process wide precompiled validator of the schema class.
+    """
+    return PrecompiledValidator(schema_class)
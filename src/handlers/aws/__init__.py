@@ -0,0 +1,46 @@
+"""
+AWS handlers, split by service so every Lambda function only imports the modules it uses. Names are re-exported
+lazily: "from handlers.aws import ThingHandler" imports handlers.aws.iot on first access only.
+"""
+import importlib
+
+
+_EXPORTS = {
+    "ClientRegistry": "clients",
+    "CLIENTS": "clients",
+    "Session": "clients",
+    "Sts": "clients",
+    "get_method_arn": "policies",
+    "get_policy_handler_pool": "policies",
+    "IamAuthPolicyHandler": "policies",
+    "POLICY_DOCUMENT_CACHE": "policies",
+    "PolicyHandlerPool": "policies",
+    "PolicyMethod": "policies",
+    "CONFIGURATION_CACHE": "configuration",
+    "ConfigurationCache": "configuration",
+    "ConfigurationHandler": "configuration",
+    "ROOT_CA_CACHE": "root_ca",
+    "RootCaCache": "root_ca",
+    "ProvisioningSaga": "iot",
+    "THING_TYPE_INDEX": "iot",
+    "ThingHandler": "iot",
+    "ThingPolicyHandlers": "iot",
+    "ThingTypeIndex": "iot",
+    "CognitoHandler": "cognito",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(f"{__name__}.{module_name}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return __all__
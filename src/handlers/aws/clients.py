@@ -0,0 +1,175 @@
+import threading
+
+from settings.aws import (
+    AWS_ACCOUNT_ID,
+    BOTO_CONNECT_TIMEOUT,
+    BOTO_MAX_ATTEMPTS,
+    BOTO_MAX_POOL_CONNECTIONS,
+    BOTO_READ_TIMEOUT,
+)
+
+
+SERVICE_CLIENT_CONFIGS = {"iot": dict(retries={"total_max_attempts": 1, "mode": "standard"})}
+"""
+botocore Config overrides by service. AWS IoT calls are retried by handlers.aws.throttling, botocore retries are
+disabled so a throttled call is not repeated on top of the rate limiter.
+"""
+
+
+class ClientRegistry:
+    """
+    Process wide registry of the boto3 session and clients. Clients are created lazily on first use and reused by
+    every handler and across warm Lambda invocations, sharing one tuned connection pool per service.
+    """
+
+    def __init__(self, client_config=None, service_client_configs: dict = None):
+        self._client_config = client_config
+        self._service_client_configs = (
+            SERVICE_CLIENT_CONFIGS if service_client_configs is None else service_client_configs
+        )
+        self._session = None
+        self._region = None
+        self._clients = dict()
+        self._account_id = AWS_ACCOUNT_ID
+        self._lock = threading.RLock()
+
+    @property
+    def client_config(self):
+        """
+        botocore Config shared by the clients, botocore is imported on first use.
+        """
+        if self._client_config is None:
+            from botocore.config import Config
+
+            self._client_config = Config(
+                max_pool_connections=BOTO_MAX_POOL_CONNECTIONS,
+                connect_timeout=BOTO_CONNECT_TIMEOUT,
+                read_timeout=BOTO_READ_TIMEOUT,
+                retries={"max_attempts": BOTO_MAX_ATTEMPTS, "mode": "standard"},
+            )
+        return self._client_config
+
+    def client_config_for(self, service_name: str):
+        """
+        :param service_name: boto3 service name.
+        :return: Shared botocore Config merged with the overrides of the service.
+        """
+        overrides = self._service_client_configs.get(service_name)
+        if not overrides:
+            return self.client_config
+
+        from botocore.config import Config
+
+        return self.client_config.merge(Config(**overrides))
+
+    @property
+    def session(self):
+        """
+        boto3 session, boto3 is imported on first use so functions that do not call AWS never pay its import.
+        """
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import boto3
+
+                    self._session = boto3.session.Session()
+        return self._session
+
+    @property
+    def region(self) -> str:
+        return self._region or self.session.region_name
+
+    def client(self, service_name: str):
+        """
+        Returns the shared boto3 client of the service, creating it on first use.
+        :param service_name: boto3 service name, like "iot" or "ssm".
+        :return: boto3 client.
+        """
+        client = self._clients.get(service_name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(service_name)
+                if client is None:
+                    client = self.session.client(service_name, config=self.client_config_for(service_name))
+                    self._clients[service_name] = client
+        return client
+
+    @property
+    def account_id(self) -> str:
+        """
+        AWS account id, taken from the environment or the Lambda context when available, otherwise obtained once
+        from STS and kept for the life of the process.
+        :return: AWS account id.
+        """
+        if self._account_id is None:
+            with self._lock:
+                if self._account_id is None:
+                    self._account_id = self.client("sts").get_caller_identity()["Account"]
+        return self._account_id
+
+    def set_account_id_from_context(self, context):
+        """
+        Takes the AWS account id from the invoked function ARN of the Lambda context, avoiding the STS call.
+        :param context: Lambda context object.
+        """
+        if self._account_id is not None:
+            return
+
+        function_arn = getattr(context, "invoked_function_arn", None)
+        if isinstance(function_arn, str) and function_arn.count(":") >= 4:
+            self._account_id = function_arn.split(":")[4]
+
+    def inject(self, clients: dict, region: str = None, account_id: str = None):
+        """
+        Replaces the clients of the services, like the in memory fakes of tests.fakes. Handlers created
+        afterwards use the injected clients until the registry is reset.
+        :param clients: Client objects by boto3 service name.
+        :param region: AWS region reported by the registry.
+        :param account_id: AWS account id reported by the registry.
+        """
+        with self._lock:
+            self._clients.update(clients)
+            if region is not None:
+                self._region = region
+            if account_id is not None:
+                self._account_id = account_id
+
+    def reset(self):
+        """
+        Drops the session, clients, region and account id, next use creates them again.
+        """
+        with self._lock:
+            self._session = None
+            self._region = None
+            self._clients.clear()
+            self._account_id = AWS_ACCOUNT_ID
+
+
+CLIENTS = ClientRegistry()
+
+
+class Session:
+    def __init__(self):
+        self._user_session = CLIENTS.session
+        self.user_region = CLIENTS.region
+
+
+class Sts(Session):
+    def __init__(self):
+        Session.__init__(self)
+        self._account_id = None
+
+    @property
+    def _account_client(self):
+        return CLIENTS.client("sts")
+
+    @property
+    def account_id(self) -> str:
+        """
+        AWS account id, computed on first access and memoized so constructing a handler never calls STS. The
+        AWS_ACCOUNT_ID environment variable overrides the lookup.
+        :return: AWS account id.
+        """
+        if self._account_id is None:
+            self._account_id = CLIENTS.account_id
+        return self._account_id
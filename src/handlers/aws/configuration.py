@@ -0,0 +1,123 @@
+import threading
+import time
+import traceback
+
+from handlers import codec
+from handlers.aws.clients import CLIENTS, Sts
+from handlers.exceptions import ConfigurationNotFound
+from handlers.utils import Logger
+from settings.aws import APP_CONFIG_CACHE_RETRY_INTERVAL, APP_CONFIG_CACHE_TTL
+
+
+project_logger = Logger()
+logger = project_logger.get_logger()
+
+
+class ConfigurationCache:
+    """
+    Process wide cache of the application configuration loaded from SSM Parameter Store. Lives at module level so warm
+    Lambda containers serve the configuration from memory, only going back to SSM once the TTL expires.
+    """
+
+    def __init__(self, ttl: int = APP_CONFIG_CACHE_TTL, retry_interval: int = APP_CONFIG_CACHE_RETRY_INTERVAL):
+        """
+        :param ttl: Seconds that a loaded configuration is served before SSM is queried again.
+        :param retry_interval: Seconds that a stale configuration is served after a failed refresh before retrying.
+        """
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self._entries = dict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, loader) -> dict:
+        """
+        Returns the configuration stored under the SSM path. On a miss the loader is called and it must return the
+        parameter version and its raw JSON value. If the version did not change since the last load the cached
+        configuration is kept and the JSON is not parsed again. If the refresh fails and a previous configuration
+        exists, the stale configuration is served and the refresh is retried after the retry interval.
+        :param path: SSM Parameter Store path of the configuration.
+        :param loader: Callable returning a tuple of (version, raw_value).
+        :return: Configuration data dictionary.
+        """
+        with self._lock:
+            entry = self._entries.get(path)
+            now = time.monotonic()
+            if entry is not None and now < entry["expires_at"]:
+                self.hits += 1
+                return entry["configuration"]
+
+            self.misses += 1
+            try:
+                version, raw_value = loader()
+            except Exception:
+                if entry is None:
+                    raise
+                logger.warning(f"Unable to refresh configuration from {path}, serving stale configuration...")
+                logger.warning(traceback.format_exc())
+                self.stale_hits += 1
+                entry["expires_at"] = now + self.retry_interval
+                return entry["configuration"]
+
+            if entry is not None and entry["version"] == version:
+                configuration = entry["configuration"]
+            else:
+                configuration = codec.loads(raw_value)
+
+            self._entries[path] = dict(configuration=configuration, version=version, expires_at=now + self.ttl)
+            return configuration
+
+    def invalidate(self, path: str = None):
+        """
+        Drops the cached configuration for the path, or every cached configuration if no path is passed.
+        :param path: SSM Parameter Store path of the configuration.
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+    def stats(self) -> dict:
+        return dict(hits=self.hits, misses=self.misses, stale_hits=self.stale_hits)
+
+
+CONFIGURATION_CACHE = ConfigurationCache()
+
+
+class ConfigurationHandler(Sts):
+    """
+    Handles the boto3 calss for SSM configuration.
+    """
+
+    def __init__(self, path: str, cache: ConfigurationCache = CONFIGURATION_CACHE):
+        Sts.__init__(self)
+        self.ssm_client = CLIENTS.client("ssm")
+        self.path = path
+        self.cache = cache
+        self.configuration = None
+
+    def get_config(self):
+        try:
+            self.configuration = self.cache.get(path=self.path, loader=self.load_parameter)
+        except Exception:
+            logger.error("Encountered an error loading config from SSM.")
+            logger.error(traceback.format_exc())
+        finally:
+            logger.debug("Configuration cache stats: %s", self.cache.stats())
+            return self.configuration
+
+    def load_parameter(self) -> tuple:
+        """
+        Gets the configuration parameter stored under the handler path from SSM Parameter Store.
+        :return: Parameter version; Parameter raw JSON value.
+        """
+        parameter_details = self.ssm_client.get_parameters_by_path(Path=self.path, Recursive=False)
+        parameters = parameter_details.get("Parameters")
+        if not parameters:
+            raise ConfigurationNotFound(f"No configuration parameters found in {self.path}")
+
+        parameter = parameters[-1]
+        return parameter.get("Version"), parameter.get("Value")
@@ -0,0 +1,609 @@
+import bisect
+import collections
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from handlers.aws.clients import CLIENTS, Sts
+from handlers.aws.root_ca import ROOT_CA_CACHE
+from handlers.aws.throttling import IOT_RATE_LIMITER
+from handlers.exceptions import IoTBotoError, PolicyDetachError, QueryError, ThingNotExists
+from handlers.metrics import SPANS, emit_metric
+from handlers.utils import Logger
+from settings.aws import THING_TYPE_INDEX_TTL
+from settings.app import ROLLBACK_MAX_ATTEMPTS, ROLLBACK_RETRY_DELAY, SEARCH_INDEX_PAGE_SIZE
+
+project_logger = Logger()
+logger = project_logger.get_logger()
+
+
+ThingTypeSnapshot = collections.namedtuple(
+    "ThingTypeSnapshot", ("names", "sorted_keys", "sorted_names", "contains_results")
+)
+
+
+class ThingTypeIndex:
+    """
+    Process wide index of the AWS IoT Thing Types of the account, keyed on lower-cased names. Built listing the catalog
+    with the maximum page size and refreshed in a background thread once the TTL expires, the previous index keeps
+    answering queries while the refresh runs. Every build publishes a new immutable snapshot with a single assignment,
+    readers take one reference to it so a query never mixes two builds.
+    """
+
+    PAGE_SIZE = 250
+
+    def __init__(self, ttl: int = THING_TYPE_INDEX_TTL):
+        self.ttl = ttl
+        self._snapshot = None
+        self._expires_at = 0.0
+        self._refresh_thread = None
+        self._lock = threading.Lock()
+
+    def refresh(self, iot_client, force: bool = False):
+        """
+        Makes sure that the index can be queried. The first build is synchronous, later refreshes run in a background
+        thread while the current index is served.
+        :param iot_client: boto3 AWS IoT client.
+        :param force: Rebuilds the index synchronously even if the TTL did not expire.
+        """
+        if not force and self._snapshot is not None and time.monotonic() < self._expires_at:
+            return
+
+        if force or self._snapshot is None:
+            with self._lock:
+                if force or self._snapshot is None:
+                    self.build(iot_client=iot_client)
+            return
+
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(
+                target=self._background_build, kwargs=dict(iot_client=iot_client), daemon=True
+            )
+            self._refresh_thread.start()
+
+    def _background_build(self, iot_client):
+        try:
+            self.build(iot_client=iot_client)
+        except Exception:
+            logger.error("Unable to refresh thing type index, serving previous index...")
+            logger.error(traceback.format_exc())
+            self._expires_at = time.monotonic() + self.ttl
+
+    def build(self, iot_client):
+        """
+        Lists every Thing Type of the account and swaps the index.
+        :param iot_client: boto3 AWS IoT client.
+        """
+        names = list()
+        kwargs = dict(maxResults=self.PAGE_SIZE)
+        try:
+            while True:
+                response = IOT_RATE_LIMITER.call("list_thing_types", iot_client.list_thing_types, **kwargs)
+                names.extend(thing_type["thingTypeName"] for thing_type in response["thingTypes"])
+                next_token = response.get("nextToken")
+                if not next_token:
+                    break
+                kwargs["nextToken"] = next_token
+
+        except ClientError:
+            logger.error("Boto3 error... Unable to list thing types!")
+            logger.error(traceback.format_exc())
+            raise IoTBotoError
+
+        self.load(names)
+
+    def load(self, names: list):
+        """
+        Replaces the indexed Thing Type names.
+        :param names: Thing Type names in catalog order.
+        """
+        entries = tuple((name.lower(), name) for name in names)
+        sorted_entries = sorted(entries)
+        self._snapshot = ThingTypeSnapshot(
+            names=entries,
+            sorted_keys=tuple(key for key, _ in sorted_entries),
+            sorted_names=tuple(name for _, name in sorted_entries),
+            contains_results=dict(),
+        )
+        self._expires_at = time.monotonic() + self.ttl
+        logger.info("Thing type index built with %d thing types", len(entries))
+
+    def prefix(self, prefix: str) -> list:
+        """
+        Returns the Thing Type names starting with the prefix, case insensitive, sorted by name.
+        :param prefix: Thing Type name prefix.
+        :return: List of Thing Type names.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return list()
+
+        key = prefix.lower()
+        start = bisect.bisect_left(snapshot.sorted_keys, key)
+        end = bisect.bisect_right(snapshot.sorted_keys, key + "\U0010ffff", lo=start)
+        return list(snapshot.sorted_names[start:end])
+
+    def contains(self, partial_name: str) -> list:
+        """
+        Returns the Thing Type names containing the partial name, case insensitive, in catalog order. Results are
+        memoized in the snapshot they were computed from.
+        :param partial_name: Partial Thing Type name.
+        :return: List of Thing Type names.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return list()
+
+        key = partial_name.lower()
+        results = snapshot.contains_results.get(key)
+        if results is None:
+            results = tuple(name for lower_name, name in snapshot.names if key in lower_name)
+            snapshot.contains_results[key] = results
+        return list(results)
+
+
+THING_TYPE_INDEX = ThingTypeIndex()
+
+
+class ProvisioningSaga:
+    """
+    Records the AWS IoT resources created while registering an agent, so a failed registration can undo them in
+    reverse order instead of leaving orphaned active certificates, policy attachments or Things behind.
+    """
+
+    def __init__(self, thing_name: str = None, max_attempts: int = ROLLBACK_MAX_ATTEMPTS):
+        self.thing_name = thing_name
+        self.max_attempts = max_attempts
+        self.steps = list()
+        self._lock = threading.Lock()
+
+    def record(self, name: str, compensation, **kwargs):
+        """
+        Records a completed step and the call that undoes it.
+        :param name: Name of the completed step.
+        :param compensation: Callable that undoes the step.
+        :param kwargs: Arguments of the compensation callable.
+        """
+        with self._lock:
+            self.steps.append((name, compensation, kwargs))
+
+    def rollback(self) -> bool:
+        """
+        Undoes the recorded steps in reverse order, every compensation is retried with exponential backoff. Emits a
+        rollback metric with the result.
+        :return: True if every step was undone.
+        """
+        with self._lock:
+            steps = list(reversed(self.steps))
+            self.steps = list()
+
+        if not steps:
+            return True
+
+        logger.warning(f"Rolling back {len(steps)} provisioning steps of thing {self.thing_name}...")
+        failed_steps = [
+            name for name, compensation, kwargs in steps if not self._compensate(name, compensation, kwargs)
+        ]
+
+        emit_metric("ProvisioningRollback", dimensions={"Result": "Failed" if failed_steps else "Completed"})
+        if failed_steps:
+            logger.error(f"Unable to roll back steps {failed_steps} of thing {self.thing_name}")
+            return False
+
+        return True
+
+    def _compensate(self, name: str, compensation, kwargs: dict) -> bool:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                compensation(**kwargs)
+            except (Exception, RuntimeError):
+                logger.warning(f"Compensation of step {name} failed, attempt {attempt} of {self.max_attempts}")
+                if attempt < self.max_attempts:
+                    time.sleep(ROLLBACK_RETRY_DELAY * 2 ** (attempt - 1))
+            else:
+                return True
+
+        return False
+
+
+class ThingHandler(Sts):
+    """
+    Handles the boto3 calls for thing management. Includes Things, Thing Types, Policies, Certificates and Thing
+    Indexing.
+    """
+
+    def __init__(self, thing_type_index: ThingTypeIndex = THING_TYPE_INDEX, rate_limiter=IOT_RATE_LIMITER):
+        Sts.__init__(self)
+        self.iot_client = CLIENTS.client("iot")
+        self.thing_type_index = thing_type_index
+        self.rate_limiter = rate_limiter
+
+    def _call(self, operation: str, **kwargs):
+        """
+        Calls the AWS IoT client operation inside a span named after it, through the rate limiter that waits for the
+        API rate and retries throttled calls.
+        :param operation: boto3 AWS IoT client method name.
+        :return: Operation response.
+        """
+        with SPANS.span(f"iot.{operation}"):
+            return self.rate_limiter.call(operation, getattr(self.iot_client, operation), **kwargs)
+
+    def activate_certificate_(self, certificate_arn: str):
+        logger.info("Activating certificate...")
+        try:
+            self._call("update_certificate", certificateId=certificate_arn.split("/")[-1], newStatus="ACTIVE")
+
+        except ClientError:
+            logger.error("Boto3 error... Unable to activate certificate!")
+            logger.error(traceback.format_exc())
+            raise IoTBotoError
+
+        except Exception:
+            logger.error("Unexpected error...")
+            logger.error(traceback.format_exc())
+            raise RuntimeError
+
+    def attach_policy_(self, policy_name: str, certificate_arn: str, saga: ProvisioningSaga = None):
+        logger.info("Attaching IoT policy...")
+        try:
+            response = self._call("attach_policy", policyName=policy_name, target=certificate_arn)
+
+        except ClientError:
+            logger.error("Boto3 error... Unable to attach policy!")
+            logger.error(traceback.format_exc())
+            raise IoTBotoError
+
+        except Exception:
+            logger.error("Unexpected error...")
+            logger.error(traceback.format_exc())
+            raise RuntimeError
+
+        if saga is not None:
+            saga.record("attach_policy", self.detach_policy_, policy_name=policy_name, certificate_arn=certificate_arn)
+
+    def attach_thing_principal_(self, thing_name: str, certificate_arn: str, saga: ProvisioningSaga = None):
+        logger.info("Attaching IoT thing principal...")
+        try:
+            response = self._call("attach_thing_principal", thingName=thing_name, principal=certificate_arn)
+
+        except ClientError:
+            logger.error("Boto3 error... Unable to attach thing to its principal!")
+            logger.error(traceback.format_exc())
+            raise IoTBotoError
+
+        except Exception:
+            logger.error("Unexpected error...")
+            logger.error(traceback.format_exc())
+            raise RuntimeError
+
+        if saga is not None:
+            saga.record(
+                "attach_thing_principal",
+                self.detach_thing_principal_,
+                thing_name=thing_name,
+                certificate_arn=certificate_arn,
+            )
+
+    def create_thing_(self, thing_name: str, thing_type: str, thing_attributes: dict, saga: ProvisioningSaga = None):
+        logger.info("Creating thing...")
+        try:
+            response = self._call(
+                "create_thing",
+                thingName=thing_name,
+                thingTypeName=thing_type,
+                attributePayload={"attributes": thing_attributes},
+            )
+
+        except ClientError:
+            logger.error("Boto3 error... Unable to create thing!")
+            logger.error(traceback.format_exc())
+            raise IoTBotoError
+
+        except Exception:
+            logger.error("Unexpected error...")
+            logger.error(traceback.format_exc())
+            raise RuntimeError
+
+        if saga is not None:
+            saga.record("create_thing", self.delete_thing_, thing_name=thing_name)
+
+    def delete_certificate_(self, certificate_arn: str):
+        logger.info("Deactivating and deleting certificate...")
+        certificate_id = certificate_arn.split("/")[-1]
+        try:
+            self._call("update_certificate", certificateId=certificate_id, newStatus="INACTIVE")
+            self._call("delete_certificate", certificateId=certificate_id, forceDelete=True)
+
+        except ClientError:
+            logger.error("Boto3 error... Unable to delete certificate!")
+            logger.error(traceback.format_exc())
+            raise IoTBotoError
+
+        except Exception:
+            logger.error("Unexpected error...")
+            logger.error(traceback.format_exc())
+            raise RuntimeError
+
+    def delete_thing_(self, thing_name: str):
+        logger.info("Deleting thing...")
+        try:
+            self._call("delete_thing", thingName=thing_name)
+
+        except ClientError:
+            logger.error("Boto3 error... Unable to delete thing!")
+            logger.error(traceback.format_exc())
+            raise IoTBotoError
+
+        except Exception:
+            logger.error("Unexpected error...")
+            logger.error(traceback.format_exc())
+            raise RuntimeError
+
+    def describe_thing_(self, thing_name: str) -> dict:
+        logger.info("Describing thing...")
+        try:
+            response = self._call("describe_thing", thingName=thing_name)
+            thing_data = {
+                "thing_arn": response["thingArn"],
+                "thing_name": response["thingName"],
+                "thing_type_name": response["thingTypeName"],
+                "attributes": response["attributes"],
+                "version": response["version"],
+            }
+
+        except ClientError:
+            logger.error("Boto3 error... Probably thing does not exist!")
+            raise ThingNotExists
+
+        except Exception:
+            logger.error("Unexpected error...")
+            logger.error(traceback.format_exc())
+            raise RuntimeError
+
+        else:
+            return thing_data
+
+    def detach_policy_(self, policy_name: str, certificate_arn: str):
+        logger.info("Detaching IoT policy...")
+        try:
+            self._call("detach_policy", policyName=policy_name, target=certificate_arn)
+
+        except ClientError:
+            logger.error("Boto3 error... Unable to detach policy!")
+            logger.error(traceback.format_exc())
+            raise PolicyDetachError
+
+        except Exception:
+            logger.error("Unexpected error...")
+            logger.error(traceback.format_exc())
+            raise RuntimeError
+
+    def detach_thing_principal_(self, thing_name: str, certificate_arn: str):
+        logger.info("Detaching IoT thing principal...")
+        try:
+            self._call("detach_thing_principal", thingName=thing_name, principal=certificate_arn)
+
+        except ClientError:
+            logger.error("Boto3 error... Unable to detach thing from its principal!")
+            logger.error(traceback.format_exc())
+            raise IoTBotoError
+
+        except Exception:
+            logger.error("Unexpected error...")
+            logger.error(traceback.format_exc())
+            raise RuntimeError
+
+    def start_saga(self, thing_name: str = None) -> ProvisioningSaga:
+        """
+        Starts recording the resources created for an agent registration, pass it to the provisioning calls and
+        call its rollback method if the registration fails.
+        :param thing_name: Name of the AWS IoT Thing being registered.
+        :return: Provisioning saga.
+        """
+        return ProvisioningSaga(thing_name=thing_name)
+
+    def get_preconfigured_policy(self, policy_name: str) -> dict:
+        logger.info("Getting preconfigured policy...")
+        try:
+            response = self._call("get_policy", policyName=policy_name)["policyArn"]
+
+        except ClientError:
+            logger.error(traceback.format_exc())
+            raise IoTBotoError
+
+        except Exception:
+            logger.error("Unexpected error...")
+            logger.error(traceback.format_exc())
+            raise RuntimeError
+
+        else:
+            return response
+
+    @staticmethod
+    def get_root_ca(preferred_endpoint: str, backup_endpoint: str):
+        return ROOT_CA_CACHE.get(preferred_endpoint=preferred_endpoint, backup_endpoint=backup_endpoint)
+
+    def get_thing_types_by_prefix(self, partial_name: str):
+        """
+        Returns the names of the Thing Types that contain the partial name, case insensitive. Served from the process
+        wide Thing Type index, the AWS IoT catalog is only listed again once the index TTL expires.
+        :param partial_name: Partial Thing Type name.
+        :return: List of Thing Type names.
+        """
+        self.thing_type_index.refresh(iot_client=self.iot_client)
+        results = self.thing_type_index.contains(partial_name)
+
+        logger.debug("Returning %d thing types...", len(results))
+        return results
+
+    def provision_thing_from_csr(self, csr: str, saga: ProvisioningSaga = None):
+        logger.info("Provisioning thing certificate from CSR...")
+        try:
+            response = self._call("create_certificate_from_csr", certificateSigningRequest=csr, setAsActive=True)
+            certificate_data = {"pem": response["certificatePem"]}
+            certificate_arn = response["certificateArn"]
+
+        except ClientError:
+            logger.error(traceback.format_exc())
+            raise IoTBotoError
+
+        except Exception:
+            logger.error("Unexpected error...")
+            logger.error(traceback.format_exc())
+            raise RuntimeError
+        else:
+            if saga is not None:
+                saga.record("create_certificate", self.delete_certificate_, certificate_arn=certificate_arn)
+            return certificate_data, certificate_arn
+
+    def register_certificate_without_ca_(self, certificate_pem: str, saga: ProvisioningSaga = None):
+        logger.info("Registering thing certificate signed by local CA...")
+        try:
+            response = self._call("register_certificate_without_ca", certificatePem=certificate_pem, status="ACTIVE")
+            certificate_data = {"pem": certificate_pem}
+            certificate_arn = response["certificateArn"]
+
+        except ClientError:
+            logger.error(traceback.format_exc())
+            raise IoTBotoError
+
+        except Exception:
+            logger.error("Unexpected error...")
+            logger.error(traceback.format_exc())
+            raise RuntimeError
+        else:
+            if saga is not None:
+                saga.record("register_certificate", self.delete_certificate_, certificate_arn=certificate_arn)
+            return certificate_data, certificate_arn
+
+    def provision_thing(self, certificate_status=True, saga: ProvisioningSaga = None):
+        logger.info("Provisioning thing certificates...")
+        try:
+            response = self._call("create_keys_and_certificate", setAsActive=certificate_status)
+            certificate_data = {
+                "pem": response["certificatePem"],
+                "key_pair": {
+                    "public_key": response["keyPair"]["PublicKey"],
+                    "private_key": response["keyPair"]["PrivateKey"],
+                },
+            }
+            certificate_arn = response["certificateArn"]
+
+        except ClientError:
+            logger.error(traceback.format_exc())
+            raise IoTBotoError
+
+        except Exception:
+            logger.error("Unexpected error...")
+            logger.error(traceback.format_exc())
+            raise RuntimeError
+        else:
+            if saga is not None:
+                saga.record("create_certificate", self.delete_certificate_, certificate_arn=certificate_arn)
+            return certificate_data, certificate_arn
+
+    def search_things(self, query: str) -> list:
+        """
+        Returns every Thing of the fleet index matching the query, all pages included.
+        :param query: AWS IoT fleet indexing query string.
+        :return: List of Things.
+        """
+        return list(self.iter_things(query=query))
+
+    def iter_things(
+        self,
+        query: str,
+        page_size: int = SEARCH_INDEX_PAGE_SIZE,
+        fields: tuple = None,
+        limit: int = None,
+        prefetch: bool = True,
+    ):
+        """
+        Streams the Things of the fleet index matching the query, page by page. While the current page is consumed the
+        next one is fetched in a background thread, so only two pages are held in memory. Closing the generator or
+        reaching the limit stops the pagination.
+        :param query: AWS IoT fleet indexing query string.
+        :param page_size: Things requested per page, up to 500.
+        :param fields: Keys of the Things to yield, like ("thingName", "attributes"), every key if not defined.
+        :param limit: Maximum number of Things to yield.
+        :param prefetch: Fetches the next page in the background.
+        :return: Generator of Things.
+        """
+        logger.info("Searching things with query: %s", query)
+        if limit is not None and limit <= 0:
+            return
+
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-index") if prefetch else None
+        try:
+            page = self._search_page(query=query, page_size=page_size)
+            yielded = 0
+            while True:
+                next_token = page.get("nextToken")
+                things = page["things"]
+
+                next_page = None
+                if next_token and executor is not None and (limit is None or yielded + len(things) < limit):
+                    next_page = executor.submit(self._search_page, query, page_size, next_token)
+
+                for thing in things:
+                    yield thing if fields is None else {key: thing[key] for key in fields if key in thing}
+                    yielded += 1
+                    if limit is not None and yielded >= limit:
+                        return
+
+                if not next_token:
+                    return
+
+                page = next_page.result() if next_page is not None else self._search_page(query, page_size, next_token)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    def _search_page(self, query: str, page_size: int, next_token: str = None) -> dict:
+        kwargs = dict(queryString=query, maxResults=page_size)
+        if next_token is not None:
+            kwargs["nextToken"] = next_token
+
+        try:
+            return self._call("search_index", **kwargs)
+
+        except ClientError:
+            logger.error(traceback.format_exc())
+            raise QueryError(f"Issue with query: {query}")
+
+        except Exception:
+            logger.error("Unexpected error...")
+            logger.error(traceback.format_exc())
+            raise RuntimeError
+
+
+class ThingPolicyHandlers(Sts):
+    def __init__(self):
+        Sts.__init__(self)
+        self.iot_client = CLIENTS.client("iot")
+
+    def _get_policy(self):
+        pass
+
+    def _create_policy(self):
+        pass
+
+    def _update_policy(self):
+        pass
+
+    def _delete_policy(self):
+        pass
+
+    def generate_minimum_policy(self):
+        pass
+
+    def generate_base_policy(self):
+        pass
+
+    def generate_full_policy(self):
+        pass
@@ -0,0 +1,237 @@
+import collections
+import functools
+import re
+import sys
+import threading
+
+from handlers.cache import LruCache
+from handlers.utils import HttpVerb
+from settings.app import POLICY_DOCUMENT_CACHE_SIZE
+
+
+@functools.lru_cache(maxsize=256)
+def get_method_arn(region: str, aws_account_id: str, rest_api_id: str, stage: str, verb: str, resource: str) -> str:
+    """
+    Builds the API Gateway method ARN used in the policy statements. ARNs are interned and memoized, warm authorizers
+    only see a handful of distinct ones.
+    :return: API Gateway method ARN.
+    """
+    return sys.intern(f"arn:aws:execute-api:{region}:{aws_account_id}:{rest_api_id}/{stage}/{verb}/{resource}")
+
+
+POLICY_DOCUMENT_CACHE = LruCache(max_size=POLICY_DOCUMENT_CACHE_SIZE)
+
+
+PolicyMethod = collections.namedtuple("PolicyMethod", ("resource_arn", "conditions"))
+"""
+Allowed or denied method of a policy: the resource ARN and a nullable conditions statement.
+"""
+
+
+class IamAuthPolicyHandler(object):
+    """
+    Class that manages the creation of AWS IAM Policies for API Gateway Lambda Authorizers. Instances are reusable,
+    reset clears every field so a pooled instance never leaks statements between principals.
+
+    - aws_account_id: The AWS account id the policy will be generated for. This is used to create the method ARNs.
+    - principal_id: The principal used for the policy, this should be a unique identifier for the end user.
+    - version: The policy version used for the evaluation. This should always be '2012-10-17'
+    - rest_api_id: The API Gateway API id. By default this is set to '*'
+    - region: The region where the API is deployed. By default this is set to '*'
+    - stage: The name of the stage used in the policy. By default this is set to '*'
+    - allow_methods and deny_methods: Immutable tuples of PolicyMethod, the build method processes them and
+      generates the approriate statements for the final policy.
+    """
+
+    __slots__ = (
+        "aws_account_id",
+        "principal_id",
+        "version",
+        "rest_api_id",
+        "region",
+        "stage",
+        "allow_methods",
+        "deny_methods",
+    )
+
+    path_regex = "^[/.a-zA-Z0-9-\*]+$"
+    """
+    The regular expression used to validate resource paths for the policy.
+    """
+    path_pattern = re.compile(path_regex)
+    """
+    The compiled regular expression, compiled once for the process.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Restores every field to its default value.
+        """
+        self.aws_account_id = None
+        self.principal_id = None
+        self.version = "2012-10-17"
+        self.rest_api_id = "*"
+        self.region = "*"
+        self.stage = "*"
+        self.allow_methods = tuple()
+        self.deny_methods = tuple()
+
+    def populate(self, aws_account_id, principal_id):
+        self.aws_account_id = aws_account_id
+        self.principal_id = principal_id
+
+    def _add_method(self, effect, verb, resource, conditions):
+        """Adds a method to the internal tuples of allowed or denied methods. Each object in
+        the internal tuple contains a resource ARN and a condition statement. The condition
+        statement can be null."""
+        if verb != "*" and not hasattr(HttpVerb, verb):
+            raise NameError("Invalid HTTP verb " + verb + ". Allowed verbs in HttpVerb class")
+        if not self.path_pattern.match(resource):
+            raise NameError("Invalid resource path: " + resource + ". Path should match " + self.path_regex)
+
+        if resource[:1] == "/":
+            resource = resource[1:]
+
+        resource_arn = get_method_arn(self.region, self.aws_account_id, self.rest_api_id, self.stage, verb, resource)
+
+        if effect.lower() == "allow":
+            self.allow_methods += (PolicyMethod(resource_arn, conditions),)
+        elif effect.lower() == "deny":
+            self.deny_methods += (PolicyMethod(resource_arn, conditions),)
+
+    @staticmethod
+    def _get_empty_statement(effect):
+        """
+        Returns an empty statement object prepopulated with the correct action and the
+        desired effect.
+        """
+        statement = {"Action": "execute-api:Invoke", "Effect": effect[:1].upper() + effect[1:].lower(), "Resource": []}
+
+        return statement
+
+    def _get_statement_for_effect(self, effect, methods):
+        """T
+        his function loops over an array of objects containing a resourceArn and
+        conditions statement and generates the array of statements for the policy.
+        """
+        statements = []
+
+        if len(methods) > 0:
+            statement = self._get_empty_statement(effect)
+
+            for curMethod in methods:
+                if curMethod.conditions is None or len(curMethod.conditions) == 0:
+                    statement["Resource"].append(curMethod.resource_arn)
+                else:
+                    conditional_statement = self._get_empty_statement(effect)
+                    conditional_statement["Resource"].append(curMethod.resource_arn)
+                    conditional_statement["Condition"] = curMethod.conditions
+                    statements.append(conditional_statement)
+
+            statements.append(statement)
+
+        return statements
+
+    def allow_all_methods(self):
+        """
+        Adds a '*' allow to the policy to authorize access to all methods of an API
+        """
+        self._add_method("Allow", HttpVerb.ALL, "*", [])
+
+    def deny_all_methods(self):
+        """
+        Adds a '*' allow to the policy to deny access to all methods of an API
+        """
+        self._add_method("Deny", HttpVerb.ALL, "*", [])
+
+    def allow_method(self, verb, resource):
+        """
+        Adds an API Gateway method (Http verb + Resource path) to the list of allowed
+        methods for the policy
+        """
+        self._add_method("Allow", verb, resource, [])
+
+    def deny_method(self, verb, resource):
+        """
+        Adds an API Gateway method (Http verb + Resource path) to the list of denied
+        methods for the policy
+        """
+        self._add_method("Deny", verb, resource, [])
+
+    def allow_method_with_conditions(self, verb, resource, conditions):
+        """
+        Adds an API Gateway method (Http verb + Resource path) to the list of allowed
+        methods and includes a condition for the policy statement. More on AWS policy
+        conditions here: http://docs.aws.amazon.com/IAM/latest/UserGuide/reference_policies_elements.html#Condition
+        """
+        self._add_method("Allow", verb, resource, conditions)
+
+    def deny_method_with_conditions(self, verb, resource, conditions):
+        """
+        Adds an API Gateway method (Http verb + Resource path) to the list of denied
+        methods and includes a condition for the policy statement. More on AWS policy
+        conditions here: http://docs.aws.amazon.com/IAM/latest/UserGuide/reference_policies_elements.html#Condition
+        """
+        self._add_method("Deny", verb, resource, conditions)
+
+    def build(self):
+        """
+        Generates the policy document based on the internal lists of allowed and denied
+        conditions. This will generate a policy with two main statements for the effect:
+        one statement for Allow and one statement for Deny.
+        Methods that includes conditions will have their own statement in the policy.
+        """
+        if (self.allow_methods is None or len(self.allow_methods) == 0) and (
+            self.deny_methods is None or len(self.deny_methods) == 0
+        ):
+            raise NameError("No statements defined for the policy")
+
+        policy = {"principalId": self.principal_id, "policyDocument": {"Version": self.version, "Statement": []}}
+
+        policy["policyDocument"]["Statement"].extend(self._get_statement_for_effect("Allow", self.allow_methods))
+        policy["policyDocument"]["Statement"].extend(self._get_statement_for_effect("Deny", self.deny_methods))
+
+        return policy
+
+
+class PolicyHandlerPool:
+    """
+    Pool of reusable policy handlers, warm authorizers take a handler per invocation and give it back reset instead of
+    creating a new one.
+    """
+
+    def __init__(self, handler_class=IamAuthPolicyHandler, max_size: int = 8):
+        self.handler_class = handler_class
+        self.max_size = max_size
+        self._handlers = list()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> IamAuthPolicyHandler:
+        with self._lock:
+            if self._handlers:
+                return self._handlers.pop()
+        return self.handler_class()
+
+    def release(self, handler: IamAuthPolicyHandler):
+        handler.reset()
+        with self._lock:
+            if len(self._handlers) < self.max_size:
+                self._handlers.append(handler)
+
+
+_policy_handler_pools = dict()
+
+
+def get_policy_handler_pool(handler_class=IamAuthPolicyHandler) -> PolicyHandlerPool:
+    """
+    Returns the process wide pool of the policy handler class.
+    :param handler_class: Policy handler class.
+    :return: Policy handler pool.
+    """
+    pool = _policy_handler_pools.get(handler_class)
+    if pool is None:
+        pool = _policy_handler_pools.setdefault(handler_class, PolicyHandlerPool(handler_class=handler_class))
+    return pool
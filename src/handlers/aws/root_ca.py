@@ -0,0 +1,163 @@
+import hashlib
+import os
+import threading
+import traceback
+
+from handlers.utils import Logger
+from settings.aws import ROOT_CA_BUNDLED_PATH, ROOT_CA_CACHE_DIR, ROOT_CA_HTTP_TIMEOUT
+
+project_logger = Logger()
+logger = project_logger.get_logger()
+
+
+class RootCaCache:
+    """
+    Tiered cache of the AWS IoT root CA PEM bundle. Lookups go through process memory, the Lambda /tmp file verified
+    with its checksum and the CA bundled in the package, the HTTP endpoints are only called on a cold miss.
+    """
+
+    PEM_HEADER = "-----BEGIN CERTIFICATE-----"
+
+    def __init__(
+        self,
+        directory: str = ROOT_CA_CACHE_DIR,
+        bundled_path: str = ROOT_CA_BUNDLED_PATH,
+        timeout: float = ROOT_CA_HTTP_TIMEOUT,
+    ):
+        """
+        :param directory: Directory where the downloaded root CA files are kept, /tmp in AWS Lambda.
+        :param bundled_path: Optional path of a root CA PEM file shipped with the package.
+        :param timeout: Seconds used as connect and read timeout of the HTTP requests.
+        """
+        self.directory = directory
+        self.bundled_path = bundled_path
+        self.timeout = timeout
+        self._memory = dict()
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+
+                    session = requests.Session()
+                    session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=2, max_retries=1))
+                    self._session = session
+        return self._session
+
+    def get(self, preferred_endpoint: str, backup_endpoint: str):
+        """
+        Returns the root CA PEM of the preferred endpoint, the backup endpoint is only used if the preferred one fails.
+        Only the preferred root CA is kept under the preferred endpoint, a failed lookup is retried on the next call.
+        :param preferred_endpoint: URL of the preferred root CA.
+        :param backup_endpoint: URL of the backup root CA.
+        :return: Root CA PEM string or False if it could not be obtained.
+        """
+        root_ca = self._memory.get(preferred_endpoint)
+        if root_ca is not None:
+            return root_ca
+
+        root_ca = self._read_file(endpoint=preferred_endpoint) or self._read_bundled()
+        if root_ca is None:
+            root_ca = self._download(endpoint=preferred_endpoint)
+            if root_ca is not None:
+                self._write_file(endpoint=preferred_endpoint, root_ca=root_ca)
+
+        if root_ca is not None:
+            self._memory[preferred_endpoint] = root_ca
+            return root_ca
+
+        # The backup is cached under its own endpoint, so the preferred one is tried again on the next lookup.
+        logger.error("Using backup certficate endpoint...")
+        root_ca = self._memory.get(backup_endpoint) or self._read_file(endpoint=backup_endpoint)
+        if root_ca is None:
+            root_ca = self._download(endpoint=backup_endpoint)
+            if root_ca is None:
+                return False
+            self._write_file(endpoint=backup_endpoint, root_ca=root_ca)
+
+        self._memory[backup_endpoint] = root_ca
+        return root_ca
+
+    def put(self, endpoint: str, root_ca: str):
+        """
+        Keeps the root CA of the endpoint in memory, later lookups of the endpoint never reach the files or HTTP.
+        :param endpoint: URL of the root CA.
+        :param root_ca: Root CA PEM string.
+        """
+        self._memory[endpoint] = root_ca
+
+    def clear(self):
+        """
+        Drops the root CAs kept in memory, files in the cache directory are kept.
+        """
+        self._memory.clear()
+
+    def _file_path(self, endpoint: str) -> str:
+        endpoint_hash = hashlib.sha256(endpoint.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, f"root-ca-{endpoint_hash}.pem")
+
+    def _read_file(self, endpoint: str):
+        path = self._file_path(endpoint)
+        try:
+            with open(path, "r") as pem_file:
+                root_ca = pem_file.read()
+            with open(f"{path}.sha256", "r") as checksum_file:
+                checksum = checksum_file.read().strip()
+        except OSError:
+            return None
+
+        if hashlib.sha256(root_ca.encode("utf-8")).hexdigest() != checksum or not self._valid(root_ca):
+            logger.warning(f"Discarding corrupted root CA cache file {path}")
+            return None
+
+        return root_ca
+
+    def _write_file(self, endpoint: str, root_ca: str):
+        path = self._file_path(endpoint)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for target, content in (
+                (path, root_ca),
+                (f"{path}.sha256", hashlib.sha256(root_ca.encode("utf-8")).hexdigest()),
+            ):
+                tmp_path = f"{target}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as tmp_file:
+                    tmp_file.write(content)
+                os.replace(tmp_path, target)
+        except OSError:
+            logger.warning("Unable to write root CA cache file...")
+            logger.warning(traceback.format_exc())
+
+    def _read_bundled(self):
+        if not self.bundled_path:
+            return None
+
+        try:
+            with open(self.bundled_path, "r") as pem_file:
+                root_ca = pem_file.read()
+        except OSError:
+            logger.warning(f"Bundled root CA {self.bundled_path} can not be read...")
+            return None
+
+        return root_ca if self._valid(root_ca) else None
+
+    def _download(self, endpoint: str):
+        try:
+            r = self.session.get(url=endpoint, timeout=self.timeout)
+            r.raise_for_status()
+        except Exception:
+            logger.error(f"Unable to download root CA from {endpoint}")
+            logger.error(traceback.format_exc())
+            return None
+
+        return r.text if self._valid(r.text) else None
+
+    def _valid(self, root_ca: str) -> bool:
+        return isinstance(root_ca, str) and self.PEM_HEADER in root_ca
+
+
+ROOT_CA_CACHE = RootCaCache()
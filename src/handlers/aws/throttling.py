@@ -0,0 +1,248 @@
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from handlers.metrics import emit_metric
+from handlers.utils import Logger
+from settings.aws import (
+    IOT_API_DEFAULT_RATE,
+    IOT_API_MAX_ATTEMPTS,
+    IOT_API_RATE_LIMITS,
+    IOT_API_RETRY_BASE_DELAY,
+    IOT_API_RETRY_MAX_DELAY,
+)
+
+project_logger = Logger()
+logger = project_logger.get_logger()
+
+
+IOT_API_RATES = {
+    "attach_policy": 15,
+    "attach_thing_principal": 15,
+    "create_certificate_from_csr": 15,
+    "create_keys_and_certificate": 10,
+    "create_thing": 15,
+    "delete_certificate": 10,
+    "delete_thing": 15,
+    "describe_thing": 350,
+    "detach_policy": 15,
+    "detach_thing_principal": 15,
+    "list_thing_principals": 15,
+    "list_thing_types": 15,
+    "register_certificate_without_ca": 10,
+    "search_index": 15,
+    "update_certificate": 10,
+}
+"""
+Requests per second of the AWS IoT APIs used by the handlers, matching the default account quotas.
+"""
+
+
+def parse_rates(rates: str) -> dict:
+    """
+    :param rates: Comma separated OPERATION=RATE pairs, like "create_thing=5,describe_thing=100".
+    :return: Requests per second by boto3 operation name.
+    """
+    parsed_rates = dict()
+    for pair in filter(None, (pair.strip() for pair in rates.split(","))):
+        operation, rate = pair.split("=")
+        parsed_rates[operation.strip()] = float(rate)
+    return parsed_rates
+
+
+class TokenBucket:
+    """
+    Token bucket limiting the calls to one API. Callers reserve a token and sleep until it is available, so concurrent
+    callers are served in order instead of all retrying at the same time. The refill rate is halved when the API
+    throttles and grows back linearly with successful calls.
+    """
+
+    def __init__(self, rate: float, burst: float = None, min_rate: float = 1):
+        """
+        :param rate: Configured tokens per second, also the maximum rate.
+        :param burst: Bucket capacity, one second of calls by default.
+        :param min_rate: Lowest rate reached after repeated throttles.
+        """
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.capacity = float(burst if burst is not None else max(rate, 1))
+        self.tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def reserve(self) -> float:
+        """
+        Takes a token, borrowing from the future if the bucket is empty.
+        :return: Seconds to wait before the token can be used.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self) -> float:
+        """
+        Takes a token, sleeping until it is available.
+        :return: Seconds waited.
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def penalize(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def reward(self):
+        if self.rate < self.max_rate:
+            with self._lock:
+                self._refill(time.monotonic())
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class ApiRateLimiter:
+    """
+    Process wide client side rate limiter of the calls to an AWS service, with one token bucket per API. Retryable
+    errors are retried with jittered exponential backoff: throttles on every API, transient server errors only on APIs
+    that are safe to repeat. Calls, throttles, retries and failures are counted per API.
+    """
+
+    THROTTLING_CODES = frozenset(
+        (
+            "Throttling",
+            "ThrottlingException",
+            "ThrottledException",
+            "TooManyRequestsException",
+            "RequestLimitExceeded",
+            "RequestThrottled",
+            "RequestThrottledException",
+        )
+    )
+    TRANSIENT_CODES = frozenset(
+        (
+            "InternalFailureException",
+            "InternalException",
+            "InternalServerError",
+            "ServiceUnavailable",
+            "ServiceUnavailableException",
+            "RequestTimeout",
+            "RequestTimeoutException",
+        )
+    )
+    NON_IDEMPOTENT_OPERATIONS = frozenset(("create_keys_and_certificate", "create_certificate_from_csr"))
+
+    def __init__(
+        self,
+        service_name: str,
+        rates: dict,
+        default_rate: float,
+        max_attempts: int,
+        base_delay: float,
+        max_delay: float,
+    ):
+        """
+        :param service_name: Service name used as metric dimension, like "iot".
+        :param rates: Requests per second by boto3 operation name.
+        :param default_rate: Requests per second of the operations without a configured rate.
+        :param max_attempts: Attempts of each call, including the first one.
+        :param base_delay: Seconds of the first backoff, doubled on every retry.
+        :param max_delay: Maximum seconds of a backoff.
+        """
+        self.service_name = service_name
+        self.rates = dict(rates)
+        self.default_rate = default_rate
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._buckets = dict()
+        self._counters = dict()
+        self._lock = threading.Lock()
+
+    def bucket(self, operation: str) -> TokenBucket:
+        bucket = self._buckets.get(operation)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(operation)
+                if bucket is None:
+                    bucket = TokenBucket(rate=self.rates.get(operation, self.default_rate))
+                    self._buckets[operation] = bucket
+        return bucket
+
+    def _count(self, operation: str, counter: str):
+        with self._lock:
+            counters = self._counters.setdefault(operation, dict(calls=0, throttles=0, retries=0, failures=0))
+            counters[counter] += 1
+
+    def is_retryable(self, operation: str, error: ClientError) -> bool:
+        code = error.response.get("Error", {}).get("Code")
+        if code in self.THROTTLING_CODES:
+            return True
+        return code in self.TRANSIENT_CODES and operation not in self.NON_IDEMPOTENT_OPERATIONS
+
+    def backoff(self, attempt: int) -> float:
+        """
+        :param attempt: Number of the failed attempt, starting at 1.
+        :return: Seconds to sleep, drawn uniformly up to the exponential delay of the attempt.
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def call(self, operation: str, function, **kwargs):
+        """
+        Calls the function once a token of the operation is available, retrying retryable errors.
+        :param operation: boto3 operation name, like "create_thing".
+        :param function: Callable making the call.
+        :param kwargs: Arguments of the callable.
+        :return: Callable result.
+        """
+        bucket = self.bucket(operation)
+        self._count(operation, "calls")
+        for attempt in range(1, self.max_attempts + 1):
+            bucket.acquire()
+            try:
+                response = function(**kwargs)
+            except ClientError as error:
+                if not self.is_retryable(operation, error):
+                    raise
+
+                code = error.response["Error"]["Code"]
+                if code in self.THROTTLING_CODES:
+                    self._count(operation, "throttles")
+                    bucket.penalize()
+                    emit_metric("ApiThrottle", dimensions={"AwsService": self.service_name, "Api": operation})
+
+                if attempt == self.max_attempts:
+                    self._count(operation, "failures")
+                    logger.warning(f"{self.service_name}.{operation} failed with {code} after {attempt} attempts")
+                    raise
+
+                self._count(operation, "retries")
+                time.sleep(self.backoff(attempt))
+            else:
+                bucket.reward()
+                return response
+
+    def stats(self) -> dict:
+        """
+        :return: Counters of calls, throttles, retries and failures by operation name.
+        """
+        with self._lock:
+            return {operation: dict(counters) for operation, counters in self._counters.items()}
+
+
+IOT_RATE_LIMITER = ApiRateLimiter(
+    service_name="iot",
+    rates={**IOT_API_RATES, **parse_rates(IOT_API_RATE_LIMITS)},
+    default_rate=IOT_API_DEFAULT_RATE,
+    max_attempts=IOT_API_MAX_ATTEMPTS,
+    base_delay=IOT_API_RETRY_BASE_DELAY,
+    max_delay=IOT_API_RETRY_MAX_DELAY,
+)
@@ -0,0 +1,94 @@
+import datetime
+import threading
+
+try:
+    from cryptography import x509
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.x509.oid import NameOID
+except ImportError:
+    x509 = None
+
+from handlers.exceptions import InvalidCertificateRequest
+from settings.app import LOCAL_CA_CERTIFICATE_DAYS
+from settings.aws import LOCAL_CA_CERTIFICATE_PATH, LOCAL_CA_PRIVATE_KEY_PATH
+
+
+class LocalCertificateAuthority:
+    """
+    Signs the certificate signing requests of the agents in process, with a CA certificate and private key shipped
+    with the function. The signed certificates are registered in AWS IoT without registering the CA. Requires the
+    optional cryptography package.
+    """
+
+    def __init__(
+        self, ca_certificate_pem: bytes, ca_private_key_pem: bytes, validity_days: int = LOCAL_CA_CERTIFICATE_DAYS
+    ):
+        if x509 is None:
+            raise RuntimeError("The cryptography package is required to use the local certificate authority")
+
+        backend = default_backend()
+        self.ca_certificate = x509.load_pem_x509_certificate(ca_certificate_pem, backend)
+        self.ca_private_key = serialization.load_pem_private_key(ca_private_key_pem, password=None, backend=backend)
+        self.validity_days = validity_days
+
+    @classmethod
+    def from_files(cls, certificate_path: str, private_key_path: str):
+        with open(certificate_path, "rb") as certificate_file, open(private_key_path, "rb") as private_key_file:
+            return cls(ca_certificate_pem=certificate_file.read(), ca_private_key_pem=private_key_file.read())
+
+    def sign(self, csr_pem: str, thing_name: str) -> str:
+        """
+        Validates the certificate signing request and issues a client certificate for it. The certificate subject is
+        only the thing name as common name, a request with another common name is rejected.
+        :param csr_pem: PEM encoded certificate signing request sent by the agent.
+        :param thing_name: Name of the Thing the certificate is issued for.
+        :return: PEM encoded certificate.
+        """
+        try:
+            csr = x509.load_pem_x509_csr(csr_pem.encode("utf-8"), default_backend())
+        except (ValueError, TypeError, AttributeError):
+            raise InvalidCertificateRequest("Certificate signing request can not be parsed")
+
+        if not csr.is_signature_valid:
+            raise InvalidCertificateRequest("Certificate signing request signature is not valid")
+
+        common_names = [attribute.value for attribute in csr.subject.get_attributes_for_oid(NameOID.COMMON_NAME)]
+        if any(common_name != thing_name for common_name in common_names):
+            raise InvalidCertificateRequest("Certificate signing request common name does not match the thing name")
+
+        subject = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, thing_name)])
+
+        now = datetime.datetime.utcnow()
+        certificate = (
+            x509.CertificateBuilder()
+            .subject_name(subject)
+            .issuer_name(self.ca_certificate.subject)
+            .public_key(csr.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(minutes=5))
+            .not_valid_after(now + datetime.timedelta(days=self.validity_days))
+            .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+            .sign(self.ca_private_key, hashes.SHA256(), default_backend())
+        )
+
+        return certificate.public_bytes(serialization.Encoding.PEM).decode("utf-8")
+
+
+_local_ca = None
+_local_ca_lock = threading.Lock()
+
+
+def get_local_ca() -> LocalCertificateAuthority:
+    """
+    Returns the process wide local certificate authority, loaded from the configured files on first use.
+    :return: Local certificate authority.
+    """
+    global _local_ca
+    if _local_ca is None:
+        with _local_ca_lock:
+            if _local_ca is None:
+                if not LOCAL_CA_CERTIFICATE_PATH or not LOCAL_CA_PRIVATE_KEY_PATH:
+                    raise RuntimeError("LOCAL_CA_CERTIFICATE_PATH and LOCAL_CA_PRIVATE_KEY_PATH are required")
+                _local_ca = LocalCertificateAuthority.from_files(LOCAL_CA_CERTIFICATE_PATH, LOCAL_CA_PRIVATE_KEY_PATH)
+    return _local_ca
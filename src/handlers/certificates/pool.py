@@ -0,0 +1,230 @@
+import base64
+import random
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+from botocore.exceptions import ClientError
+
+from handlers.aws.clients import CLIENTS
+from handlers.aws.iot import ProvisioningSaga, ThingHandler
+from handlers.idempotency import RecordCipher
+from handlers.metrics import emit_metric
+from handlers.utils import Logger
+from settings.aws import CERTIFICATE_POOL_ENCRYPTION_KEY, CERTIFICATE_POOL_SCAN_SEGMENTS, CERTIFICATE_POOL_TABLE
+
+project_logger = Logger()
+logger = project_logger.get_logger()
+
+
+class CertificatePoolStore:
+    """
+    Storage of the pre-created certificates of the pool. Every stored certificate is a dictionary with the keys
+    certificateId, certificateArn, certificatePem, publicKey and privateKey, the private key is stored encrypted.
+    """
+
+    def put(self, certificate: dict):
+        raise NotImplementedError
+
+    def claim(self):
+        """
+        Atomically removes one certificate from the store, a certificate is never claimed twice.
+        :return: Certificate dictionary or None if the store is empty.
+        """
+        raise NotImplementedError
+
+    def count_available(self) -> int:
+        raise NotImplementedError
+
+
+class LocalCertificatePoolStore(CertificatePoolStore):
+    """
+    In memory store, used by tests and local benchmarks.
+    """
+
+    def __init__(self):
+        self._certificates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, certificate: dict):
+        with self._lock:
+            self._certificates[certificate["certificateId"]] = dict(certificate)
+
+    def claim(self):
+        with self._lock:
+            if not self._certificates:
+                return None
+            _, certificate = self._certificates.popitem(last=False)
+            return certificate
+
+    def count_available(self) -> int:
+        return len(self._certificates)
+
+
+class DynamoCertificatePoolStore(CertificatePoolStore):
+    """
+    DynamoDB store, table partition key is certificateId (String). A certificate is claimed with a conditional
+    delete returning the deleted item, so concurrent registrations never get the same certificate.
+    """
+
+    ATTRIBUTES = ("certificateId", "certificateArn", "certificatePem", "publicKey", "privateKey")
+
+    def __init__(self, table_name: str = CERTIFICATE_POOL_TABLE, scan_segments: int = CERTIFICATE_POOL_SCAN_SEGMENTS):
+        self.table_name = table_name
+        self.scan_segments = scan_segments
+        self.dynamodb_client = CLIENTS.client("dynamodb")
+
+    def put(self, certificate: dict):
+        item = {attribute: {"S": certificate[attribute]} for attribute in self.ATTRIBUTES}
+        item["createdAt"] = {"N": str(round(time.time()))}
+        self.dynamodb_client.put_item(TableName=self.table_name, Item=item)
+
+    def claim(self):
+        # Starting from a random segment spreads concurrent registrations over different candidates.
+        first_segment = random.randrange(self.scan_segments)
+        for offset in range(self.scan_segments):
+            segment = (first_segment + offset) % self.scan_segments
+            response = self.dynamodb_client.scan(
+                TableName=self.table_name,
+                ProjectionExpression="certificateId",
+                Segment=segment,
+                TotalSegments=self.scan_segments,
+                Limit=10,
+            )
+            for candidate in response.get("Items", []):
+                try:
+                    claimed = self.dynamodb_client.delete_item(
+                        TableName=self.table_name,
+                        Key={"certificateId": candidate["certificateId"]},
+                        ConditionExpression="attribute_exists(certificateId)",
+                        ReturnValues="ALL_OLD",
+                    )
+                except ClientError as error:
+                    if error.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                        continue
+                    raise
+
+                attributes = claimed.get("Attributes")
+                if attributes:
+                    return {attribute: attributes[attribute]["S"] for attribute in self.ATTRIBUTES}
+
+        return None
+
+    def count_available(self) -> int:
+        count = 0
+        kwargs = dict(TableName=self.table_name, Select="COUNT")
+        while True:
+            response = self.dynamodb_client.scan(**kwargs)
+            count += response["Count"]
+            if "LastEvaluatedKey" not in response:
+                return count
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def get_default_store():
+    """
+    Returns the DynamoDB store if a pool table is configured, otherwise the pool is disabled.
+    :return: Certificate pool store or None.
+    """
+    if CERTIFICATE_POOL_TABLE:
+        return DynamoCertificatePoolStore(table_name=CERTIFICATE_POOL_TABLE)
+    return None
+
+
+def get_default_cipher():
+    """
+    Returns the cipher of the pooled private keys using the configured key. Certificates are stored and claimed by
+    different functions, so there is no fallback to a key of the container.
+    :return: Record cipher or None if no key is configured.
+    """
+    if CERTIFICATE_POOL_ENCRYPTION_KEY:
+        return RecordCipher(key=base64.b64decode(CERTIFICATE_POOL_ENCRYPTION_KEY))
+    return None
+
+
+class CertificatePool:
+    """
+    Pool of INACTIVE certificates created ahead of time by a scheduled filler. Registrations claim a certificate and
+    activate it instead of generating a key pair inside the agent request. Private keys are encrypted with AES-GCM
+    bound to the certificate ARN, the pool is disabled without an encryption key.
+    """
+
+    def __init__(self, thing_handler: ThingHandler, store: CertificatePoolStore = None, cipher: RecordCipher = None):
+        self.thing_handler = thing_handler
+        self.store = store if store is not None else get_default_store()
+        self.cipher = cipher if cipher is not None else get_default_cipher()
+        if self.store is not None and self.cipher is None:
+            logger.error("CERTIFICATE_POOL_ENCRYPTION_KEY is not set, certificate pool disabled...")
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None and self.cipher is not None
+
+    def claim(self, saga: ProvisioningSaga = None):
+        """
+        Claims a certificate from the pool and activates it.
+        :param saga: Provisioning saga that records the certificate so it is deleted if the registration fails.
+        :return: Certificate data and certificate ARN, or None if the pool is disabled, empty or unavailable.
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            certificate = self.store.claim()
+        except Exception:
+            logger.error("Unable to claim certificate from pool...")
+            logger.error(traceback.format_exc())
+            return None
+
+        if certificate is None:
+            logger.warning("Certificate pool is empty...")
+            emit_metric("CertificatePoolEmpty")
+            return None
+
+        certificate_arn = certificate["certificateArn"]
+        try:
+            private_key = self.cipher.decrypt(certificate["privateKey"], associated_data=certificate_arn)
+        except Exception:
+            logger.error(f"Private key of pooled certificate {certificate_arn} can not be decrypted...")
+            emit_metric("CertificatePoolDecryptError")
+            return None
+
+        if saga is not None:
+            saga.record("claim_certificate", self.thing_handler.delete_certificate_, certificate_arn=certificate_arn)
+        self.thing_handler.activate_certificate_(certificate_arn=certificate_arn)
+
+        certificate_data = {
+            "pem": certificate["certificatePem"],
+            "key_pair": {"public_key": certificate["publicKey"], "private_key": private_key},
+        }
+        return certificate_data, certificate_arn
+
+    def fill(self, target_size: int, max_certificates: int) -> int:
+        """
+        Creates INACTIVE certificates until the pool reaches the target size.
+        :param target_size: Number of available certificates the pool should hold.
+        :param max_certificates: Maximum number of certificates created in one execution.
+        :return: Number of certificates added to the pool.
+        """
+        missing = min(max(target_size - self.store.count_available(), 0), max_certificates)
+        logger.info(f"Adding {missing} certificates to the pool...")
+
+        created = 0
+        for _ in range(missing):
+            certificate_data, certificate_arn = self.thing_handler.provision_thing(certificate_status=False)
+            self.store.put(
+                {
+                    "certificateId": certificate_arn.split("/")[-1],
+                    "certificateArn": certificate_arn,
+                    "certificatePem": certificate_data["pem"],
+                    "publicKey": certificate_data["key_pair"]["public_key"],
+                    "privateKey": self.cipher.encrypt(
+                        certificate_data["key_pair"]["private_key"], associated_data=certificate_arn
+                    ),
+                }
+            )
+            created += 1
+
+        emit_metric("CertificatePoolFilled", value=created)
+        return created
@@ -0,0 +1,79 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from settings.app import JSON_CODEC
+
+
+class StdlibJsonCodec:
+    """
+    JSON codec of the standard library, always available.
+    """
+
+    name = "json"
+
+    @staticmethod
+    def loads(data):
+        """
+        :param data: JSON document as str or bytes.
+        :return: Decoded object.
+        """
+        return json.loads(data)
+
+    @staticmethod
+    def dumps(obj) -> str:
+        """
+        :param obj: Object to encode.
+        :return: Compact JSON document.
+        """
+        return json.dumps(obj, separators=(",", ":"))
+
+
+class OrjsonCodec:
+    """
+    JSON codec backed by orjson, several times faster than the standard library encoding responses that carry
+    certificates and private keys. Both libraries raise subclasses of ValueError and TypeError on invalid input.
+    """
+
+    name = "orjson"
+
+    @staticmethod
+    def loads(data):
+        """
+        :param data: JSON document as str or bytes.
+        :return: Decoded object.
+        """
+        return orjson.loads(data)
+
+    @staticmethod
+    def dumps(obj) -> str:
+        """
+        :param obj: Object to encode.
+        :return: Compact JSON document.
+        """
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
+CODECS = {StdlibJsonCodec.name: StdlibJsonCodec, OrjsonCodec.name: OrjsonCodec}
+
+
+def get_codec(name: str = JSON_CODEC):
+    """
+    :param name: "orjson", "json" or "auto" to use orjson when it is installed and the standard library otherwise.
+    :return: Codec class with loads and dumps static methods.
+    """
+    if name == "auto":
+        return OrjsonCodec if orjson is not None else StdlibJsonCodec
+    if name == OrjsonCodec.name and orjson is None:
+        raise ValueError("JSON codec orjson is not installed")
+    if name not in CODECS:
+        raise ValueError(f"Unknown JSON codec {name}")
+    return CODECS[name]
+
+
+CODEC = get_codec()
+loads = CODEC.loads
+dumps = CODEC.dumps
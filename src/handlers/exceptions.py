@@ -1,3 +1,27 @@
+class IdempotencyRecordError(Exception):
+    """Raised if the stored response of a completed registration can not be decrypted or decoded"""
+
+    pass
+
+
+class InvalidAccessToken(Exception):
+    """Raised if a JSON Web Token can not be verified or its claims are not valid"""
+
+    pass
+
+
+class UnknownTokenKey(InvalidAccessToken):
+    """Raised if the key id of a JSON Web Token is not in the key set, which may be rotating or not loaded yet"""
+
+    pass
+
+
+class InvalidCertificateRequest(Exception):
+    """Raised if a certificate signing request sent by an agent can not be parsed or verified"""
+
+    pass
+
+
 class IoTBotoError(Exception):
     """Raise if there is an error with AWS IoT boto3 call"""
 
@@ -14,12 +38,30 @@ class PolicyDetachError(Exception):
     """Raised if issue detaching a policy from a principal, like a X.509 certificate"""
 
 
+class ConfigurationNotFound(Exception):
+    """Raised if the application configuration can not be found in SSM Parameter Store"""
+
+    pass
+
+
 class QueryError(Exception):
     """Raised if the desired query does not perform correctly"""
 
     pass
 
 
+class RegistrationInProgress(Exception):
+    """Raised if a registration with the same idempotency key is still being executed"""
+
+    pass
+
+
+class StepExecutionError(Exception):
+    """Raised if a step of a dependency graph execution fails, once the running steps finished"""
+
+    pass
+
+
 class ThingNotExists(Exception):
     """Raised if described thing operation fails, probably because thing does not exists."""
 
@@ -0,0 +1,109 @@
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .exceptions import StepExecutionError
+from .utils import Logger
+from settings.app import STEP_EXECUTOR_MAX_WORKERS
+
+project_logger = Logger()
+logger = project_logger.get_logger()
+
+
+_thread_pool = None
+_thread_pool_lock = threading.Lock()
+
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    """
+    Returns the process wide thread pool used to execute steps, created on first use and reused across warm Lambda
+    invocations.
+    :return: Thread pool executor.
+    """
+    global _thread_pool
+    if _thread_pool is None:
+        with _thread_pool_lock:
+            if _thread_pool is None:
+                _thread_pool = ThreadPoolExecutor(max_workers=STEP_EXECUTOR_MAX_WORKERS, thread_name_prefix="step")
+    return _thread_pool
+
+
+class Step:
+    def __init__(self, name: str, function, depends_on: tuple = ()):
+        """
+        Unit of work of a dependency graph execution.
+        :param name: Unique name of the step, its result is stored under this name.
+        :param function: Callable receiving the dictionary of results of the completed steps.
+        :param depends_on: Names of the steps that have to complete before this one starts.
+        """
+        self.name = name
+        self.function = function
+        self.depends_on = tuple(depends_on)
+
+
+class StepGraphExecutor:
+    """
+    Executes a graph of steps on a thread pool, every step starts as soon as the steps it depends on completed so
+    independent steps run concurrently. If a step fails no more steps are started, the running ones are awaited and the
+    failure is raised. Undoing the completed steps is left to the caller, registrations record them in their saga.
+    """
+
+    def __init__(self, steps: list, thread_pool: ThreadPoolExecutor = None):
+        self.steps = {step.name: step for step in steps}
+        self.thread_pool = thread_pool
+        self.results = dict()
+        self._validate()
+
+    def _validate(self):
+        """
+        Validates that every dependency exists and that the steps do not form a cycle.
+        """
+        for step in self.steps.values():
+            for dependency in step.depends_on:
+                if dependency not in self.steps:
+                    raise ValueError(f"Step {step.name} depends on unknown step {dependency}")
+
+        resolved = set()
+        pending = dict(self.steps)
+        while pending:
+            ready = [name for name, step in pending.items() if resolved.issuperset(step.depends_on)]
+            if not ready:
+                raise ValueError(f"Steps {sorted(pending)} form a dependency cycle")
+            for name in ready:
+                resolved.add(name)
+                del pending[name]
+
+    def execute(self) -> dict:
+        """
+        Executes every step of the graph.
+        :return: Dictionary with the result of every step by name.
+        """
+        thread_pool = self.thread_pool or get_thread_pool()
+        pending = dict(self.steps)
+        running = dict()
+        failure = None
+
+        while pending or running:
+            if failure is None:
+                for name, step in list(pending.items()):
+                    if all(dependency in self.results for dependency in step.depends_on):
+                        running[thread_pool.submit(step.function, self.results)] = step
+                        del pending[name]
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                try:
+                    self.results[step.name] = future.result()
+                except Exception as error:
+                    logger.error(f"Step {step.name} failed...")
+                    if failure is None:
+                        failure = (step, error)
+
+        if failure is not None:
+            failed_step, error = failure
+            raise StepExecutionError(f"Step {failed_step.name} failed") from error
+
+        return self.results
@@ -0,0 +1,276 @@
+import base64
+import hashlib
+import os
+import threading
+import time
+
+from handlers import codec
+from handlers.aws.clients import CLIENTS
+from handlers.cache import LruCache
+from handlers.exceptions import IdempotencyRecordError, RegistrationInProgress
+from handlers.utils import Logger
+from settings.app import IDEMPOTENCY_IN_PROGRESS_TTL, IDEMPOTENCY_LOCAL_MAX_SIZE, IDEMPOTENCY_TTL
+from settings.aws import IDEMPOTENCY_ENCRYPTION_KEY, IDEMPOTENCY_TABLE
+
+
+project_logger = Logger()
+logger = project_logger.get_logger()
+
+
+IN_PROGRESS = "IN_PROGRESS"
+COMPLETED = "COMPLETED"
+
+
+class IdempotencyStore:
+    """
+    Storage of the idempotency records. A record is a dictionary with the keys status, payload and expiresAt (epoch
+    seconds), expired records are ignored.
+    """
+
+    def reserve(self, key: str, ttl: float):
+        """
+        Atomically creates an IN_PROGRESS record for the key unless a valid record exists.
+        :param key: Idempotency key.
+        :param ttl: Seconds the reservation is valid, after that another request can take the key.
+        :return: The existing valid record, or None if the key was reserved.
+        """
+        raise NotImplementedError
+
+    def complete(self, key: str, payload: str, ttl: float):
+        """
+        Stores the encrypted result of the key, replacing its reservation.
+        """
+        raise NotImplementedError
+
+    def release(self, key: str):
+        """
+        Drops the reservation of the key so the request can be retried.
+        """
+        raise NotImplementedError
+
+
+class LocalIdempotencyStore(IdempotencyStore):
+    """
+    In memory store of the container, used by tests, local benchmarks and when no table is configured. Only retries
+    served by the same warm container are replayed.
+    """
+
+    def __init__(self, max_size: int = IDEMPOTENCY_LOCAL_MAX_SIZE):
+        self._records = LruCache(max_size=max_size)
+        self._lock = threading.Lock()
+
+    def reserve(self, key: str, ttl: float):
+        with self._lock:
+            now = time.time()
+            record = self._records.get(key)
+            if record is not None and record["expiresAt"] > now:
+                return dict(record)
+
+            self._records.put(key, dict(status=IN_PROGRESS, payload=None, expiresAt=now + ttl), ttl=ttl)
+            return None
+
+    def complete(self, key: str, payload: str, ttl: float):
+        self._records.put(key, dict(status=COMPLETED, payload=payload, expiresAt=time.time() + ttl), ttl=ttl)
+
+    def release(self, key: str):
+        self._records.pop(key)
+
+    def clear(self):
+        self._records.clear()
+
+
+class DynamoIdempotencyStore(IdempotencyStore):
+    """
+    DynamoDB store, table partition key is idempotencyKey (String) with Time to Live enabled on expiresAt. A key is
+    reserved with a conditional put that only succeeds if no record exists or the existing one expired, so concurrent
+    retries of a registration never provision twice.
+    """
+
+    def __init__(self, table_name: str = IDEMPOTENCY_TABLE, dynamodb_client=None):
+        self.table_name = table_name
+        self.dynamodb_client = dynamodb_client or CLIENTS.client("dynamodb")
+
+    def reserve(self, key: str, ttl: float):
+        from botocore.exceptions import ClientError
+
+        for _ in range(2):
+            now = time.time()
+            try:
+                self.dynamodb_client.put_item(
+                    TableName=self.table_name,
+                    Item={
+                        "idempotencyKey": {"S": key},
+                        "status": {"S": IN_PROGRESS},
+                        "expiresAt": {"N": str(int(now + ttl))},
+                    },
+                    ConditionExpression="attribute_not_exists(idempotencyKey) OR expiresAt < :now",
+                    ExpressionAttributeValues={":now": {"N": str(int(now))}},
+                )
+                return None
+            except ClientError as error:
+                if error.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+
+            item = self.dynamodb_client.get_item(
+                TableName=self.table_name, Key={"idempotencyKey": {"S": key}}, ConsistentRead=True
+            ).get("Item")
+            # The record may have been released between both calls, the reservation is then attempted again.
+            if item is not None:
+                return dict(
+                    status=item["status"]["S"],
+                    payload=item.get("payload", {}).get("S"),
+                    expiresAt=float(item["expiresAt"]["N"]),
+                )
+
+        raise RegistrationInProgress
+
+    def complete(self, key: str, payload: str, ttl: float):
+        self.dynamodb_client.put_item(
+            TableName=self.table_name,
+            Item={
+                "idempotencyKey": {"S": key},
+                "status": {"S": COMPLETED},
+                "payload": {"S": payload},
+                "expiresAt": {"N": str(int(time.time() + ttl))},
+            },
+        )
+
+    def release(self, key: str):
+        self.dynamodb_client.delete_item(TableName=self.table_name, Key={"idempotencyKey": {"S": key}})
+
+
+class RecordCipher:
+    """
+    Encrypts the stored results with AES-GCM, bound to their idempotency key as associated data so a record can not
+    be replayed under another key. cryptography is imported on first use.
+    """
+
+    NONCE_SIZE = 12
+
+    def __init__(self, key: bytes):
+        """
+        :param key: AES key of 16, 24 or 32 bytes.
+        """
+        self.key = key
+        self._aesgcm = None
+
+    @property
+    def aesgcm(self):
+        if self._aesgcm is None:
+            from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+            self._aesgcm = AESGCM(self.key)
+        return self._aesgcm
+
+    def encrypt(self, plaintext: str, associated_data: str) -> str:
+        nonce = os.urandom(self.NONCE_SIZE)
+        ciphertext = self.aesgcm.encrypt(nonce, plaintext.encode("utf-8"), associated_data.encode("utf-8"))
+        return base64.b64encode(nonce + ciphertext).decode("ascii")
+
+    def decrypt(self, token: str, associated_data: str) -> str:
+        data = base64.b64decode(token)
+        nonce, ciphertext = data[: self.NONCE_SIZE], data[self.NONCE_SIZE :]
+        return self.aesgcm.decrypt(nonce, ciphertext, associated_data.encode("utf-8")).decode("utf-8")
+
+
+_default_store = None
+_default_cipher = None
+
+
+def get_default_store() -> IdempotencyStore:
+    """
+    Returns the process wide store, DynamoDB if an idempotency table is configured, otherwise the local store.
+    :return: Idempotency store.
+    """
+    global _default_store
+
+    if _default_store is None:
+        if IDEMPOTENCY_TABLE:
+            _default_store = DynamoIdempotencyStore(table_name=IDEMPOTENCY_TABLE)
+        else:
+            _default_store = LocalIdempotencyStore()
+    return _default_store
+
+
+def get_default_cipher() -> RecordCipher:
+    """
+    Returns the process wide cipher using the configured key. Without a key a random one is generated for the
+    process, records written by other containers then can not be replayed.
+    :return: Record cipher.
+    """
+    global _default_cipher
+
+    if _default_cipher is None:
+        if IDEMPOTENCY_ENCRYPTION_KEY:
+            key = base64.b64decode(IDEMPOTENCY_ENCRYPTION_KEY)
+        else:
+            if IDEMPOTENCY_TABLE:
+                logger.warning("IDEMPOTENCY_ENCRYPTION_KEY is not set, using a key of this container...")
+            key = os.urandom(32)
+        _default_cipher = RecordCipher(key=key)
+    return _default_cipher
+
+
+class IdempotencyHandler:
+    """
+    Makes registrations idempotent. The first request of a key reserves it, a retry while it runs is rejected and a
+    retry once it completed gets the stored response back, without any AWS IoT call. Responses carry certificates and
+    private keys so they are stored encrypted and only for the TTL.
+    """
+
+    def __init__(
+        self,
+        store: IdempotencyStore = None,
+        cipher: RecordCipher = None,
+        ttl: float = IDEMPOTENCY_TTL,
+        in_progress_ttl: float = IDEMPOTENCY_IN_PROGRESS_TTL,
+    ):
+        """
+        :param store: Idempotency store, the process wide one by default.
+        :param cipher: Record cipher, the process wide one by default.
+        :param ttl: Seconds a completed registration can be replayed.
+        :param in_progress_ttl: Seconds a registration keeps its key reserved, longer than the function timeout.
+        """
+        self.store = store or get_default_store()
+        self.cipher = cipher or get_default_cipher()
+        self.ttl = ttl
+        self.in_progress_ttl = in_progress_ttl
+
+    @staticmethod
+    def get_key(thing_name: str, credential: str, idempotency_key: str = None) -> str:
+        """
+        Derives the stored key from the thing name and the credential checked by the authorizer, plus the idempotency
+        key sent by the agent if any. A response is only replayed to a request authorized with the same credential.
+        :return: Hexadecimal SHA-256 digest.
+        """
+        parts = [thing_name, credential] if idempotency_key is None else [thing_name, credential, idempotency_key]
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def begin(self, key: str):
+        """
+        Reserves the key or returns the stored response of a completed registration. A completed registration whose
+        response can not be decrypted raises IdempotencyRecordError and keeps its record, so it is never executed
+        twice.
+        :param key: Idempotency key.
+        :return: Tuple of HTTP code and response body to replay, or None if the registration must be executed.
+        """
+        record = self.store.reserve(key, ttl=self.in_progress_ttl)
+        if record is None:
+            return None
+        if record["status"] != COMPLETED:
+            raise RegistrationInProgress
+
+        try:
+            result = codec.loads(self.cipher.decrypt(record["payload"], associated_data=key))
+        except Exception:
+            logger.error("Stored registration can not be decrypted, rejecting retry...")
+            raise IdempotencyRecordError
+
+        return result["code"], result["response"]
+
+    def complete(self, key: str, code: int, response: dict):
+        payload = self.cipher.encrypt(codec.dumps(dict(code=code, response=response)), associated_data=key)
+        self.store.complete(key, payload=payload, ttl=self.ttl)
+
+    def release(self, key: str):
+        self.store.release(key)
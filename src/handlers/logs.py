@@ -0,0 +1,242 @@
+import json
+import logging
+import random
+import re
+import sys
+import time
+import traceback
+from contextlib import contextmanager
+
+from handlers.metrics import SPANS
+from settings.app import LOG_LEVEL, LOG_SAMPLE_RATES, LOG_TOKEN_PREFIXES
+
+
+REDACTED = "[REDACTED]"
+SENSITIVE_KEYS = frozenset(
+    ("authorizationtoken", "accounttoken", "token", "privatekey", "authorization", "accesstoken", "idtoken")
+)
+PRIVATE_KEY_PATTERN = (
+    re.compile(r"-----BEGIN [A-Z ]*PRIVATE KEY-----.*?(-----END [A-Z ]*PRIVATE KEY-----|$)", re.DOTALL),
+    REDACTED,
+)
+JWT_PATTERN = (re.compile(r"\beyJ[\w-]+\.[\w-]+\.[\w-]*"), REDACTED)
+
+
+def build_sensitive_patterns(token_prefixes) -> tuple:
+    """
+    :param token_prefixes: Prefixes of the tokens sent in the Authorization header, like "DeviceToken".
+    :return: Patterns and replacements applied to log strings.
+    """
+    if not token_prefixes:
+        return PRIVATE_KEY_PATTERN, JWT_PATTERN
+
+    token_pattern = "|".join(re.escape(prefix) for prefix in sorted(token_prefixes, key=len, reverse=True))
+    return (
+        PRIVATE_KEY_PATTERN,
+        (re.compile(rf"(?<![\w-])({token_pattern})\s+\S+"), r"\1 " + REDACTED),
+        JWT_PATTERN,
+    )
+
+
+_token_prefixes = frozenset(filter(None, (prefix.strip() for prefix in LOG_TOKEN_PREFIXES.split(","))))
+SENSITIVE_PATTERNS = build_sensitive_patterns(_token_prefixes)
+
+
+def add_token_prefix(prefix: str):
+    """
+    Redacts the tokens of the prefix too, like the DEVICE_AUTHORIZER_TOKEN_IDENTIFIER of the configuration. The
+    patterns are rebuilt once per new prefix and replaced with a single assignment.
+    :param prefix: Token prefix.
+    """
+    global _token_prefixes, SENSITIVE_PATTERNS
+
+    if not prefix or prefix in _token_prefixes:
+        return
+    _token_prefixes = _token_prefixes | {prefix}
+    SENSITIVE_PATTERNS = build_sensitive_patterns(_token_prefixes)
+
+
+def redact(value):
+    """
+    Masks tokens and private keys of a log value. Dictionaries are walked and values of sensitive keys replaced.
+    :param value: String, dictionary, list or any other value.
+    :return: Redacted copy of the value.
+    """
+    if isinstance(value, str):
+        for pattern, replacement in SENSITIVE_PATTERNS:
+            value = pattern.sub(replacement, value)
+        return value
+    if isinstance(value, dict):
+        return {key: REDACTED if str(key).lower() in SENSITIVE_KEYS else redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+def parse_sample_rates(rates: str) -> dict:
+    """
+    :param rates: Comma separated LEVEL=RATE pairs, like "DEBUG=0.01,INFO=0.1".
+    :return: Sample rate by level number.
+    """
+    sample_rates = dict()
+    for pair in filter(None, (pair.strip() for pair in rates.split(","))):
+        level, rate = pair.split("=")
+        sample_rates[logging.getLevelName(level.strip().upper())] = float(rate)
+    return sample_rates
+
+
+class RequestLog:
+    """
+    State of the request being processed by the container: id, sampling draw and phase timings. A Lambda container
+    processes one request at a time so the current request is kept at module level and shared with worker threads.
+    """
+
+    def __init__(self, name: str, request_id: str = None):
+        self.name = name
+        self.request_id = request_id
+        self.sample = random.random()
+        self.started_at = time.monotonic()
+        self.phases = dict()
+        self.fields = dict()
+
+    @contextmanager
+    def phase(self, name: str):
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            duration_ms = (time.monotonic() - started_at) * 1000
+            self.phases[name] = round(self.phases.get(name, 0) + duration_ms, 3)
+            if SPANS.enabled:
+                SPANS.record(f"{self.name}.{name}", duration_ms)
+
+    def summary(self) -> dict:
+        return dict(
+            request=self.name,
+            durationMs=round((time.monotonic() - self.started_at) * 1000, 3),
+            phases=self.phases,
+            **self.fields,
+        )
+
+
+_current_request = None
+
+
+@contextmanager
+def log_request(name: str, context=None):
+    """
+    Tracks a Lambda request and writes one summary line with its duration and phase timings when it ends. The
+    recorded spans are flushed as metrics at the same time.
+    :param name: Name of the function or flow.
+    :param context: Lambda context object, its request id is added to every log line.
+    """
+    global _current_request
+
+    request = RequestLog(name=name, request_id=getattr(context, "aws_request_id", None))
+    _current_request = request
+    try:
+        yield request
+    finally:
+        _current_request = None
+        SPANS.flush()
+        logging.getLogger().log(
+            logging.INFO,
+            "Request summary",
+            extra=dict(fields=request.summary(), request_id=request.request_id, summary=True),
+        )
+
+
+@contextmanager
+def log_phase(name: str):
+    """
+    Times a phase of the current request, outside of a request only the span is recorded.
+    """
+    if _current_request is None:
+        with SPANS.span(name):
+            yield
+    else:
+        with _current_request.phase(name):
+            yield
+
+
+def set_request_fields(**fields):
+    """
+    Adds fields to the summary line of the current request.
+    """
+    if _current_request is not None:
+        _current_request.fields.update(fields)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a fraction of the records of each level. The draw is done once per request so a sampled request keeps all
+    its records, records without a rate and request summaries are always kept.
+    """
+
+    def __init__(self, sample_rates: dict = None):
+        super(SamplingFilter, self).__init__()
+        self.sample_rates = parse_sample_rates(LOG_SAMPLE_RATES) if sample_rates is None else sample_rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.sample_rates.get(record.levelno)
+        if rate is None or getattr(record, "summary", False):
+            return True
+
+        request = _current_request
+        draw = request.sample if request is not None else random.random()
+        return draw < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Writes records as one redacted JSON object per line. The message is only formatted for records that pass the
+    level and sampling filters.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = dict(
+            timestamp=round(record.created * 1000),
+            level=record.levelname,
+            message=redact(record.getMessage()),
+            location=f"{record.module}.{record.funcName}:{record.lineno}",
+        )
+
+        request = _current_request
+        request_id = getattr(record, "request_id", None) or (request.request_id if request is not None else None)
+        if request_id is not None:
+            entry["requestId"] = request_id
+
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(redact(fields))
+
+        if record.exc_info:
+            entry["exception"] = redact("".join(traceback.format_exception(*record.exc_info)))
+
+        return json.dumps(entry, default=str)
+
+
+class Logger:
+    """
+    Configures the root logger once per process with the JSON formatter and the sampling filter.
+    """
+
+    configured = False
+
+    def __init__(self):
+        if not Logger.configured:
+            root = logging.getLogger()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+
+            handler = logging.StreamHandler(sys.stdout)
+            handler.setFormatter(JsonFormatter())
+            handler.addFilter(SamplingFilter())
+            root.addHandler(handler)
+            root.setLevel(LOG_LEVEL)
+            Logger.configured = True
+
+        self.logger = logging.getLogger()
+
+    def get_logger(self):
+        return self.logger
@@ -0,0 +1,165 @@
+import json
+import sys
+import threading
+import time
+
+from settings.app import METRICS_NAMESPACE, METRICS_SERVICE, SPANS_ENABLED, SPANS_RESOLUTION_MS
+
+
+def emit_metric(name: str, value: float = 1, unit: str = "Count", dimensions: dict = None):
+    """
+    Writes a metric to stdout using CloudWatch Embedded Metric Format, CloudWatch Logs extracts it from the Lambda
+    function logs without any API call.
+    :param name: Metric name.
+    :param value: Metric value.
+    :param unit: CloudWatch metric unit.
+    :param dimensions: Additional metric dimensions, the service name is always included.
+    """
+    dimensions = {"Service": METRICS_SERVICE, **(dimensions or {})}
+    document = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [list(dimensions)],
+                    "Metrics": [{"Name": name, "Unit": unit}],
+                }
+            ],
+        },
+        **dimensions,
+        name: value,
+    }
+    sys.stdout.write(json.dumps(document) + "\n")
+    sys.stdout.flush()
+
+
+MAX_DISTRIBUTION_VALUES = 100
+
+
+def _distribution(values: list, counts: dict) -> dict:
+    """
+    :return: Embedded Metric Format distribution of the sorted distinct values.
+    """
+    value_counts = [counts[value] for value in values]
+    return {
+        "Values": values,
+        "Counts": value_counts,
+        "Count": sum(value_counts),
+        "Sum": sum(value * count for value, count in zip(values, value_counts)),
+        "Min": values[0],
+        "Max": values[-1],
+    }
+
+
+def emit_distributions(distributions: dict, unit: str = "Milliseconds", dimensions: dict = None):
+    """
+    Writes several metrics as value distributions in Embedded Metric Format documents. Repeated values are sent once
+    with their count, along with the count, sum, minimum and maximum of the values, CloudWatch computes the
+    percentiles from them. A metric with more than 100 distinct values, the Embedded Metric Format limit, is split
+    across several documents.
+    :param distributions: List of values by metric name.
+    :param unit: CloudWatch metric unit.
+    :param dimensions: Additional metric dimensions, the service name is always included.
+    """
+    dimensions = {"Service": METRICS_SERVICE, **(dimensions or {})}
+
+    chunks = dict()
+    for name, values in distributions.items():
+        counts = dict()
+        for value in values:
+            counts[value] = counts.get(value, 0) + 1
+        distinct = sorted(counts)
+        chunks[name] = [
+            _distribution(values=distinct[start : start + MAX_DISTRIBUTION_VALUES], counts=counts)
+            for start in range(0, len(distinct), MAX_DISTRIBUTION_VALUES)
+        ]
+
+    for index in range(max((len(metric_chunks) for metric_chunks in chunks.values()), default=0)):
+        metrics = {name: metric_chunks[index] for name, metric_chunks in chunks.items() if index < len(metric_chunks)}
+        document = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": METRICS_NAMESPACE,
+                        "Dimensions": [list(dimensions)],
+                        "Metrics": [{"Name": name, "Unit": unit} for name in metrics],
+                    }
+                ],
+            },
+            **dimensions,
+            **metrics,
+        }
+        sys.stdout.write(json.dumps(document) + "\n")
+
+    sys.stdout.flush()
+
+
+class _Span:
+    __slots__ = ("recorder", "name", "started_at")
+
+    def __init__(self, recorder, name: str):
+        self.recorder = recorder
+        self.name = name
+        self.started_at = None
+
+    def __enter__(self):
+        self.started_at = time.monotonic()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.recorder.record(self.name, (time.monotonic() - self.started_at) * 1000)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class SpanRecorder:
+    """
+    Records the duration of named spans with the monotonic clock and writes them as Embedded Metric Format
+    distributions when flushed, once per request. When disabled span returns a shared no-op context manager.
+    """
+
+    def __init__(self, enabled: bool = SPANS_ENABLED, resolution: float = SPANS_RESOLUTION_MS):
+        """
+        :param enabled: Records spans if True.
+        :param resolution: Durations are rounded to this number of milliseconds so equal values are grouped.
+        """
+        self.enabled = enabled
+        self.resolution = resolution
+        self._durations = dict()
+        self._lock = threading.Lock()
+
+    def span(self, name: str):
+        if not self.enabled:
+            return NOOP_SPAN
+        return _Span(self, name)
+
+    def record(self, name: str, duration_ms: float):
+        duration_ms = round(round(duration_ms / self.resolution) * self.resolution, 3)
+        with self._lock:
+            self._durations.setdefault(name, []).append(duration_ms)
+
+    def flush(self):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            durations, self._durations = self._durations, dict()
+        if durations:
+            emit_distributions(durations)
+
+
+SPANS = SpanRecorder()
@@ -1,19 +1,41 @@
-import json
-import logging
-import os
-
-from marshmallow import Schema, fields, validates, ValidationError
+from handlers import codec
+from handlers.logs import Logger  # noqa: F401 re-exported, modules get their logger from handlers.utils
 
 
 def base_response(status_code: int, dict_body=None):
     headers = {"Content-Type": "application/json"}
     response_dict = dict(statusCode=status_code, headers=headers)
     if dict_body is not None and isinstance(dict_body, dict):
-        response_dict["body"] = json.dumps(dict_body)
+        response_dict["body"] = codec.dumps(dict_body)
 
     return response_dict
 
 
+def get_header(event: dict, name: str):
+    """
+    :param event: API Gateway proxy event.
+    :param name: Header name, case insensitive.
+    :return: Header value or None if not sent.
+    """
+    name = name.lower()
+    for header, value in (event.get("headers") or {}).items():
+        if header.lower() == name:
+            return value
+    return None
+
+
+def get_authorized_credential(event: dict, header_name: str = "Authorization"):
+    """
+    Returns the credential checked by the API Gateway authorizer of the request: the principal id returned by the
+    Lambda authorizer, or the authorization header if the request context does not have one.
+    :param event: API Gateway proxy event.
+    :param header_name: Identity source header of the authorizer.
+    :return: Credential or None if the request does not carry any.
+    """
+    authorizer = (event.get("requestContext") or {}).get("authorizer") or {}
+    return authorizer.get("principalId") or get_header(event, header_name)
+
+
 class HttpVerb:
     GET = "GET"
     POST = "POST"
@@ -23,17 +45,3 @@ class HttpVerb:
     DELETE = "DELETE"
     OPTIONS = "OPTIONS"
     ALL = "*"
-
-
-class Logger:
-    def __init__(self):
-        console_format = "%(pathname)s - %(levelname)s - %(funcName)s - %(lineno)d - %(message)s"
-        root = logging.getLogger()
-        if root.handlers:
-            for handler in root.handlers:
-                root.removeHandler(handler)
-        logging.basicConfig(format=console_format, level=os.environ.get("LOG_LEVEL", "INFO"))
-        self.logger = logging.getLogger()
-
-    def get_logger(self):
-        return self.logger
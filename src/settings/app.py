@@ -1 +1,49 @@
 import os
+
+REGISTRATION_BATCH_MAX_SIZE = int(os.environ.get("REGISTRATION_BATCH_MAX_SIZE", "50"))
+REGISTRATION_BATCH_MAX_WORKERS = int(os.environ.get("REGISTRATION_BATCH_MAX_WORKERS", "8"))
+
+STEP_EXECUTOR_MAX_WORKERS = int(os.environ.get("STEP_EXECUTOR_MAX_WORKERS", "8"))
+
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "MultaCvm")
+METRICS_SERVICE = os.environ.get("METRICS_SERVICE", os.environ.get("AWS_LAMBDA_FUNCTION_NAME", "multa-cvm"))
+
+ROLLBACK_MAX_ATTEMPTS = int(os.environ.get("ROLLBACK_MAX_ATTEMPTS", "3"))
+ROLLBACK_RETRY_DELAY = float(os.environ.get("ROLLBACK_RETRY_DELAY", "0.2"))
+
+CERTIFICATE_POOL_TARGET_SIZE = int(os.environ.get("CERTIFICATE_POOL_TARGET_SIZE", "500"))
+CERTIFICATE_POOL_MAX_FILL = int(os.environ.get("CERTIFICATE_POOL_MAX_FILL", "200"))
+
+CERTIFICATE_ISSUANCE_MODE = os.environ.get("CERTIFICATE_ISSUANCE_MODE", "aws")
+LOCAL_CA_CERTIFICATE_DAYS = int(os.environ.get("LOCAL_CA_CERTIFICATE_DAYS", "3650"))
+
+POLICY_DOCUMENT_CACHE_SIZE = int(os.environ.get("POLICY_DOCUMENT_CACHE_SIZE", "1024"))
+
+SEARCH_INDEX_PAGE_SIZE = int(os.environ.get("SEARCH_INDEX_PAGE_SIZE", "100"))
+
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "4096"))
+TOKEN_CACHE_TTL = float(os.environ.get("TOKEN_CACHE_TTL", "60"))
+TOKEN_NEGATIVE_CACHE_TTL = float(os.environ.get("TOKEN_NEGATIVE_CACHE_TTL", "10"))
+
+COGNITO_TOKEN_USE = os.environ.get("COGNITO_TOKEN_USE", "access")
+COGNITO_TOKEN_LEEWAY = float(os.environ.get("COGNITO_TOKEN_LEEWAY", "0"))
+COGNITO_JWKS_REFRESH_INTERVAL = float(os.environ.get("COGNITO_JWKS_REFRESH_INTERVAL", "3600"))
+
+AUTHORIZER_DECISION_CACHE_SIZE = int(os.environ.get("AUTHORIZER_DECISION_CACHE_SIZE", "4096"))
+AUTHORIZER_DECISION_CACHE_TTL = float(
+    os.environ.get("AUTHORIZER_DECISION_CACHE_TTL", os.environ.get("APP_CONFIG_CACHE_TTL", "300"))
+)
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_SAMPLE_RATES = os.environ.get("LOG_SAMPLE_RATES", "")
+LOG_TOKEN_PREFIXES = os.environ.get("LOG_TOKEN_PREFIXES", "DeviceToken,Bearer")
+
+SPANS_ENABLED = os.environ.get("SPANS_ENABLED", "false").lower() in ("1", "true", "yes")
+SPANS_RESOLUTION_MS = float(os.environ.get("SPANS_RESOLUTION_MS", "0.1"))
+
+JSON_CODEC = os.environ.get("JSON_CODEC", "auto")
+
+IDEMPOTENCY_HEADER = os.environ.get("IDEMPOTENCY_HEADER", "Idempotency-Key")
+IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL", "900"))
+IDEMPOTENCY_IN_PROGRESS_TTL = float(os.environ.get("IDEMPOTENCY_IN_PROGRESS_TTL", "30"))
+IDEMPOTENCY_LOCAL_MAX_SIZE = int(os.environ.get("IDEMPOTENCY_LOCAL_MAX_SIZE", "1024"))
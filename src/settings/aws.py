@@ -1,6 +1,41 @@
 import os
 
 APP_CONFIG_PATH = os.environ.get("APP_CONFIG_PATH")
+APP_CONFIG_CACHE_TTL = int(os.environ.get("APP_CONFIG_CACHE_TTL", "300"))
+APP_CONFIG_CACHE_RETRY_INTERVAL = int(os.environ.get("APP_CONFIG_CACHE_RETRY_INTERVAL", "30"))
+
+AWS_ACCOUNT_ID = os.environ.get("AWS_ACCOUNT_ID")
+BOTO_MAX_POOL_CONNECTIONS = int(os.environ.get("BOTO_MAX_POOL_CONNECTIONS", "25"))
+BOTO_CONNECT_TIMEOUT = float(os.environ.get("BOTO_CONNECT_TIMEOUT", "2"))
+BOTO_READ_TIMEOUT = float(os.environ.get("BOTO_READ_TIMEOUT", "5"))
+BOTO_MAX_ATTEMPTS = int(os.environ.get("BOTO_MAX_ATTEMPTS", "3"))
+
+IOT_API_RATE_LIMITS = os.environ.get("IOT_API_RATE_LIMITS", "")
+IOT_API_DEFAULT_RATE = float(os.environ.get("IOT_API_DEFAULT_RATE", "10"))
+IOT_API_MAX_ATTEMPTS = int(os.environ.get("IOT_API_MAX_ATTEMPTS", "5"))
+IOT_API_RETRY_BASE_DELAY = float(os.environ.get("IOT_API_RETRY_BASE_DELAY", "0.1"))
+IOT_API_RETRY_MAX_DELAY = float(os.environ.get("IOT_API_RETRY_MAX_DELAY", "2"))
+
+THING_TYPE_INDEX_TTL = int(os.environ.get("THING_TYPE_INDEX_TTL", "300"))
+
+ROOT_CA_CACHE_DIR = os.environ.get("ROOT_CA_CACHE_DIR", "/tmp")
+ROOT_CA_BUNDLED_PATH = os.environ.get("ROOT_CA_BUNDLED_PATH")
+ROOT_CA_HTTP_TIMEOUT = float(os.environ.get("ROOT_CA_HTTP_TIMEOUT", "3"))
+
+CERTIFICATE_POOL_TABLE = os.environ.get("CERTIFICATE_POOL_TABLE")
+CERTIFICATE_POOL_SCAN_SEGMENTS = int(os.environ.get("CERTIFICATE_POOL_SCAN_SEGMENTS", "4"))
+CERTIFICATE_POOL_ENCRYPTION_KEY = os.environ.get("CERTIFICATE_POOL_ENCRYPTION_KEY")
+
+LOCAL_CA_CERTIFICATE_PATH = os.environ.get("LOCAL_CA_CERTIFICATE_PATH")
+LOCAL_CA_PRIVATE_KEY_PATH = os.environ.get("LOCAL_CA_PRIVATE_KEY_PATH")
 
 USER_POOL_ID = os.environ.get("USER_POOL_ID")
 USER_POOL_APP_CLIENT_ID = os.environ.get("USER_POOL_APP_CLIENT_ID")
+
+DEVICE_TOKENS_TABLE = os.environ.get("DEVICE_TOKENS_TABLE")
+
+COGNITO_JWKS_BUNDLED_PATH = os.environ.get("COGNITO_JWKS_BUNDLED_PATH")
+COGNITO_JWKS_TIMEOUT = float(os.environ.get("COGNITO_JWKS_TIMEOUT", "3"))
+
+IDEMPOTENCY_TABLE = os.environ.get("IDEMPOTENCY_TABLE")
+IDEMPOTENCY_ENCRYPTION_KEY = os.environ.get("IDEMPOTENCY_ENCRYPTION_KEY")
@@ -0,0 +1,104 @@
+import json
+import uuid
+
+import pytest
+
+from applications.aws_lambda.basic.lambda_register import lambda_handler as register_handler
+from settings.app import REGISTRATION_BATCH_MAX_SIZE
+
+
+def device(thing_name: str = None) -> dict:
+    return {"thingName": thing_name or f"thing-{uuid.uuid4().hex[:8]}", "version": "1"}
+
+
+def batch_event(devices: list) -> dict:
+    return {"httpMethod": "POST", "resource": "/register/batch", "body": json.dumps({"devices": devices})}
+
+
+def register_batch(devices: list) -> tuple:
+    result = register_handler(event=batch_event(devices), context={})
+    return result["statusCode"], json.loads(result["body"])
+
+
+def test_batch_registration(fake_aws):
+    """Tests that every device of a batch is registered and the root CA is returned once"""
+    devices = [device() for _ in range(3)]
+
+    code, body = register_batch(devices)
+
+    assert code == 200
+    assert [result["thingName"] for result in body["results"]] == [item["thingName"] for item in devices]
+    assert all(result["status"] is True and result["certificateData"] for result in body["results"])
+    assert body["rootCa"].startswith("-----BEGIN CERTIFICATE-----")
+    assert fake_aws.calls["iot.get_policy"] == 1
+
+
+def test_batch_documented_body(fake_aws):
+    """Tests that the batch body documented in the README is registered"""
+    event = {
+        "httpMethod": "POST",
+        "resource": "/register/batch",
+        "body": '{"devices": [{"thingName": "thing-documented-1", "version": "1.0"}]}',
+    }
+
+    result = register_handler(event=event, context={})
+
+    assert result["statusCode"] == 200
+    assert json.loads(result["body"])["results"][0]["status"] is True
+    assert "thing-documented-1" in fake_aws.iot.things
+
+
+def test_batch_partial_registration(fake_aws):
+    """Tests that an existing thing and an invalid device fail on their own and the batch answers 207"""
+    existing = device()
+    assert register_batch([existing])[0] == 200
+
+    code, body = register_batch([device(), existing, {"thingName": "missing-fields"}])
+
+    assert code == 207
+    assert [result["status"] for result in body["results"]] == [True, False, False]
+    assert body["results"][1]["error"] == "Thing exists in the AWS IoT Account, exiting..."
+    assert body["results"][2]["error"] == "Invalid device payload"
+
+
+def test_batch_duplicated_thing_names(fake_aws):
+    """Tests that a thing name repeated in a batch is only registered once"""
+    duplicated = device()
+
+    code, body = register_batch([duplicated, dict(duplicated)])
+
+    assert code == 207
+    assert body["results"][0]["status"] is True
+    assert body["results"][1] == {
+        "thingName": duplicated["thingName"],
+        "status": False,
+        "error": "Duplicated thing name in batch",
+    }
+    assert fake_aws.calls["iot.create_thing"] == 1
+
+
+@pytest.mark.parametrize("size", [0, REGISTRATION_BATCH_MAX_SIZE + 1])
+def test_batch_size_limits(fake_aws, size):
+    """Tests that empty and oversized batches are rejected without any AWS IoT call"""
+    code, body = register_batch([device() for _ in range(size)])
+
+    assert code == 400
+    assert body["status"] is False
+    assert body["error"] == f"Batch registration requires between 1 and {REGISTRATION_BATCH_MAX_SIZE} devices"
+    assert fake_aws.calls["iot.create_thing"] == 0
+
+
+def test_batch_failed_device_rolled_back(fake_aws):
+    """Tests that a device failing in the middle of its registration is rolled back and the others are kept"""
+    fake_aws.fail("attach_policy", code="InvalidRequestException")
+    devices = [device() for _ in range(2)]
+
+    code, body = register_batch(devices)
+
+    assert code == 207
+    failed = [result["thingName"] for result in body["results"] if result["status"] is False]
+    registered = [result["thingName"] for result in body["results"] if result["status"] is True]
+    assert len(failed) == len(registered) == 1
+    assert failed[0] not in fake_aws.iot.things
+    assert registered[0] in fake_aws.iot.things
+    assert len(fake_aws.iot.certificates) == 1
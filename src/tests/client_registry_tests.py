@@ -0,0 +1,80 @@
+from handlers.aws.clients import ClientRegistry, Sts
+
+
+class FakeSession:
+    """boto3 session stand-in counting the created clients"""
+
+    region_name = "us-east-1"
+
+    def __init__(self):
+        self.created = []
+
+    def client(self, service_name, config=None):
+        self.created.append((service_name, config))
+        return object()
+
+
+class FakeSts:
+    def __init__(self):
+        self.calls = 0
+
+    def get_caller_identity(self):
+        self.calls += 1
+        return {"Account": "123456789012"}
+
+
+class Context:
+    invoked_function_arn = "arn:aws:lambda:us-east-1:210987654321:function:register"
+
+
+def get_registry() -> ClientRegistry:
+    registry = ClientRegistry(client_config=object(), service_client_configs={})
+    registry._session = FakeSession()
+    registry._account_id = None
+    return registry
+
+
+def test_clients_are_reused():
+    """Tests that every service client is created once and shared"""
+    registry = get_registry()
+
+    assert registry.client("iot") is registry.client("iot")
+    assert registry.client("ssm") is not registry.client("iot")
+    assert [service_name for service_name, _ in registry.session.created] == ["iot", "ssm"]
+
+
+def test_account_id_resolved_once():
+    """Tests that the account id comes from the Lambda context when available, otherwise from one STS call"""
+    registry = get_registry()
+    registry.set_account_id_from_context(Context())
+    assert registry.account_id == "210987654321"
+
+    registry = get_registry()
+    sts = FakeSts()
+    registry.inject({"sts": sts})
+    assert registry.account_id == registry.account_id == "123456789012"
+    assert sts.calls == 1
+
+
+def test_injected_clients_until_reset():
+    """Tests that injected clients, region and account id are used by handlers until the registry is reset"""
+    registry = get_registry()
+    sts_client = FakeSts()
+    registry.inject({"sts": sts_client}, region="eu-west-1", account_id="111111111111")
+
+    assert registry.client("sts") is sts_client
+    assert registry.region == "eu-west-1"
+    assert registry.account_id == "111111111111"
+
+    registry.reset()
+    registry._session = FakeSession()
+    assert registry.client("sts") is not sts_client
+    assert registry.region == "us-east-1"
+
+
+def test_sts_handlers_do_not_call_sts_on_creation(fake_aws):
+    """Tests that creating handlers never calls STS and that the account id is shared"""
+    handlers = [Sts() for _ in range(3)]
+
+    assert fake_aws.calls["sts.get_caller_identity"] == 0
+    assert {handler.account_id for handler in handlers} == {fake_aws.account_id}
@@ -0,0 +1,87 @@
+import base64
+import json
+import os
+import timeit
+
+import pytest
+
+from handlers import codec
+from handlers.utils import base_response
+
+
+def pem(label: str, size: int) -> str:
+    """
+    :return: PEM block of the label with random base64 content of the size in bytes.
+    """
+    content = base64.b64encode(os.urandom(size)).decode("ascii")
+    lines = [content[index : index + 64] for index in range(0, len(content), 64)]
+    return "\n".join([f"-----BEGIN {label}-----", *lines, f"-----END {label}-----", ""])
+
+
+registration_response = {
+    "certificateData": {
+        "certificateArn": "arn:aws:iot:us-east-1:112646120612:cert/" + "a" * 64,
+        "certificateId": "a" * 64,
+        "certificatePem": pem("CERTIFICATE", 900),
+        "keyPair": {"PublicKey": pem("PUBLIC KEY", 294), "PrivateKey": pem("RSA PRIVATE KEY", 1190)},
+    },
+    "rootCa": pem("CERTIFICATE", 850),
+    "thingName": "thing-1",
+    "thingArn": "arn:aws:iot:us-east-1:112646120612:thing/thing-1",
+}
+
+
+def test_codecs_round_trip():
+    """Tests that every available codec decodes what the others encode"""
+    codecs = [codec.get_codec("json")]
+    if codec.orjson is not None:
+        codecs.append(codec.get_codec("orjson"))
+
+    for encoder in codecs:
+        for decoder in codecs:
+            assert decoder.loads(encoder.dumps(registration_response)) == registration_response
+            assert decoder.loads(encoder.dumps(registration_response).encode("utf-8")) == registration_response
+
+    response = base_response(status_code=200, dict_body=registration_response)
+    assert json.loads(response["body"]) == registration_response
+
+
+def test_auto_codec():
+    """Tests that the auto codec is orjson when installed and that unknown or missing codecs are rejected"""
+    expected = codec.OrjsonCodec if codec.orjson is not None else codec.StdlibJsonCodec
+    assert codec.get_codec("auto") is expected
+
+    with pytest.raises(ValueError):
+        codec.get_codec("yaml")
+
+
+def test_missing_orjson(monkeypatch):
+    """Tests that without orjson the auto codec falls back to the standard library and orjson can not be selected"""
+    monkeypatch.setattr(codec, "orjson", None)
+
+    assert codec.get_codec("auto") is codec.StdlibJsonCodec
+    with pytest.raises(ValueError, match="not installed"):
+        codec.get_codec("orjson")
+
+
+def test_lambda_requirements_include_orjson():
+    """Tests that the deployed functions ship orjson so the fast codec is used in AWS Lambda"""
+    path = os.path.join(os.path.dirname(__file__), "..", "..", "etc", "pip", "lambda-requirements.txt")
+    with open(path, "r") as requirements_file:
+        requirements = [line.split("==")[0].strip() for line in requirements_file]
+
+    assert "orjson" in requirements
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_BENCHMARKS"), reason="Benchmarks run with RUN_BENCHMARKS=1")
+def test_codec_benchmark():
+    """Reports the serialization cost of a registration response with every available codec, run it with -s"""
+    codecs = ["json"] if codec.orjson is None else ["json", "orjson"]
+    number = 2000
+
+    for name in codecs:
+        selected = codec.get_codec(name)
+        encoded = selected.dumps(registration_response)
+        dumps = min(timeit.repeat(lambda: selected.dumps(registration_response), number=number, repeat=5)) / number
+        loads = min(timeit.repeat(lambda: selected.loads(encoded), number=number, repeat=5)) / number
+        print(f"{name}: dumps {dumps * 1e6:.1f} us, loads {loads * 1e6:.1f} us, {len(encoded)} bytes")
@@ -0,0 +1,167 @@
+import base64
+import json
+import time
+
+import pytest
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+
+from handlers.authorization.cognito.tokens import CognitoTokenVerifier, JwksCache
+from handlers.exceptions import InvalidAccessToken
+
+USER_POOL_ID = "us-east-1_TestPool"
+APP_CLIENT_ID = "test-app-client"
+ISSUER = f"https://cognito-idp.us-east-1.amazonaws.com/{USER_POOL_ID}"
+
+
+def b64url(value: bytes) -> str:
+    return base64.urlsafe_b64encode(value).rstrip(b"=").decode("ascii")
+
+
+def int_b64url(value: int) -> str:
+    return b64url(value.to_bytes((value.bit_length() + 7) // 8, "big"))
+
+
+def generate_key(kid: str):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
+    public_numbers = private_key.public_key().public_numbers()
+    jwk = {
+        "kid": kid,
+        "kty": "RSA",
+        "alg": "RS256",
+        "use": "sig",
+        "e": int_b64url(public_numbers.e),
+        "n": int_b64url(public_numbers.n),
+    }
+    return private_key, jwk
+
+
+def sign_token(private_key, kid: str, **claims) -> str:
+    payload = {
+        "sub": "user-sub",
+        "iss": ISSUER,
+        "token_use": "access",
+        "client_id": APP_CLIENT_ID,
+        "exp": round(time.time()) + 3600,
+    }
+    payload.update(claims)
+    signing_input = ".".join(
+        [
+            b64url(json.dumps({"kid": kid, "alg": "RS256"}).encode("utf-8")),
+            b64url(json.dumps(payload).encode("utf-8")),
+        ]
+    )
+    signature = private_key.sign(signing_input.encode("ascii"), padding.PKCS1v15(), hashes.SHA256())
+    return f"{signing_input}.{b64url(signature)}"
+
+
+class LocalJwksCache(JwksCache):
+    """Key set cache loaded from the locally generated keys, it must never go to the network"""
+
+    def refresh(self):
+        raise AssertionError("JSON Web Key Set must not be downloaded")
+
+    def refresh_in_background(self):
+        self.background_refreshes += 1
+
+
+@pytest.fixture
+def key_set():
+    private_key, jwk = generate_key("kid-1")
+    other_key, _ = generate_key("kid-2")
+
+    jwks_cache = LocalJwksCache(jwks_url=f"{ISSUER}/.well-known/jwks.json")
+    jwks_cache.background_refreshes = 0
+    jwks_cache.load({"keys": [jwk]})
+    verifier = CognitoTokenVerifier(user_pool_id=USER_POOL_ID, app_client_id=APP_CLIENT_ID, jwks_cache=jwks_cache)
+    return verifier, private_key, other_key
+
+
+def test_valid_access_token(key_set):
+    """Tests that a token signed by a key of the key set is verified locally"""
+    verifier, private_key, _ = key_set
+
+    claims = verifier.verify(sign_token(private_key, "kid-1"))
+
+    assert claims["sub"] == "user-sub"
+    assert verifier.jwks_cache.background_refreshes == 0
+
+
+def test_invalid_signature(key_set):
+    """Tests that a token signed by another key with a known kid is rejected"""
+    verifier, _, other_key = key_set
+
+    with pytest.raises(InvalidAccessToken):
+        verifier.verify(sign_token(other_key, "kid-1"))
+
+
+def test_unknown_kid_refreshes_in_background(key_set):
+    """Tests that an unknown kid is rejected and schedules a key set refresh"""
+    verifier, _, other_key = key_set
+
+    with pytest.raises(InvalidAccessToken):
+        verifier.verify(sign_token(other_key, "kid-2"))
+    assert verifier.jwks_cache.background_refreshes == 1
+
+
+@pytest.mark.parametrize(
+    "claims",
+    [
+        {"exp": round(time.time()) - 10},
+        {"iss": "https://cognito-idp.us-east-1.amazonaws.com/us-east-1_Other"},
+        {"token_use": "id"},
+        {"client_id": "other-app-client"},
+    ],
+)
+def test_invalid_claims(key_set, claims):
+    """Tests that expired tokens and tokens of other issuers, uses or app clients are rejected"""
+    verifier, private_key, _ = key_set
+
+    with pytest.raises(InvalidAccessToken):
+        verifier.verify(sign_token(private_key, "kid-1", **claims))
+
+
+def test_malformed_token(key_set):
+    """Tests that malformed tokens are rejected"""
+    verifier, _, _ = key_set
+
+    with pytest.raises(InvalidAccessToken):
+        verifier.verify("not-a-token")
+
+
+def sign_segments(private_key, header, payload) -> str:
+    signing_input = f"{b64url(json.dumps(header).encode('utf-8'))}.{b64url(json.dumps(payload).encode('utf-8'))}"
+    signature = private_key.sign(signing_input.encode("ascii"), padding.PKCS1v15(), hashes.SHA256())
+    return f"{signing_input}.{b64url(signature)}"
+
+
+@pytest.mark.parametrize(
+    "header, payload",
+    [
+        (["RS256", "kid-1"], {"sub": "user-sub"}),
+        (42, {"sub": "user-sub"}),
+        ({"alg": "RS256", "kid": ["kid-1"]}, {"sub": "user-sub"}),
+        ({"alg": "RS256", "kid": {"id": "kid-1"}}, {"sub": "user-sub"}),
+        ({"alg": "RS256", "kid": 1}, {"sub": "user-sub"}),
+        ({"alg": "RS256"}, {"sub": "user-sub"}),
+        ({"alg": "RS256", "kid": "kid-1"}, ["user-sub"]),
+        ({"alg": "RS256", "kid": "kid-1"}, 1700000000),
+        ({"alg": "RS256", "kid": "kid-1"}, "user-sub"),
+    ],
+)
+def test_malformed_header_or_payload(key_set, header, payload):
+    """Tests that well encoded tokens with headers or payloads of unexpected types are rejected"""
+    verifier, private_key, _ = key_set
+
+    with pytest.raises(InvalidAccessToken):
+        verifier.verify(sign_segments(private_key, header, payload))
+
+
+@pytest.mark.parametrize("token", [None, 42, "a.b", "a.b.c.d", "é.é.é"])
+def test_malformed_token_values(key_set, token):
+    """Tests that tokens that are not three base64url segments are rejected"""
+    verifier, _, _ = key_set
+
+    with pytest.raises(InvalidAccessToken):
+        verifier.verify(token)
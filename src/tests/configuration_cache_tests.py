@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from handlers.aws.configuration import ConfigurationCache, ConfigurationHandler
+from handlers.exceptions import ConfigurationNotFound
+
+
+class FakeClock:
+    """Monotonic clock advanced by the tests"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Loader:
+    """Configuration loader returning the queued versions, or raising if the queued value is an exception"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_clock = FakeClock()
+    monkeypatch.setattr("handlers.aws.configuration.time.monotonic", fake_clock)
+    return fake_clock
+
+
+def test_configuration_served_until_ttl(clock):
+    """Tests that the configuration is loaded once per TTL and only parsed again when its version changes"""
+    cache = ConfigurationCache(ttl=300, retry_interval=30)
+    loader = Loader((1, '{"key": "a"}'), (1, '{"key": "a"}'), (2, '{"key": "b"}'))
+
+    first = cache.get(path="/config", loader=loader)
+    assert cache.get(path="/config", loader=loader) is first
+    assert loader.calls == 1
+
+    clock.now += 301
+    assert cache.get(path="/config", loader=loader) is first
+    assert loader.calls == 2
+
+    clock.now += 301
+    assert cache.get(path="/config", loader=loader) == {"key": "b"}
+    assert cache.stats() == dict(hits=1, misses=3, stale_hits=0)
+
+
+def test_stale_configuration_on_refresh_failure(clock):
+    """Tests that a failed refresh serves the stale configuration and retries after the retry interval"""
+    cache = ConfigurationCache(ttl=300, retry_interval=30)
+    loader = Loader((1, '{"key": "a"}'), RuntimeError("SSM unavailable"), (2, '{"key": "b"}'))
+
+    cache.get(path="/config", loader=loader)
+    clock.now += 301
+    assert cache.get(path="/config", loader=loader) == {"key": "a"}
+    assert cache.stats()["stale_hits"] == 1
+
+    clock.now += 10
+    assert cache.get(path="/config", loader=loader) == {"key": "a"}
+    assert loader.calls == 2
+
+    clock.now += 21
+    assert cache.get(path="/config", loader=loader) == {"key": "b"}
+
+    with pytest.raises(RuntimeError):
+        cache.get(path="/other", loader=Loader(RuntimeError("SSM unavailable")))
+
+
+def test_invalidate(clock):
+    """Tests that an invalidated path is loaded again"""
+    cache = ConfigurationCache(ttl=300)
+    loader = Loader((1, '{"key": "a"}'))
+
+    cache.get(path="/config", loader=loader)
+    cache.invalidate("/config")
+    cache.get(path="/config", loader=loader)
+    assert loader.calls == 2
+
+
+def test_handlers_share_the_configuration(fake_aws):
+    """Tests that configuration handlers of different requests read SSM once"""
+    cache = ConfigurationCache(ttl=300)
+    fake_aws.ssm.put_parameter(Name="/tests/config/config", Value=json.dumps({"key": "value"}))
+
+    for _ in range(3):
+        assert ConfigurationHandler(path="/tests/config", cache=cache).get_config() == {"key": "value"}
+    assert fake_aws.calls["ssm.get_parameters_by_path"] == 1
+
+    with pytest.raises(ConfigurationNotFound):
+        ConfigurationHandler(path="/tests/missing", cache=cache).load_parameter()
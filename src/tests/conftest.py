@@ -0,0 +1,56 @@
+import json
+import os
+
+import pytest
+
+os.environ.setdefault("APP_CONFIG_PATH", "/multa-cvm/dev/config-parameters")
+
+from handlers.aws.configuration import CONFIGURATION_CACHE
+from handlers.aws.iot import THING_TYPE_INDEX
+from handlers.aws.root_ca import ROOT_CA_CACHE
+from handlers.idempotency import LocalIdempotencyStore, get_default_store
+from settings.aws import APP_CONFIG_PATH
+from tests.fakes import FakeAwsBackend
+
+
+ROOT_CA = "-----BEGIN CERTIFICATE-----\nMIIDQTCCAimgAwIBAgITBmyfz5m/jAo54vB4ikPmljZbyjANBgkqhkiG9w0BAQsF\n-----END CERTIFICATE-----\n"
+CONFIGURATION = {
+    "AWS_ROOT_CA": {
+        "PREFERRED": "https://www.amazontrust.com/repository/AmazonRootCA1.pem",
+        "BACKUP": "https://www.amazontrust.com/repository/AmazonRootCA3.pem",
+    },
+    "POLICIES": {"CvmGenericType": {"name": "CvmGenericPolicy"}},
+    "ATTRIBUTES": {"CvmGenericType": [{"name": "creationDate"}, {"name": "version"}]},
+    "DEVICE_AUTHORIZER_TOKEN_IDENTIFIER": "DeviceToken",
+    "DEVICE_AUTHORIZER_TOKEN_PAYLOAD_LENGTH": "2",
+    "DEVICE_AUTHORIZER_VALID_TOKENS": ["NjWO2tVh6fVAeNuLwRsPi-c6N7SP5-DT"],
+}
+"""
+Application configuration stored in the fake SSM Parameter Store under APP_CONFIG_PATH.
+"""
+
+
+@pytest.fixture
+def fake_aws():
+    """
+    Installs an in memory AWS backend with the application configuration, a Thing Type and its policy, so the Lambda
+    handlers run without network.
+    """
+    backend = FakeAwsBackend()
+    backend.ssm.put_parameter(Name=f"{APP_CONFIG_PATH}/config", Value=json.dumps(CONFIGURATION))
+    backend.iot.create_thing_type(thingTypeName="CvmGenericType")
+    backend.iot.create_policy(policyName="CvmGenericPolicy", policyDocument=json.dumps({"Version": "2012-10-17"}))
+    backend.calls.clear()
+
+    backend.install()
+    CONFIGURATION_CACHE.invalidate()
+    THING_TYPE_INDEX.refresh(iot_client=backend.iot, force=True)
+    ROOT_CA_CACHE.put(CONFIGURATION["AWS_ROOT_CA"]["PREFERRED"], ROOT_CA)
+    if isinstance(get_default_store(), LocalIdempotencyStore):
+        get_default_store().clear()
+
+    yield backend
+
+    backend.uninstall()
+    CONFIGURATION_CACHE.invalidate()
+    ROOT_CA_CACHE.clear()
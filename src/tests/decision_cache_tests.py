@@ -0,0 +1,135 @@
+import time
+
+import pytest
+
+from applications.aws_lambda.basic import lambda_authorizer
+from components.authorizers.api_gateway.base import DECISION_CACHE
+from components.authorizers.api_gateway.cognito.generic import AwsIoTCognitoAuthorizer
+from components.authorizers.api_gateway.custom import generic
+from components.authorizers.api_gateway.custom.dynamo import AwsIoTDynamoAuthorizer
+from components.authorizers.api_gateway.custom.generic import AwsIoTGenericAuthorizer
+from handlers.authorization.dynamo.tokens import DynamoTokenAuthorizationHandler
+from handlers.authorization.cognito.tokens import CognitoTokenVerifier
+from tests.cognito_authorizer_tests import APP_CLIENT_ID, USER_POOL_ID, LocalJwksCache, generate_key, sign_token
+from tests.dynamo_token_authorizer_tests import get_handler
+
+METHOD_ARN = "arn:aws:execute-api:us-east-1:112646120612:n8il2c2eic/prod/POST/register"
+TOKEN = "DeviceToken NjWO2tVh6fVAeNuLwRsPi-c6N7SP5-DT"
+
+
+class FlakyTokenAuthorizationHandler:
+    """Token backend failing the first calls, like a throttled or unreachable DynamoDB table"""
+
+    failures = 0
+    calls = 0
+
+    def authorize(self, token: str) -> bool:
+        FlakyTokenAuthorizationHandler.calls += 1
+        if FlakyTokenAuthorizationHandler.failures:
+            FlakyTokenAuthorizationHandler.failures -= 1
+            raise RuntimeError("Unable to read token from DynamoDB")
+        return True
+
+
+class FlakyAuthorizer(AwsIoTGenericAuthorizer):
+    class Meta:
+        WORKERS = dict(AwsIoTGenericAuthorizer.Meta.WORKERS, token_authorization_handler=FlakyTokenAuthorizationHandler)
+
+
+def authorize(token: str = TOKEN) -> str:
+    event = {"type": "TOKEN", "methodArn": METHOD_ARN, "authorizationToken": token}
+    return lambda_authorizer.lambda_handler(event=event, context={})["policyDocument"]["Statement"][0]["Effect"]
+
+
+@pytest.fixture
+def decision_cache():
+    DECISION_CACHE.clear()
+    yield DECISION_CACHE
+    DECISION_CACHE.clear()
+
+
+def test_decision_cached(fake_aws, decision_cache):
+    """Tests that a completed token check is reused without reading the configuration again"""
+    assert authorize() == "Allow"
+    assert authorize("DeviceToken unknown") == "Deny"
+    calls = sum(fake_aws.calls.values())
+
+    assert authorize() == "Allow"
+    assert authorize("DeviceToken unknown") == "Deny"
+    assert sum(fake_aws.calls.values()) == calls
+    assert len(decision_cache) == 2
+
+
+def test_cached_decision_is_copied(fake_aws, decision_cache):
+    """Tests that changing a returned policy does not change the cached decision"""
+    event = {"type": "TOKEN", "methodArn": METHOD_ARN, "authorizationToken": TOKEN}
+    policy = lambda_authorizer.lambda_handler(event=event, context={})
+    policy["policyDocument"]["Statement"][0]["Effect"] = "Deny"
+
+    cached_policy = lambda_authorizer.lambda_handler(event=event, context={})
+    cached_policy["policyDocument"]["Statement"][0]["Effect"] = "Deny"
+
+    assert authorize() == "Allow"
+
+
+def test_backend_failure_not_cached(fake_aws, decision_cache, monkeypatch):
+    """Tests that a deny caused by a failing token backend is not reused once the backend recovers"""
+    monkeypatch.setattr(lambda_authorizer, "AUTHORIZER_CLASS", FlakyAuthorizer)
+    FlakyTokenAuthorizationHandler.failures = 1
+    FlakyTokenAuthorizationHandler.calls = 0
+
+    assert authorize() == "Deny"
+    assert len(decision_cache) == 0
+
+    assert authorize() == "Allow"
+    assert authorize() == "Allow"
+    assert FlakyTokenAuthorizationHandler.calls == 2
+
+
+def test_configuration_failure_not_cached(fake_aws, decision_cache):
+    """Tests that a deny caused by a failing SSM Parameter Store is not reused once it recovers"""
+    fake_aws.fail("get_parameters_by_path", code="InternalServerError")
+
+    assert authorize() == "Deny"
+    assert len(decision_cache) == 0
+
+    assert authorize() == "Allow"
+    assert fake_aws.calls["ssm.get_parameters_by_path"] == 2
+
+
+def test_unknown_jwt_key_not_cached(fake_aws, decision_cache, monkeypatch):
+    """Tests that a JWT deny caused by a key set that could not be loaded is not reused once the keys are loaded"""
+    private_key, jwk = generate_key("kid-1")
+    jwks_cache = LocalJwksCache(jwks_url="https://example.com/jwks.json")
+    jwks_cache.background_refreshes = 0
+    jwks_cache.load({"keys": []})
+    verifier = CognitoTokenVerifier(user_pool_id=USER_POOL_ID, app_client_id=APP_CLIENT_ID, jwks_cache=jwks_cache)
+    monkeypatch.setitem(generic._token_authorization_handlers, CognitoTokenVerifier, verifier)
+    monkeypatch.setattr(lambda_authorizer, "AUTHORIZER_CLASS", AwsIoTCognitoAuthorizer)
+    token = f"Bearer {sign_token(private_key, 'kid-1')}"
+
+    assert authorize(token) == "Deny"
+    assert len(decision_cache) == 0
+
+    jwks_cache.load({"keys": [jwk]})
+    assert authorize(token) == "Allow"
+    assert len(decision_cache) == 1
+
+
+def test_revoked_dynamo_token_denied_after_token_ttl(fake_aws, decision_cache, monkeypatch):
+    """Tests that a token revoked in DynamoDB is denied once its cached token decision expires"""
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    handler, table = get_handler({TOKEN.split(" ")[1]: {}})
+    monkeypatch.setattr(lambda_authorizer, "AUTHORIZER_CLASS", AwsIoTDynamoAuthorizer)
+    monkeypatch.setitem(generic._token_authorization_handlers, DynamoTokenAuthorizationHandler, handler)
+
+    assert authorize() == "Allow"
+    table.items[handler.token_key(TOKEN.split(" ")[1])] = {"revoked": {"BOOL": True}}
+
+    now[0] += handler.cache.ttl - 1
+    assert authorize() == "Allow"
+
+    now[0] += 1
+    assert authorize() == "Deny"
+    assert len(table.requested_keys) == 2
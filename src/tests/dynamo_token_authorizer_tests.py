@@ -0,0 +1,98 @@
+import time
+
+from handlers.authorization.dynamo.tokens import DynamoTokenAuthorizationHandler
+from handlers.cache import LruCache
+
+
+class LocalDynamoTable:
+    """Local stand-in of the DynamoDB client for the tokens table, answers BatchGetItem from a dictionary"""
+
+    def __init__(self, table_name, items, unprocessed_calls=0):
+        self.table_name = table_name
+        self.items = items
+        self.unprocessed_calls = unprocessed_calls
+        self.requested_keys = []
+
+    def batch_get_item(self, RequestItems):
+        keys = [key["tokenHash"]["S"] for key in RequestItems[self.table_name]["Keys"]]
+        self.requested_keys.append(keys)
+        if self.unprocessed_calls:
+            self.unprocessed_calls -= 1
+            return {"Responses": {self.table_name: []}, "UnprocessedKeys": RequestItems}
+
+        responses = [dict(self.items[key], tokenHash={"S": key}) for key in keys if key in self.items]
+        return {"Responses": {self.table_name: responses}, "UnprocessedKeys": {}}
+
+
+def get_handler(items, **kwargs):
+    table = LocalDynamoTable(
+        table_name="device-tokens",
+        items={DynamoTokenAuthorizationHandler.token_key(token): item for token, item in items.items()},
+        **kwargs,
+    )
+    handler = DynamoTokenAuthorizationHandler(
+        table_name="device-tokens", cache=LruCache(max_size=16, ttl=60), negative_ttl=10, dynamodb_client=table
+    )
+    return handler, table
+
+
+def test_valid_token_is_cached():
+    """Tests that a valid token is read once and then served from the cache"""
+    handler, table = get_handler({"valid": {}})
+
+    assert handler.authorize("valid") is True
+    assert handler.authorize("valid") is True
+    assert len(table.requested_keys) == 1
+
+
+def test_unknown_token_is_negatively_cached():
+    """Tests that unknown tokens are denied and not read again while cached"""
+    handler, table = get_handler({"valid": {}})
+
+    assert handler.authorize("unknown") is False
+    assert handler.authorize("unknown") is False
+    assert len(table.requested_keys) == 1
+
+
+def test_revoked_and_expired_tokens():
+    """Tests that revoked and expired tokens are denied"""
+    handler, _ = get_handler(
+        {"revoked": {"revoked": {"BOOL": True}}, "expired": {"expiresAt": {"N": str(round(time.time()) - 1)}}}
+    )
+
+    assert handler.authorize("revoked") is False
+    assert handler.authorize("expired") is False
+
+
+def test_warm_up_uses_batches():
+    """Tests that warm up reads the tokens in batches of 100 keys"""
+    tokens = [f"token-{index}" for index in range(150)]
+    handler, table = get_handler({token: {} for token in tokens})
+    handler.cache = LruCache(max_size=200, ttl=60)
+
+    decisions = handler.warm_up(tokens)
+
+    assert len(decisions) == 150 and all(decisions.values())
+    assert [len(keys) for keys in table.requested_keys] == [100, 50]
+    assert handler.authorize("token-149") is True
+    assert len(table.requested_keys) == 2
+
+
+def test_stale_tokens_are_revalidated_together():
+    """Tests that a cache miss revalidates the expired decisions in the same request"""
+    handler, table = get_handler({"first": {}, "second": {}})
+    handler.cache.ttl = 0.01
+
+    handler.authorize("first")
+    time.sleep(0.02)
+    handler.authorize("second")
+
+    assert set(table.requested_keys[-1]) == {handler.token_key("second"), handler.token_key("first")}
+
+
+def test_unprocessed_keys_are_retried():
+    """Tests that unprocessed keys of a batch are requested again"""
+    handler, table = get_handler({"valid": {}}, unprocessed_calls=1)
+
+    assert handler.authorize("valid") is True
+    assert len(table.requested_keys) == 2
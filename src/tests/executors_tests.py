@@ -0,0 +1,78 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from handlers.exceptions import StepExecutionError
+from handlers.executors import Step, StepGraphExecutor
+
+
+@pytest.fixture
+def thread_pool():
+    thread_pool = ThreadPoolExecutor(max_workers=4)
+    yield thread_pool
+    thread_pool.shutdown(wait=True)
+
+
+def test_steps_receive_dependency_results(thread_pool):
+    """Tests that a step starts once its dependencies completed and receives their results"""
+    steps = [
+        Step("total", lambda results: results["a"] + results["b"], depends_on=("a", "b")),
+        Step("a", lambda _: 1),
+        Step("b", lambda results: 2),
+    ]
+
+    assert StepGraphExecutor(steps, thread_pool=thread_pool).execute() == {"a": 1, "b": 2, "total": 3}
+
+
+def test_independent_steps_run_concurrently(thread_pool):
+    """Tests that independent steps run at the same time, each one waits for the other to start"""
+    barrier = threading.Barrier(2, timeout=5)
+    steps = [Step("first", lambda _: barrier.wait()), Step("second", lambda _: barrier.wait())]
+
+    assert sorted(StepGraphExecutor(steps, thread_pool=thread_pool).execute()) == ["first", "second"]
+
+
+def test_invalid_graphs():
+    """Tests that unknown dependencies and cycles are rejected before any step runs"""
+    with pytest.raises(ValueError, match="unknown step"):
+        StepGraphExecutor([Step("a", lambda _: 1, depends_on=("missing",))])
+
+    with pytest.raises(ValueError, match="cycle"):
+        StepGraphExecutor([Step("a", lambda _: 1, depends_on=("b",)), Step("b", lambda _: 2, depends_on=("a",))])
+
+
+def test_failure_stops_new_steps(thread_pool):
+    """Tests that no step starts after a failure, the running steps finish and the first failure is raised"""
+    started = list()
+    failure_done = threading.Event()
+
+    def fail(_):
+        raise RuntimeError("boom")
+
+    def slow(_):
+        failure_done.wait(timeout=5)
+        started.append("slow")
+        return "slow"
+
+    def after(_):
+        started.append("after")
+
+    class Pool:
+        """Thread pool releasing the slow step once the failed step is done"""
+
+        def submit(self, function, results):
+            future = thread_pool.submit(function, results)
+            if function is fail:
+                future.add_done_callback(lambda _: failure_done.set())
+            return future
+
+    steps = [Step("fail", fail), Step("slow", slow), Step("after", after, depends_on=("slow",))]
+    executor = StepGraphExecutor(steps, thread_pool=Pool())
+
+    with pytest.raises(StepExecutionError, match="Step fail failed") as error:
+        executor.execute()
+
+    assert isinstance(error.value.__cause__, RuntimeError)
+    assert started == ["slow"]
+    assert executor.results == {"slow": "slow"}
@@ -0,0 +1,49 @@
+import json
+import uuid
+
+from applications.aws_lambda.basic.lambda_register import lambda_handler as register_handler
+
+
+def registration_event(thing_name: str) -> dict:
+    return {
+        "httpMethod": "POST",
+        "resource": "/register",
+        "body": json.dumps({"thingName": thing_name, "accountToken": "token", "version": "1"}),
+    }
+
+
+def test_registration_recovers_from_throttling(fake_aws):
+    """Tests that throttled AWS IoT calls are retried and the registration still succeeds"""
+    fake_aws.fail("create_thing", code="ThrottlingException", count=2)
+
+    result = register_handler(event=registration_event(f"thing-{uuid.uuid4().hex[:8]}"), context={})
+
+    assert result["statusCode"] == 200
+    assert fake_aws.calls["iot.create_thing"] == 3
+
+
+def test_registration_rolls_back_on_error(fake_aws):
+    """Tests that a failed registration deletes the resources it created"""
+    fake_aws.fail("attach_policy", code="InvalidRequestException")
+    thing_name = f"thing-{uuid.uuid4().hex[:8]}"
+
+    result = register_handler(event=registration_event(thing_name), context={})
+
+    assert result["statusCode"] == 400
+    assert thing_name not in fake_aws.iot.things
+    assert not fake_aws.iot.certificates
+
+
+def test_registration_benchmark(fake_aws):
+    """Offline benchmark of the registration pipeline, counting the AWS IoT calls of every registration"""
+    number = 20
+    list_calls = fake_aws.calls["iot.list_thing_types"]
+
+    for index in range(number):
+        assert register_handler(event=registration_event(f"bench-{index}"), context={})["statusCode"] == 200
+
+    assert len(fake_aws.iot.things) == number
+    for operation in ("describe_thing", "create_keys_and_certificate", "create_thing", "attach_thing_principal"):
+        assert fake_aws.calls[f"iot.{operation}"] == number
+    assert fake_aws.calls["iot.get_policy"] <= number
+    assert fake_aws.calls["iot.list_thing_types"] == list_calls
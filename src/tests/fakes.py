@@ -0,0 +1,561 @@
+"""
+Deterministic in memory fake of the AWS APIs used by the handlers: AWS IoT, SSM Parameter Store, STS and Cognito User
+Pools. Installed in the client registry it lets the whole registration and authorization pipelines run and be
+benchmarked without network, with configurable per call latency and injected errors or throttling.
+"""
+import base64
+import collections
+import hashlib
+import itertools
+import re
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from handlers.aws.clients import CLIENTS
+
+
+def camel_case(operation: str) -> str:
+    """
+    :param operation: boto3 operation name, like "create_thing".
+    :return: API operation name, like "CreateThing".
+    """
+    return "".join(part.capitalize() for part in operation.split("_"))
+
+
+class FakeAwsBackend:
+    """
+    State shared by the fake clients, with the latency, errors and throttling injected in their calls. Every call is
+    counted by service and operation.
+    """
+
+    def __init__(self, region: str = "us-east-1", account_id: str = "123456789012", latency: float = 0.0):
+        """
+        :param region: AWS region used in the ARNs.
+        :param account_id: AWS account id used in the ARNs and returned by STS.
+        :param latency: Seconds that every call sleeps, overridden per operation with set_latency.
+        """
+        self.region = region
+        self.account_id = account_id
+        self.calls = collections.Counter()
+        self._latencies = {"*": latency}
+        self._errors = collections.defaultdict(collections.deque)
+        self._rate_limits = dict()
+        self._call_times = collections.defaultdict(collections.deque)
+        self._lock = threading.RLock()
+
+        self.iot = FakeIoTClient(self)
+        self.ssm = FakeSsmClient(self)
+        self.sts = FakeStsClient(self)
+        self.cognito = FakeCognitoClient(self)
+
+    def set_latency(self, seconds: float, operation: str = "*"):
+        """
+        :param seconds: Seconds that the calls sleep before answering.
+        :param operation: boto3 operation name, or "*" for every operation without its own latency.
+        """
+        self._latencies[operation] = seconds
+
+    def fail(self, operation: str, code: str = "ThrottlingException", count: int = 1):
+        """
+        Makes the next calls of the operation raise a ClientError.
+        :param operation: boto3 operation name.
+        :param code: Error code of the raised ClientError.
+        :param count: Number of calls that fail.
+        """
+        with self._lock:
+            self._errors[operation].extend([code] * count)
+
+    def throttle(self, operation: str, rate: float):
+        """
+        Makes the calls of the operation above the rate raise ThrottlingException, like an AWS account quota.
+        :param operation: boto3 operation name.
+        :param rate: Calls per second accepted within any one second window.
+        """
+        self._rate_limits[operation] = rate
+
+    def request(self, service_name: str, operation: str):
+        """
+        Called by the fake clients before answering: counts the call, applies the latency and raises the injected
+        errors.
+        """
+        with self._lock:
+            self.calls[f"{service_name}.{operation}"] += 1
+            error_code = self._errors[operation].popleft() if self._errors.get(operation) else None
+            rate = self._rate_limits.get(operation)
+            if error_code is None and rate is not None:
+                now = time.monotonic()
+                call_times = self._call_times[operation]
+                while call_times and now - call_times[0] >= 1:
+                    call_times.popleft()
+                if len(call_times) >= rate:
+                    error_code = "ThrottlingException"
+                else:
+                    call_times.append(now)
+
+        latency = self._latencies.get(operation, self._latencies["*"])
+        if latency:
+            time.sleep(latency)
+
+        if error_code is not None:
+            raise self.error(operation, error_code)
+
+    @staticmethod
+    def error(operation: str, code: str, message: str = None) -> ClientError:
+        return ClientError(
+            {"Error": {"Code": code, "Message": message or code}, "ResponseMetadata": {"HTTPStatusCode": 400}},
+            camel_case(operation),
+        )
+
+    def arn(self, service_name: str, resource: str) -> str:
+        return f"arn:aws:{service_name}:{self.region}:{self.account_id}:{resource}"
+
+    def clients(self) -> dict:
+        """
+        :return: Fake clients by boto3 service name.
+        """
+        return {"iot": self.iot, "ssm": self.ssm, "sts": self.sts, "cognito-idp": self.cognito}
+
+    def install(self, registry=CLIENTS):
+        """
+        Injects the fake clients in the client registry, handlers created afterwards call the fake.
+        :param registry: Client registry, the process wide one by default.
+        """
+        registry.inject(self.clients(), region=self.region, account_id=self.account_id)
+
+    @staticmethod
+    def uninstall(registry=CLIENTS):
+        registry.reset()
+
+
+class FakeClient:
+    service_name = None
+
+    def __init__(self, backend: FakeAwsBackend):
+        self.backend = backend
+
+    def _request(self, operation: str):
+        self.backend.request(self.service_name, operation)
+
+    def _error(self, operation: str, code: str, message: str = None) -> ClientError:
+        return self.backend.error(operation, code, message)
+
+
+class FakeIoTClient(FakeClient):
+    """
+    Things, Thing Types, certificates, policies and their attachments, plus a fleet index search supporting
+    "field:value" terms with a trailing "*" wildcard.
+    """
+
+    service_name = "iot"
+    PAGE_SIZE = 100
+
+    def __init__(self, backend: FakeAwsBackend):
+        super(FakeIoTClient, self).__init__(backend)
+        self.things = dict()
+        self.thing_types = dict()
+        self.certificates = dict()
+        self.policies = dict()
+        self.thing_principals = collections.defaultdict(set)
+        self.policy_targets = collections.defaultdict(set)
+        self._sequence = itertools.count(1)
+
+    def _next_id(self) -> str:
+        return hashlib.sha256(f"{self.backend.account_id}:{next(self._sequence)}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _pem(label: str, seed: str, size: int) -> str:
+        content = base64.b64encode(hashlib.shake_256(f"{label}:{seed}".encode("utf-8")).digest(size)).decode()
+        lines = [content[index : index + 64] for index in range(0, len(content), 64)]
+        return "\n".join([f"-----BEGIN {label}-----", *lines, f"-----END {label}-----", ""])
+
+    def _page(self, items: list, next_token: str, max_results: int) -> tuple:
+        start = int(next_token or 0)
+        end = start + (max_results or self.PAGE_SIZE)
+        return items[start:end], (str(end) if end < len(items) else None)
+
+    def _add_certificate(self, certificate_pem: str, status: str) -> dict:
+        certificate_id = self._next_id()
+        certificate = dict(
+            certificateId=certificate_id,
+            certificateArn=self.backend.arn("iot", f"cert/{certificate_id}"),
+            certificatePem=certificate_pem,
+            status=status,
+        )
+        self.certificates[certificate_id] = certificate
+        return certificate
+
+    def _certificate(self, operation: str, certificate_id: str) -> dict:
+        certificate = self.certificates.get(certificate_id)
+        if certificate is None:
+            raise self._error(operation, "ResourceNotFoundException", f"Certificate {certificate_id} not found")
+        return certificate
+
+    def _thing(self, operation: str, thing_name: str) -> dict:
+        thing = self.things.get(thing_name)
+        if thing is None:
+            raise self._error(operation, "ResourceNotFoundException", f"Thing {thing_name} not found")
+        return thing
+
+    def create_thing_type(self, thingTypeName: str, thingTypeProperties: dict = None):
+        self._request("create_thing_type")
+        with self.backend._lock:
+            thing_type = self.thing_types.setdefault(
+                thingTypeName,
+                dict(thingTypeName=thingTypeName, thingTypeArn=self.backend.arn("iot", f"thingtype/{thingTypeName}")),
+            )
+        return dict(thing_type)
+
+    def list_thing_types(self, maxResults: int = None, nextToken: str = None, thingTypeName: str = None):
+        self._request("list_thing_types")
+        names = [name for name in self.thing_types if thingTypeName is None or name == thingTypeName]
+        page, next_token = self._page(names, nextToken, maxResults)
+        response = dict(thingTypes=[dict(self.thing_types[name]) for name in page])
+        if next_token is not None:
+            response["nextToken"] = next_token
+        return response
+
+    def create_thing(self, thingName: str, thingTypeName: str = None, attributePayload: dict = None):
+        self._request("create_thing")
+        attributes = dict((attributePayload or {}).get("attributes", {}))
+        with self.backend._lock:
+            if thingTypeName is not None and thingTypeName not in self.thing_types:
+                raise self._error("create_thing", "ResourceNotFoundException", f"Thing type {thingTypeName} not found")
+
+            thing = self.things.get(thingName)
+            if thing is not None:
+                if thing.get("thingTypeName") != thingTypeName or thing["attributes"] != attributes:
+                    raise self._error("create_thing", "ResourceAlreadyExistsException", f"Thing {thingName} exists")
+            else:
+                thing = dict(
+                    thingName=thingName,
+                    thingId=self._next_id()[:36],
+                    thingArn=self.backend.arn("iot", f"thing/{thingName}"),
+                    attributes=attributes,
+                    version=1,
+                )
+                if thingTypeName is not None:
+                    thing["thingTypeName"] = thingTypeName
+                self.things[thingName] = thing
+
+        return dict(thingName=thingName, thingArn=thing["thingArn"], thingId=thing["thingId"])
+
+    def describe_thing(self, thingName: str):
+        self._request("describe_thing")
+        thing = self._thing("describe_thing", thingName)
+        return dict(thing, defaultClientId=thingName, attributes=dict(thing["attributes"]))
+
+    def delete_thing(self, thingName: str, expectedVersion: int = None):
+        self._request("delete_thing")
+        with self.backend._lock:
+            if self.thing_principals.get(thingName):
+                raise self._error("delete_thing", "InvalidRequestException", f"Thing {thingName} has principals")
+            self.things.pop(thingName, None)
+        return dict()
+
+    def create_keys_and_certificate(self, setAsActive: bool = False):
+        self._request("create_keys_and_certificate")
+        with self.backend._lock:
+            seed = self._next_id()
+            certificate = self._add_certificate(
+                certificate_pem=self._pem("CERTIFICATE", seed, 900), status="ACTIVE" if setAsActive else "INACTIVE"
+            )
+        return dict(
+            certificateArn=certificate["certificateArn"],
+            certificateId=certificate["certificateId"],
+            certificatePem=certificate["certificatePem"],
+            keyPair=dict(
+                PublicKey=self._pem("PUBLIC KEY", seed, 294),
+                PrivateKey=self._pem("RSA PRIVATE KEY", seed, 1190),
+            ),
+        )
+
+    def create_certificate_from_csr(self, certificateSigningRequest: str, setAsActive: bool = False):
+        self._request("create_certificate_from_csr")
+        if "CERTIFICATE REQUEST" not in certificateSigningRequest:
+            raise self._error("create_certificate_from_csr", "InvalidRequestException", "Invalid CSR")
+
+        with self.backend._lock:
+            certificate = self._add_certificate(
+                certificate_pem=self._pem("CERTIFICATE", certificateSigningRequest, 900),
+                status="ACTIVE" if setAsActive else "INACTIVE",
+            )
+        return dict(
+            certificateArn=certificate["certificateArn"],
+            certificateId=certificate["certificateId"],
+            certificatePem=certificate["certificatePem"],
+        )
+
+    def register_certificate_without_ca(self, certificatePem: str, status: str = "INACTIVE"):
+        self._request("register_certificate_without_ca")
+        with self.backend._lock:
+            certificate = self._add_certificate(certificate_pem=certificatePem, status=status)
+        return dict(certificateArn=certificate["certificateArn"], certificateId=certificate["certificateId"])
+
+    def update_certificate(self, certificateId: str, newStatus: str):
+        self._request("update_certificate")
+        with self.backend._lock:
+            self._certificate("update_certificate", certificateId)["status"] = newStatus
+        return dict()
+
+    def delete_certificate(self, certificateId: str, forceDelete: bool = False):
+        self._request("delete_certificate")
+        with self.backend._lock:
+            certificate = self._certificate("delete_certificate", certificateId)
+            if certificate["status"] == "ACTIVE":
+                raise self._error("delete_certificate", "CertificateStateException", "Certificate is active")
+
+            arn = certificate["certificateArn"]
+            attached = any(arn in targets for targets in self.policy_targets.values()) or any(
+                arn in principals for principals in self.thing_principals.values()
+            )
+            if attached and not forceDelete:
+                raise self._error("delete_certificate", "DeleteConflictException", "Certificate is attached")
+
+            for targets in self.policy_targets.values():
+                targets.discard(arn)
+            del self.certificates[certificateId]
+        return dict()
+
+    def create_policy(self, policyName: str, policyDocument: str):
+        self._request("create_policy")
+        with self.backend._lock:
+            if policyName in self.policies:
+                raise self._error("create_policy", "ResourceAlreadyExistsException", f"Policy {policyName} exists")
+            self.policies[policyName] = dict(
+                policyName=policyName,
+                policyArn=self.backend.arn("iot", f"policy/{policyName}"),
+                policyDocument=policyDocument,
+                defaultVersionId="1",
+            )
+        return dict(self.policies[policyName])
+
+    def get_policy(self, policyName: str):
+        self._request("get_policy")
+        policy = self.policies.get(policyName)
+        if policy is None:
+            raise self._error("get_policy", "ResourceNotFoundException", f"Policy {policyName} not found")
+        return dict(policy)
+
+    def attach_policy(self, policyName: str, target: str):
+        self._request("attach_policy")
+        with self.backend._lock:
+            if policyName not in self.policies:
+                raise self._error("attach_policy", "ResourceNotFoundException", f"Policy {policyName} not found")
+            self.policy_targets[policyName].add(target)
+        return dict()
+
+    def detach_policy(self, policyName: str, target: str):
+        self._request("detach_policy")
+        with self.backend._lock:
+            self.policy_targets[policyName].discard(target)
+        return dict()
+
+    def attach_thing_principal(self, thingName: str, principal: str):
+        self._request("attach_thing_principal")
+        with self.backend._lock:
+            self._thing("attach_thing_principal", thingName)
+            self.thing_principals[thingName].add(principal)
+        return dict()
+
+    def detach_thing_principal(self, thingName: str, principal: str):
+        self._request("detach_thing_principal")
+        with self.backend._lock:
+            self.thing_principals[thingName].discard(principal)
+        return dict()
+
+    def list_thing_principals(self, thingName: str, maxResults: int = None, nextToken: str = None):
+        self._request("list_thing_principals")
+        self._thing("list_thing_principals", thingName)
+        page, next_token = self._page(sorted(self.thing_principals.get(thingName, ())), nextToken, maxResults)
+        response = dict(principals=page)
+        if next_token is not None:
+            response["nextToken"] = next_token
+        return response
+
+    @staticmethod
+    def _matches(thing: dict, query: str) -> bool:
+        for term in query.split():
+            if term == "*" or term.upper() == "AND":
+                continue
+            field, _, expected = term.partition(":")
+            if field.startswith("attributes."):
+                value = thing["attributes"].get(field[len("attributes.") :])
+            else:
+                value = thing.get(field)
+            if value is None:
+                return False
+            if expected.endswith("*"):
+                if not str(value).startswith(expected[:-1]):
+                    return False
+            elif str(value) != expected:
+                return False
+        return True
+
+    def search_index(self, queryString: str, indexName: str = "AWS_Things", nextToken: str = None, maxResults=None):
+        self._request("search_index")
+        matches = [thing for thing in self.things.values() if self._matches(thing, queryString)]
+        page, next_token = self._page(matches, nextToken, maxResults)
+        response = dict(
+            things=[
+                {key: thing[key] for key in ("thingName", "thingId", "thingTypeName", "attributes") if key in thing}
+                for thing in page
+            ]
+        )
+        if next_token is not None:
+            response["nextToken"] = next_token
+        return response
+
+
+class FakeSsmClient(FakeClient):
+    """
+    String parameters with versions.
+    """
+
+    service_name = "ssm"
+
+    def __init__(self, backend: FakeAwsBackend):
+        super(FakeSsmClient, self).__init__(backend)
+        self.parameters = dict()
+
+    def put_parameter(self, Name: str, Value: str, Type: str = "String", Overwrite: bool = False, **kwargs):
+        self._request("put_parameter")
+        with self.backend._lock:
+            parameter = self.parameters.get(Name)
+            if parameter is not None and not Overwrite:
+                raise self._error("put_parameter", "ParameterAlreadyExists", f"Parameter {Name} exists")
+
+            version = 1 if parameter is None else parameter["Version"] + 1
+            self.parameters[Name] = dict(
+                Name=Name,
+                Type=Type,
+                Value=Value,
+                Version=version,
+                ARN=self.backend.arn("ssm", f"parameter{Name}"),
+            )
+        return dict(Version=version)
+
+    def get_parameter(self, Name: str, WithDecryption: bool = False):
+        self._request("get_parameter")
+        parameter = self.parameters.get(Name)
+        if parameter is None:
+            raise self._error("get_parameter", "ParameterNotFound", f"Parameter {Name} not found")
+        return dict(Parameter=dict(parameter))
+
+    def get_parameters_by_path(self, Path: str, Recursive: bool = False, **kwargs):
+        self._request("get_parameters_by_path")
+        prefix = Path.rstrip("/") + "/"
+        parameters = [
+            dict(parameter)
+            for name, parameter in sorted(self.parameters.items())
+            if name.startswith(prefix) and (Recursive or "/" not in name[len(prefix) :])
+        ]
+        return dict(Parameters=parameters)
+
+
+class FakeStsClient(FakeClient):
+    service_name = "sts"
+
+    def get_caller_identity(self):
+        self._request("get_caller_identity")
+        return dict(
+            UserId="AIDAFAKEUSER",
+            Account=self.backend.account_id,
+            Arn=f"arn:aws:iam::{self.backend.account_id}:user/fake",
+        )
+
+
+class FakeCognitoClient(FakeClient):
+    """
+    Users of any user pool, with the list filters "attribute = 'value'" and "attribute ^= 'value'".
+    """
+
+    service_name = "cognito-idp"
+    FILTER_PATTERN = re.compile(r"""^\s*(\w+)\s*(\^?=)\s*["'](.*)["']\s*$""")
+
+    def __init__(self, backend: FakeAwsBackend):
+        super(FakeCognitoClient, self).__init__(backend)
+        self.users = collections.defaultdict(dict)
+        self.access_tokens = dict()
+
+    def admin_create_user(self, UserPoolId: str, Username: str, UserAttributes: list = (), **kwargs):
+        self._request("admin_create_user")
+        with self.backend._lock:
+            if Username in self.users[UserPoolId]:
+                raise self._error("admin_create_user", "UsernameExistsException", f"User {Username} exists")
+            user = dict(
+                Username=Username,
+                Attributes=[dict(attribute) for attribute in UserAttributes],
+                Enabled=True,
+                UserStatus="CONFIRMED",
+            )
+            self.users[UserPoolId][Username] = user
+        return dict(User=dict(user))
+
+    def add_access_token(self, UserPoolId: str, Username: str, AccessToken: str):
+        """
+        Not an AWS API, makes get_user answer for the access token.
+        """
+        self.access_tokens[AccessToken] = (UserPoolId, Username)
+
+    def _user(self, operation: str, user_pool_id: str, username: str) -> dict:
+        user = self.users.get(user_pool_id, {}).get(username)
+        if user is None:
+            raise self._error(operation, "UserNotFoundException", "User does not exist.")
+        return user
+
+    def admin_get_user(self, UserPoolId: str, Username: str):
+        self._request("admin_get_user")
+        user = self._user("admin_get_user", UserPoolId, Username)
+        return dict(
+            Username=user["Username"],
+            UserAttributes=[dict(attribute) for attribute in user["Attributes"]],
+            Enabled=user["Enabled"],
+            UserStatus=user["UserStatus"],
+        )
+
+    def get_user(self, AccessToken: str):
+        self._request("get_user")
+        if AccessToken not in self.access_tokens:
+            raise self._error("get_user", "NotAuthorizedException", "Invalid Access Token")
+        user = self._user("get_user", *self.access_tokens[AccessToken])
+        return dict(Username=user["Username"], UserAttributes=[dict(attribute) for attribute in user["Attributes"]])
+
+    def list_users(
+        self, UserPoolId: str, AttributesToGet: list = None, Limit: int = 60, PaginationToken: str = None, Filter=""
+    ):
+        self._request("list_users")
+        users = list(self.users.get(UserPoolId, {}).values())
+        if Filter:
+            match = self.FILTER_PATTERN.match(Filter)
+            if match is None:
+                raise self._error("list_users", "InvalidParameterException", f"Invalid filter {Filter}")
+            name, operator, expected = match.groups()
+
+            def matches(user):
+                value = {attribute["Name"]: attribute["Value"] for attribute in user["Attributes"]}.get(name)
+                if name == "username":
+                    value = user["Username"]
+                return value is not None and (value.startswith(expected) if operator == "^=" else value == expected)
+
+            users = [user for user in users if matches(user)]
+
+        start = int(PaginationToken or 0)
+        page = users[start : start + Limit]
+        response = dict(Users=[])
+        for user in page:
+            attributes = user["Attributes"]
+            if AttributesToGet is not None:
+                attributes = [attribute for attribute in attributes if attribute["Name"] in AttributesToGet]
+            response["Users"].append(
+                dict(
+                    Username=user["Username"],
+                    Attributes=[dict(attribute) for attribute in attributes],
+                    Enabled=user["Enabled"],
+                    UserStatus=user["UserStatus"],
+                )
+            )
+        if start + Limit < len(users):
+            response["PaginationToken"] = str(start + Limit)
+        return response
@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+SRC_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = {
+    "applications.aws_lambda.basic.lambda_authorizer": ("boto3", "botocore", "requests", "cryptography"),
+    "applications.aws_lambda.basic.lambda_register": ("boto3", "requests", "cryptography"),
+}
+"""
+Lambda entry points and the heavy packages that must not be imported until first use.
+"""
+
+
+def import_entry_point(module: str) -> tuple:
+    """
+    Imports the module in a new interpreter with -X importtime.
+    :return: Cumulative import time of the module in milliseconds; Names of the imported top level packages.
+    """
+    script = f"import sys, {module}; print(' '.join(sorted({{name.split('.')[0] for name in sys.modules}})))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        cwd=SRC_PATH,
+        env=dict(os.environ, PYTHONPATH=SRC_PATH, AWS_DEFAULT_REGION="us-east-1"),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            cumulative_us = int(parts[1])
+
+    return cumulative_us / 1000, set(result.stdout.split())
+
+
+@pytest.mark.parametrize("module", sorted(ENTRY_POINTS))
+def test_entry_point_import_time(module):
+    """Tracks the cold start import cost of the Lambda entry points, heavy packages are imported on first use"""
+    import_time_ms, packages = import_entry_point(module)
+
+    assert not packages.intersection(ENTRY_POINTS[module])
+
+    budget_ms = os.environ.get("IMPORT_TIME_BUDGET_MS")
+    if budget_ms is not None:
+        assert import_time_ms < float(budget_ms)
+
+
+def test_lazy_aws_exports():
+    """Tests that handlers.aws imports a service module on first access of one of its names only"""
+    script = (
+        "import sys, handlers.aws as aws; "
+        "before = 'handlers.aws.iot' in sys.modules; "
+        "thing_handler = aws.ThingHandler; "
+        "from handlers.aws.iot import ThingHandler; "
+        "print(before, 'handlers.aws.iot' in sys.modules, thing_handler is ThingHandler)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=SRC_PATH,
+        env=dict(os.environ, PYTHONPATH=SRC_PATH, AWS_DEFAULT_REGION="us-east-1"),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.split() == ["False", "True", "True"]
+
+
+def test_unknown_aws_export():
+    """Tests that a name not exported by handlers.aws raises AttributeError"""
+    import handlers.aws
+
+    with pytest.raises(AttributeError):
+        handlers.aws.Unknown
+
+    assert "ThingHandler" in dir(handlers.aws)
+    assert "FakeAwsBackend" not in dir(handlers.aws)
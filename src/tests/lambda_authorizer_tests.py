@@ -1,7 +1,4 @@
 import json
-import os
-
-os.environ["APP_CONFIG_PATH"] = "/multa-cvm/dev/config-parameters"
 
 from handlers.utils import Logger
 from applications.aws_lambda.basic.lambda_authorizer import lambda_handler as auth_handler
@@ -17,7 +14,7 @@ invalid_token_prefix = "Token 123"
 invalid_token_composition = "DeviceToken-123"
 
 
-def test_valid_device_token():
+def test_valid_device_token(fake_aws):
     """Tests correct payload received by Authorizer Lambda"""
     token = "DeviceToken NjWO2tVh6fVAeNuLwRsPi-c6N7SP5-DT"
     event = {
@@ -52,7 +49,7 @@ def test_valid_device_token():
             assert "register" in sub_element
 
 
-def test_invalid_device_token():
+def test_invalid_device_token(fake_aws):
     """Tests invalid device token value received by Authorizer Lambda"""
     token = "DeviceToken 123"
     event = {
@@ -87,7 +84,7 @@ def test_invalid_device_token():
             assert "*" in sub_element
 
 
-def test_invalid_token_prefix():
+def test_invalid_token_prefix(fake_aws):
     """Tests invalid token prefix received by Authorizer Lambda"""
     token = "Token 123"
     event = {
@@ -122,7 +119,7 @@ def test_invalid_token_prefix():
             assert "*" in sub_element
 
 
-def test_invalid_token_composition():
+def test_invalid_token_composition(fake_aws):
     """Tests invalid token composition received by Authorizer Lambda"""
     token = "DeviceToken-123"
     event = {
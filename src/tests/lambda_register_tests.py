@@ -1,10 +1,9 @@
 import json
-import random
 import os
+import random
 import string
 
-os.environ["APP_CONFIG_PATH"] = "/multa-cvm/dev/config-parameters"
-
+from handlers.idempotency import RecordCipher
 from handlers.utils import Logger
 from applications.aws_lambda.basic.lambda_register import lambda_handler as register_handler
 
@@ -19,7 +18,7 @@ def generate_thing_name():
     return "".join(random.choice(letters) for i in range(10))
 
 
-def test_incorrect_payload():
+def test_incorrect_payload(fake_aws):
     """Tests incorrect payload received by Lambda"""
     event = {"httpMethod": "POST", "body": "{}"}
 
@@ -38,9 +37,12 @@ def test_incorrect_payload():
     assert json.loads(result["body"])["error"] == "Uncaught error..."
 
 
-def test_correct_thing_registration():
+def test_correct_thing_registration(fake_aws):
     """Tests correct payload received by Lambda"""
-    event = {"httpMethod": "POST", "body": {"thingName": generate_thing_name(), "version": "1"}}
+    event = {
+        "httpMethod": "POST",
+        "body": {"thingName": generate_thing_name(), "accountToken": "token", "version": "1"},
+    }
     event["body"] = json.dumps(event["body"])
 
     assert isinstance(event, dict)
@@ -58,9 +60,12 @@ def test_correct_thing_registration():
     assert isinstance(json.loads(result["body"])["rootCa"], str)
 
 
-def test_thing_registration_double():
-    """Tests event in case that AWS IoT Thing tries to register twice"""
-    event = {"httpMethod": "POST", "body": {"thingName": generate_thing_name(), "version": "1"}}
+def test_thing_registration_double(fake_aws):
+    """Tests event in case that AWS IoT Thing tries to register twice, without credentials it is never replayed"""
+    event = {
+        "httpMethod": "POST",
+        "body": {"thingName": generate_thing_name(), "accountToken": "token", "version": "1"},
+    }
     event["body"] = json.dumps(event["body"])
 
     assert isinstance(event, dict)
@@ -86,3 +91,86 @@ def test_thing_registration_double():
     assert isinstance(json.loads(result["body"])["status"], bool)
     assert json.loads(result["body"])["status"] is False
     assert json.loads(result["body"])["error"] == "Thing exists in the AWS IoT Account, exiting..."
+
+
+def registration_event(thing_name: str, credential: str = "DeviceToken NjWO2tVh6fVAeNuLwRsPi-c6N7SP5-DT") -> dict:
+    return {
+        "httpMethod": "POST",
+        "headers": {"Authorization": credential},
+        "requestContext": {"authorizer": {"principalId": "".join(credential.split(" "))}},
+        "body": json.dumps({"thingName": thing_name, "accountToken": "token", "version": "1"}),
+    }
+
+
+def test_thing_registration_retry(fake_aws):
+    """Tests that a retried registration gets the original response back without AWS IoT calls"""
+    event = registration_event(generate_thing_name())
+
+    result = register_handler(event=event, context={})
+    assert result["statusCode"] == 200
+
+    fake_aws.calls.clear()
+    retry_result = register_handler(event=event, context={})
+
+    assert retry_result["statusCode"] == 200
+    assert json.loads(retry_result["body"]) == json.loads(result["body"])
+    assert not any(name.startswith("iot.") for name in fake_aws.calls)
+
+
+def test_retry_keyed_on_idempotency_key(fake_aws):
+    """Tests that a retry with the same idempotency key is replayed and one with another key registers again"""
+    event = registration_event(generate_thing_name())
+    event["headers"]["Idempotency-Key"] = "first-attempt"
+    result = register_handler(event=event, context={})
+    assert result["statusCode"] == 200
+
+    replay_result = register_handler(event=event, context={})
+    assert replay_result["statusCode"] == 200
+    assert json.loads(replay_result["body"]) == json.loads(result["body"])
+
+    event["headers"]["Idempotency-Key"] = "second-attempt"
+    retry_result = register_handler(event=event, context={})
+
+    assert retry_result["statusCode"] == 400
+    assert json.loads(retry_result["body"])["error"] == "Thing exists in the AWS IoT Account, exiting..."
+
+
+def test_retry_with_other_credentials_is_not_replayed(fake_aws):
+    """Tests that the same body sent with other credentials never gets the stored response"""
+    thing_name = generate_thing_name()
+    result = register_handler(event=registration_event(thing_name), context={})
+    assert result["statusCode"] == 200
+
+    other_event = registration_event(thing_name, credential="DeviceToken other-device-token")
+    retry_result = register_handler(event=other_event, context={})
+
+    assert retry_result["statusCode"] == 400
+    assert "certificateData" not in json.loads(retry_result["body"])
+    assert json.loads(retry_result["body"])["error"] == "Thing exists in the AWS IoT Account, exiting..."
+
+
+def test_retry_keyed_on_authorizer_principal(fake_aws):
+    """Tests that the principal returned by the authorizer is used over the authorization header"""
+    thing_name = generate_thing_name()
+    event = registration_event(thing_name)
+    assert register_handler(event=event, context={})["statusCode"] == 200
+
+    event["headers"] = {"Authorization": "DeviceToken forged-header"}
+    assert register_handler(event=event, context={})["statusCode"] == 200
+
+    event["requestContext"]["authorizer"]["principalId"] = "DeviceTokenother-device-token"
+    assert register_handler(event=event, context={})["statusCode"] == 400
+
+
+def test_retry_of_undecryptable_registration(fake_aws, monkeypatch):
+    """Tests that a completed registration whose response can not be decrypted is rejected without AWS IoT calls"""
+    event = registration_event(generate_thing_name())
+    assert register_handler(event=event, context={})["statusCode"] == 200
+
+    monkeypatch.setattr("handlers.idempotency._default_cipher", RecordCipher(key=os.urandom(32)))
+    fake_aws.calls.clear()
+    result = register_handler(event=event, context={})
+
+    assert result["statusCode"] == 409
+    assert "certificateData" not in json.loads(result["body"])
+    assert not any(name.startswith("iot.") for name in fake_aws.calls)
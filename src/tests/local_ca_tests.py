@@ -0,0 +1,140 @@
+import datetime
+import json
+import uuid
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from applications.aws_lambda.basic.lambda_register import lambda_handler as register_handler
+from handlers.certificates.local_ca import LocalCertificateAuthority
+from handlers.exceptions import InvalidCertificateRequest
+
+
+def generate_key():
+    return ec.generate_private_key(ec.SECP256R1(), default_backend())
+
+
+def generate_csr(key, attributes: list = None) -> str:
+    csr = (
+        x509.CertificateSigningRequestBuilder()
+        .subject_name(x509.Name([x509.NameAttribute(oid, value) for oid, value in attributes or []]))
+        .sign(key, hashes.SHA256(), default_backend())
+    )
+    return csr.public_bytes(serialization.Encoding.PEM).decode("utf-8")
+
+
+@pytest.fixture(scope="module")
+def local_ca() -> LocalCertificateAuthority:
+    key = generate_key()
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "Multa CVM Test CA")])
+    now = datetime.datetime.utcnow()
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.BasicConstraints(ca=True, path_length=0), critical=True)
+        .sign(key, hashes.SHA256(), default_backend())
+    )
+    return LocalCertificateAuthority(
+        ca_certificate_pem=certificate.public_bytes(serialization.Encoding.PEM),
+        ca_private_key_pem=key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ),
+    )
+
+
+def test_sign_certificate(local_ca):
+    """Tests that the certificate is issued by the CA for the CSR key with the thing name as only subject"""
+    key = generate_key()
+    csr = generate_csr(key, [(NameOID.COMMON_NAME, "thing-1"), (NameOID.ORGANIZATION_NAME, "Agent")])
+
+    certificate = x509.load_pem_x509_certificate(local_ca.sign(csr, thing_name="thing-1").encode(), default_backend())
+
+    assert certificate.subject == x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "thing-1")])
+    assert certificate.issuer == local_ca.ca_certificate.subject
+    assert certificate.public_key().public_numbers() == key.public_key().public_numbers()
+    local_ca.ca_certificate.public_key().verify(
+        certificate.signature, certificate.tbs_certificate_bytes, ec.ECDSA(certificate.signature_hash_algorithm)
+    )
+
+
+def test_csr_without_common_name(local_ca):
+    """Tests that a CSR without common name gets the thing name"""
+    csr = generate_csr(generate_key(), [(NameOID.ORGANIZATION_NAME, "Agent")])
+
+    certificate = x509.load_pem_x509_certificate(local_ca.sign(csr, thing_name="thing-2").encode(), default_backend())
+
+    assert certificate.subject.rfc4514_string() == "CN=thing-2"
+
+
+@pytest.mark.parametrize(
+    "csr",
+    [
+        "not a certificate signing request",
+        "-----BEGIN CERTIFICATE REQUEST-----\nAAAA\n-----END CERTIFICATE REQUEST-----\n",
+        None,
+    ],
+)
+def test_reject_invalid_csr(local_ca, csr):
+    """Tests that CSRs that can not be parsed are rejected"""
+    with pytest.raises(InvalidCertificateRequest):
+        local_ca.sign(csr, thing_name="thing")
+
+
+def test_reject_other_common_name(local_ca):
+    """Tests that a CSR for another thing is rejected"""
+    csr = generate_csr(generate_key(), [(NameOID.COMMON_NAME, "other-thing")])
+
+    with pytest.raises(InvalidCertificateRequest, match="common name"):
+        local_ca.sign(csr, thing_name="thing")
+
+
+def test_local_ca_registration_benchmark(fake_aws, local_ca, monkeypatch):
+    """Offline benchmark of registrations with agent CSRs signed by the local CA, no network or AWS IoT key pairs"""
+    monkeypatch.setattr("components.registrators.aws_iot.generic.CERTIFICATE_ISSUANCE_MODE", "local_ca")
+    monkeypatch.setattr("handlers.certificates.local_ca._local_ca", local_ca)
+    number = 10
+
+    for _ in range(number):
+        thing_name = f"bench-{uuid.uuid4().hex[:8]}"
+        body = {
+            "thingName": thing_name,
+            "accountToken": "token",
+            "version": "1",
+            "csr": generate_csr(generate_key(), [(NameOID.COMMON_NAME, thing_name)]),
+        }
+        result = register_handler(event={"httpMethod": "POST", "body": json.dumps(body)}, context={})
+
+        assert result["statusCode"] == 200
+        assert "private_key" not in json.dumps(json.loads(result["body"])["certificateData"])
+
+    assert fake_aws.calls["iot.register_certificate_without_ca"] == number
+    assert fake_aws.calls["iot.create_keys_and_certificate"] == 0
+    assert fake_aws.calls["iot.create_certificate_from_csr"] == 0
+
+
+def test_registration_with_csr_of_other_thing(fake_aws, local_ca, monkeypatch):
+    """Tests that a registration with a CSR for another thing fails and leaves no thing behind"""
+    monkeypatch.setattr("components.registrators.aws_iot.generic.CERTIFICATE_ISSUANCE_MODE", "local_ca")
+    monkeypatch.setattr("handlers.certificates.local_ca._local_ca", local_ca)
+    thing_name = f"thing-{uuid.uuid4().hex[:8]}"
+    body = {
+        "thingName": thing_name,
+        "accountToken": "token",
+        "version": "1",
+        "csr": generate_csr(generate_key(), [(NameOID.COMMON_NAME, "other-thing")]),
+    }
+
+    result = register_handler(event={"httpMethod": "POST", "body": json.dumps(body)}, context={})
+
+    assert result["statusCode"] == 400
+    assert thing_name not in fake_aws.iot.things
+    assert fake_aws.calls["iot.register_certificate_without_ca"] == 0
@@ -0,0 +1,105 @@
+import pytest
+
+from components.authorizers.api_gateway.custom.generic import AwsIoTGenericAuthorizer
+from handlers.aws.policies import (
+    POLICY_DOCUMENT_CACHE,
+    IamAuthPolicyHandler,
+    PolicyHandlerPool,
+    get_policy_handler_pool,
+)
+from handlers.utils import HttpVerb
+
+METHOD_ARN = "arn:aws:execute-api:us-east-1:112646120612:n8il2c2eic/prod/POST/register"
+TOKEN = "DeviceToken NjWO2tVh6fVAeNuLwRsPi-c6N7SP5-DT"
+
+
+def generate_policy(authorized: bool = True, method_arn: str = METHOD_ARN, token: str = TOKEN) -> dict:
+    authorizer = AwsIoTGenericAuthorizer({"type": "TOKEN", "methodArn": method_arn, "authorizationToken": token})
+    authorizer.valid_request_data = True
+    authorizer.valid_token_data = True
+    authorizer.authorization_result = authorized
+    return authorizer.generate_policy()
+
+
+def get_effects(policy: dict) -> list:
+    return [statement["Effect"] for statement in policy["policyDocument"]["Statement"]]
+
+
+def test_policy_memoized():
+    """Tests that a repeated decision is served from the policy cache as a deep copy, nested changes are not cached"""
+    POLICY_DOCUMENT_CACHE.clear()
+    hits = POLICY_DOCUMENT_CACHE.hits
+
+    policy = generate_policy()
+    policy["principalId"] = "changed"
+    policy["policyDocument"]["Statement"][0]["Effect"] = "Deny"
+    cached_policy = generate_policy()
+    cached_policy["policyDocument"]["Statement"][0]["Resource"].clear()
+
+    assert POLICY_DOCUMENT_CACHE.hits == hits + 1
+    assert cached_policy["principalId"] == "DeviceTokenNjWO2tVh6fVAeNuLwRsPi-c6N7SP5-DT"
+    assert get_effects(cached_policy) == ["Allow"]
+    assert generate_policy()["policyDocument"]["Statement"][0]["Resource"]
+
+
+def test_policy_keyed_on_decision_and_api():
+    """Tests that a deny, another principal or another stage never get a cached policy of a different request"""
+    POLICY_DOCUMENT_CACHE.clear()
+    generate_policy()
+
+    assert get_effects(generate_policy(authorized=False)) == ["Deny"]
+    assert generate_policy(token="DeviceToken other")["principalId"] == "DeviceTokenother"
+
+    resources = generate_policy(method_arn=METHOD_ARN.replace("/prod/", "/dev/"))["policyDocument"]["Statement"][0]
+    assert all("/dev/" in resource for resource in resources["Resource"])
+
+
+def test_cleared_policy_cache():
+    """Tests that policies are built again once the cache is cleared"""
+    POLICY_DOCUMENT_CACHE.clear()
+    generate_policy()
+    POLICY_DOCUMENT_CACHE.clear()
+    misses = POLICY_DOCUMENT_CACHE.misses
+
+    assert get_effects(generate_policy()) == ["Allow"]
+    assert POLICY_DOCUMENT_CACHE.misses == misses + 1
+    assert len(POLICY_DOCUMENT_CACHE) == 1
+
+
+def test_reset_policy_handler():
+    """Tests that reset restores every field so a reused handler does not keep the previous principal"""
+    handler = IamAuthPolicyHandler()
+    handler.populate("112646120612", "principal")
+    handler.stage = "prod"
+    handler.allow_method(HttpVerb.POST, "/register")
+    handler.deny_all_methods()
+
+    handler.reset()
+
+    assert handler.principal_id is None
+    assert handler.stage == "*"
+    assert handler.allow_methods == () and handler.deny_methods == ()
+    with pytest.raises(NameError):
+        handler.build()
+
+
+def test_policy_handler_pool():
+    """Tests that released handlers are reset and reused, up to the pool size"""
+    pool = PolicyHandlerPool(max_size=1)
+    first, second = pool.acquire(), pool.acquire()
+    first.populate("112646120612", "principal")
+    first.allow_method(HttpVerb.POST, "/register")
+
+    pool.release(first)
+    pool.release(second)
+
+    reused = pool.acquire()
+    assert reused is first
+    assert reused.principal_id is None and reused.allow_methods == ()
+    assert pool.acquire() is not second
+
+
+def test_process_wide_pool():
+    """Tests that authorizers share the pool of their policy handler class"""
+    assert get_policy_handler_pool(IamAuthPolicyHandler) is get_policy_handler_pool(IamAuthPolicyHandler)
+    assert get_policy_handler_pool() is AwsIoTGenericAuthorizer({}).policy_handler_pool
@@ -0,0 +1,70 @@
+import pytest
+
+from handlers.aws.iot import ProvisioningSaga
+from settings.app import ROLLBACK_RETRY_DELAY
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = list()
+    monkeypatch.setattr("handlers.aws.iot.time.sleep", sleeps.append)
+    return sleeps
+
+
+class Compensation:
+    """Compensation callable recording its calls, failing the first calls if asked to"""
+
+    def __init__(self, calls: list, name: str, failures: int = 0):
+        self.calls = calls
+        self.name = name
+        self.failures = failures
+
+    def __call__(self, **kwargs):
+        self.calls.append((self.name, kwargs))
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError(f"{self.name} failed")
+
+
+def test_rollback_in_reverse_order(sleeps):
+    """Tests that the recorded steps are undone in reverse order with their arguments, once"""
+    calls = list()
+    saga = ProvisioningSaga(thing_name="thing")
+    saga.record("create_thing", Compensation(calls, "delete_thing"), thing_name="thing")
+    saga.record("create_certificate", Compensation(calls, "delete_certificate"), certificate_arn="arn")
+    saga.record("attach_policy", Compensation(calls, "detach_policy"), policy_name="policy", certificate_arn="arn")
+
+    assert saga.rollback() is True
+    assert calls == [
+        ("detach_policy", {"policy_name": "policy", "certificate_arn": "arn"}),
+        ("delete_certificate", {"certificate_arn": "arn"}),
+        ("delete_thing", {"thing_name": "thing"}),
+    ]
+    assert sleeps == []
+
+    assert saga.rollback() is True
+    assert len(calls) == 3
+
+
+def test_compensation_retried_with_backoff(sleeps):
+    """Tests that a failing compensation is retried with exponential backoff before the next step is undone"""
+    calls = list()
+    saga = ProvisioningSaga(thing_name="thing", max_attempts=3)
+    saga.record("create_thing", Compensation(calls, "delete_thing"))
+    saga.record("create_certificate", Compensation(calls, "delete_certificate", failures=2))
+
+    assert saga.rollback() is True
+    assert [name for name, _ in calls] == ["delete_certificate"] * 3 + ["delete_thing"]
+    assert sleeps == [ROLLBACK_RETRY_DELAY, ROLLBACK_RETRY_DELAY * 2]
+
+
+def test_failed_compensation_does_not_stop_rollback(sleeps):
+    """Tests that the remaining steps are undone when one compensation keeps failing, and the rollback reports it"""
+    calls = list()
+    saga = ProvisioningSaga(thing_name="thing", max_attempts=2)
+    saga.record("create_thing", Compensation(calls, "delete_thing"))
+    saga.record("create_certificate", Compensation(calls, "delete_certificate", failures=5))
+
+    assert saga.rollback() is False
+    assert [name for name, _ in calls] == ["delete_certificate", "delete_certificate", "delete_thing"]
+    assert sleeps == [ROLLBACK_RETRY_DELAY]
@@ -0,0 +1,97 @@
+from handlers.aws.root_ca import RootCaCache
+
+PREFERRED = "https://www.amazontrust.com/repository/AmazonRootCA1.pem"
+BACKUP = "https://www.amazontrust.com/repository/AmazonRootCA3.pem"
+ROOT_CA = "-----BEGIN CERTIFICATE-----\nMIIBtjCCAVugAwIBAgITBmyf1XSXNmY/Owua2eiedgPySjAKBggqhkjOPQQDAjA5\n-----END CERTIFICATE-----\n"
+
+
+class Response:
+    def __init__(self, text: str, status_code: int = 200):
+        self.text = text
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeSession:
+    """requests session stand-in answering from a dictionary of URLs"""
+
+    def __init__(self, responses: dict):
+        self.responses = responses
+        self.urls = list()
+
+    def get(self, url, timeout=None):
+        self.urls.append(url)
+        return self.responses.get(url, Response("", status_code=404))
+
+
+def get_cache(directory, responses: dict, bundled_path: str = None) -> RootCaCache:
+    cache = RootCaCache(directory=str(directory), bundled_path=bundled_path)
+    cache._session = FakeSession(responses)
+    return cache
+
+
+def test_download_once_per_container(tmp_path):
+    """Tests that the root CA is downloaded on a cold miss only and then served from memory"""
+    cache = get_cache(tmp_path, {PREFERRED: Response(ROOT_CA)})
+
+    assert cache.get(PREFERRED, BACKUP) == ROOT_CA
+    assert cache.get(PREFERRED, BACKUP) == ROOT_CA
+    assert cache.session.urls == [PREFERRED]
+
+
+def test_file_shared_across_containers(tmp_path):
+    """Tests that a new container reads the verified /tmp file instead of downloading the root CA"""
+    get_cache(tmp_path, {PREFERRED: Response(ROOT_CA)}).get(PREFERRED, BACKUP)
+
+    cache = get_cache(tmp_path, {})
+    assert cache.get(PREFERRED, BACKUP) == ROOT_CA
+    assert cache.session.urls == []
+
+
+def test_corrupted_file_downloaded_again(tmp_path):
+    """Tests that a cache file not matching its checksum is discarded"""
+    cache = get_cache(tmp_path, {PREFERRED: Response(ROOT_CA)})
+    cache.get(PREFERRED, BACKUP)
+    with open(cache._file_path(PREFERRED), "a") as pem_file:
+        pem_file.write("tampered")
+
+    cache = get_cache(tmp_path, {PREFERRED: Response(ROOT_CA)})
+    assert cache.get(PREFERRED, BACKUP) == ROOT_CA
+    assert cache.session.urls == [PREFERRED]
+
+
+def test_bundled_root_ca(tmp_path):
+    """Tests that the root CA bundled in the package is used before any HTTP request"""
+    bundled_path = tmp_path / "AmazonRootCA1.pem"
+    bundled_path.write_text(ROOT_CA)
+    cache = get_cache(tmp_path / "cache", {}, bundled_path=str(bundled_path))
+
+    assert cache.get(PREFERRED, BACKUP) == ROOT_CA
+    assert cache.session.urls == []
+
+
+def test_backup_endpoint(tmp_path):
+    """Tests that the backup endpoint is only used when the preferred one fails, and False when both fail"""
+    cache = get_cache(tmp_path, {BACKUP: Response(ROOT_CA)})
+    assert cache.get(PREFERRED, BACKUP) == ROOT_CA
+    assert cache.session.urls == [PREFERRED, BACKUP]
+
+    cache = get_cache(tmp_path / "empty", {PREFERRED: Response("<html>maintenance</html>")})
+    assert cache.get(PREFERRED, BACKUP) is False
+
+
+def test_preferred_endpoint_recovers(tmp_path):
+    """Tests that a backup root CA served during an outage is never stored as the preferred one"""
+    backup_ca = ROOT_CA.replace("MIIBtjCC", "MIIBtjBB")
+    cache = get_cache(tmp_path, {BACKUP: Response(backup_ca)})
+
+    assert cache.get(PREFERRED, BACKUP) == backup_ca
+    assert cache.get(PREFERRED, BACKUP) == backup_ca
+    assert cache.session.urls == [PREFERRED, BACKUP, PREFERRED]
+
+    cache.session.responses[PREFERRED] = Response(ROOT_CA)
+    assert cache.get(PREFERRED, BACKUP) == ROOT_CA
+    assert get_cache(tmp_path, {}).get(PREFERRED, BACKUP) == ROOT_CA
@@ -0,0 +1,77 @@
+import threading
+
+from handlers.aws.iot import ThingHandler
+
+
+def create_things(fake_aws, count: int):
+    for index in range(count):
+        fake_aws.iot.create_thing(
+            thingName=f"thing-{index:04d}",
+            thingTypeName="CvmGenericType",
+            attributePayload={"attributes": {"version": str(index % 3)}},
+        )
+    fake_aws.calls.clear()
+
+
+def test_every_page_is_returned(fake_aws):
+    """Tests that the search follows the pagination and that projected fields are the only ones returned"""
+    create_things(fake_aws, 250)
+    thing_handler = ThingHandler()
+
+    assert len(thing_handler.search_things("thingTypeName:CvmGenericType")) == 250
+    assert fake_aws.calls["iot.search_index"] == 3
+
+    things = list(thing_handler.iter_things("attributes.version:1", page_size=50, fields=("thingName",)))
+    assert len(things) == 83
+    assert things[0] == {"thingName": "thing-0001"}
+
+
+def test_early_termination(fake_aws):
+    """Tests that pages past the limit or after the generator is closed are not requested"""
+    create_things(fake_aws, 250)
+    thing_handler = ThingHandler()
+
+    assert len(list(thing_handler.iter_things("thingName:thing-*", page_size=100, limit=150))) == 150
+    assert fake_aws.calls["iot.search_index"] == 2
+
+    fake_aws.calls.clear()
+    things = thing_handler.iter_things("thingName:thing-*", page_size=100, prefetch=False)
+    assert next(things)["thingName"] == "thing-0000"
+    things.close()
+    assert fake_aws.calls["iot.search_index"] == 1
+
+
+def record_next_pages(thing_handler: ThingHandler) -> threading.Event:
+    """
+    :return: Event set when the handler requests a page after the first one.
+    """
+    next_page_requested = threading.Event()
+    search_page = thing_handler._search_page
+
+    def recording_search_page(query, page_size, next_token=None):
+        if next_token is not None:
+            next_page_requested.set()
+        return search_page(query, page_size, next_token)
+
+    thing_handler._search_page = recording_search_page
+    return next_page_requested
+
+
+def test_prefetch_overlaps_consumer(fake_aws):
+    """Tests that the next page is requested while the consumer still holds the first one, and only with prefetch"""
+    create_things(fake_aws, 300)
+    thing_handler = ThingHandler()
+
+    next_page_requested = record_next_pages(thing_handler)
+    things = thing_handler.iter_things("thingName:thing-*", page_size=100, fields=("thingName",), prefetch=True)
+    assert next(things) == {"thingName": "thing-0000"}
+    assert next_page_requested.wait(timeout=5)
+    assert len(list(things)) == 299
+
+    next_page_requested = record_next_pages(thing_handler)
+    things = thing_handler.iter_things("thingName:thing-*", page_size=100, fields=("thingName",), prefetch=False)
+    assert [next(things) for _ in range(100)][-1] == {"thingName": "thing-0099"}
+    assert not next_page_requested.is_set()
+    assert len(list(things)) == 200
+
+    assert fake_aws.calls["iot.search_index"] == 6
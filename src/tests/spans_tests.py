@@ -0,0 +1,72 @@
+import json
+
+from handlers.metrics import NOOP_SPAN, SpanRecorder, emit_distributions
+
+
+def assert_valid_document(document: dict):
+    """Checks the Embedded Metric Format structure and the distribution of every metric of the document"""
+    directive = document["_aws"]["CloudWatchMetrics"][0]
+    assert isinstance(document["_aws"]["Timestamp"], int)
+    assert all(dimension in document for dimension in directive["Dimensions"][0])
+    for metric in directive["Metrics"]:
+        distribution = document[metric["Name"]]
+        assert set(distribution) == {"Values", "Counts", "Count", "Sum", "Min", "Max"}
+        assert 0 < len(distribution["Values"]) == len(distribution["Counts"]) <= 100
+        assert distribution["Count"] == sum(distribution["Counts"])
+        assert distribution["Sum"] == sum(v * c for v, c in zip(distribution["Values"], distribution["Counts"]))
+        assert distribution["Min"] == min(distribution["Values"])
+        assert distribution["Max"] == max(distribution["Values"])
+
+
+def test_disabled_recorder_is_noop(capsys):
+    """Tests that a disabled recorder returns the shared no-op span and writes nothing"""
+    recorder = SpanRecorder(enabled=False)
+
+    with recorder.span("iot.describe_thing") as span:
+        pass
+    recorder.flush()
+
+    assert span is NOOP_SPAN
+    assert capsys.readouterr().out == ""
+
+
+def test_spans_flushed_as_distributions(capsys):
+    """Tests that spans are written once per flush as Embedded Metric Format values and counts"""
+    recorder = SpanRecorder(enabled=True, resolution=1)
+
+    for duration_ms in (2.2, 1.8, 5.0):
+        recorder.record("register.register", duration_ms)
+    with recorder.span("iot.describe_thing"):
+        pass
+    recorder.flush()
+    recorder.flush()
+
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 1
+
+    document = json.loads(lines[0])
+    metrics = document["_aws"]["CloudWatchMetrics"][0]["Metrics"]
+    assert {metric["Name"] for metric in metrics} == {"register.register", "iot.describe_thing"}
+    assert_valid_document(document)
+    assert document["register.register"] == {
+        "Values": [2.0, 5.0],
+        "Counts": [2, 1],
+        "Count": 3,
+        "Sum": 9.0,
+        "Min": 2.0,
+        "Max": 5.0,
+    }
+
+
+def test_distributions_split_past_100_values(capsys):
+    """Tests that a metric with more than 100 distinct values is split across documents"""
+    emit_distributions({"register.register": list(range(250)) * 2, "iot.describe_thing": [1, 1, 3]})
+
+    documents = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert len(documents) == 3
+    for document in documents:
+        assert_valid_document(document)
+
+    assert [len(document["register.register"]["Values"]) for document in documents] == [100, 100, 50]
+    assert sum(document["register.register"]["Count"] for document in documents) == 500
+    assert ["iot.describe_thing" in document for document in documents] == [True, False, False]
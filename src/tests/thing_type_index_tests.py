@@ -0,0 +1,96 @@
+import threading
+
+from handlers.aws.iot import ThingHandler, ThingTypeIndex
+from tests.fakes import FakeAwsBackend
+
+
+def get_backend(thing_types: list) -> FakeAwsBackend:
+    backend = FakeAwsBackend()
+    for thing_type in thing_types:
+        backend.iot.create_thing_type(thingTypeName=thing_type)
+    backend.calls.clear()
+    return backend
+
+
+def test_index_lookups():
+    """Tests that prefix lookups are sorted and case insensitive, and substring lookups keep the catalog order"""
+    index = ThingTypeIndex()
+    index.load(["CvmGenericType", "cvmCamera", "SensorCvm", "Gateway"])
+
+    assert index.prefix("CVM") == ["cvmCamera", "CvmGenericType"]
+    assert index.prefix("missing") == []
+    assert index.contains("cvm") == ["CvmGenericType", "cvmCamera", "SensorCvm"]
+    assert index.contains("way") == ["Gateway"]
+
+
+def test_index_built_across_pages():
+    """Tests that the index lists every page of the catalog once and serves lookups from memory until the TTL"""
+    backend = get_backend([f"Type{number:03d}" for number in range(ThingTypeIndex.PAGE_SIZE + 10)])
+    index = ThingTypeIndex(ttl=300)
+
+    index.refresh(iot_client=backend.iot)
+    index.refresh(iot_client=backend.iot)
+
+    assert backend.calls["iot.list_thing_types"] == 2
+    assert len(index.prefix("Type")) == ThingTypeIndex.PAGE_SIZE + 10
+
+
+def test_forced_refresh_replaces_index():
+    """Tests that a forced refresh rebuilds the index and drops the memoized substring results"""
+    backend = get_backend(["CvmGenericType"])
+    index = ThingTypeIndex(ttl=300)
+    index.refresh(iot_client=backend.iot)
+    assert index.contains("camera") == []
+
+    backend.iot.create_thing_type(thingTypeName="CvmCameraType")
+    index.refresh(iot_client=backend.iot, force=True)
+
+    assert index.contains("camera") == ["CvmCameraType"]
+
+
+def test_memoized_results_belong_to_snapshot():
+    """Tests that a rebuild publishes a new snapshot and substring results memoized before it are not served"""
+    index = ThingTypeIndex()
+    index.load(["CvmGenericType"])
+    previous = index._snapshot
+    assert index.contains("cvm") == ["CvmGenericType"]
+
+    index.load(["CvmGenericType", "CvmCameraType"])
+
+    assert index.contains("cvm") == ["CvmGenericType", "CvmCameraType"]
+    assert previous.contains_results == {"cvm": ("CvmGenericType",)}
+    assert previous.sorted_names == ("CvmGenericType",)
+
+
+def test_lookups_during_rebuilds():
+    """Tests that lookups running while the index is rebuilt always answer from a single build"""
+    builds = [[f"TypeA{number}" for number in range(50)], [f"TypeB{number}" for number in range(80)]]
+    index = ThingTypeIndex()
+    index.load(builds[0])
+    stop = threading.Event()
+
+    def rebuild():
+        number = 0
+        while not stop.is_set():
+            number += 1
+            index.load(builds[number % 2])
+
+    thread = threading.Thread(target=rebuild)
+    thread.start()
+    try:
+        for _ in range(2000):
+            assert index.contains("type") in builds
+            assert index.prefix("Type") in [sorted(build, key=str.lower) for build in builds]
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_thing_handler_uses_index(fake_aws):
+    """Tests that thing type lookups of the handler do not call AWS IoT"""
+    handler = ThingHandler()
+    list_calls = fake_aws.calls["iot.list_thing_types"]
+
+    assert handler.get_thing_types_by_prefix("CvmGeneric") == ["CvmGenericType"]
+    assert handler.get_thing_types_by_prefix("Unknown") == []
+    assert fake_aws.calls["iot.list_thing_types"] == list_calls
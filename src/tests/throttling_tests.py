@@ -0,0 +1,111 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from handlers.aws.throttling import ApiRateLimiter, TokenBucket
+
+
+def client_error(code: str, operation: str = "CreateThing") -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": code}}, operation)
+
+
+def failing_call(*codes):
+    """
+    :return: Callable raising a ClientError for each code and then returning a response; List of received calls.
+    """
+    calls = list()
+    pending = list(codes)
+
+    def call(**kwargs):
+        calls.append(kwargs)
+        if pending:
+            raise client_error(pending.pop(0))
+        return {"thingName": kwargs.get("thingName")}
+
+    return call, calls
+
+
+class FakeClock:
+    """Replaces the time module of the rate limiter, sleeping advances the clock without waiting"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = list()
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr("handlers.aws.throttling.time", clock)
+    return clock
+
+
+def get_limiter(**kwargs) -> ApiRateLimiter:
+    options = dict(rates={}, default_rate=1000, max_attempts=3, base_delay=0.001, max_delay=0.002)
+    options.update(kwargs)
+    return ApiRateLimiter(service_name="iot", **options)
+
+
+def test_throttled_calls_are_retried(capsys, clock):
+    """Tests that a throttled call is retried with bounded jittered backoff, counted and slows down its API"""
+    limiter = get_limiter()
+    call, calls = failing_call("ThrottlingException", "ThrottlingException")
+
+    assert limiter.call("create_thing", call, thingName="thing-1") == {"thingName": "thing-1"}
+    assert len(calls) == 3
+    assert limiter.stats()["create_thing"] == dict(calls=1, throttles=2, retries=2, failures=0)
+    assert limiter.bucket("create_thing").rate < 1000
+    assert len([line for line in capsys.readouterr().out.splitlines() if '"ApiThrottle"' in line]) == 2
+    assert len(clock.sleeps) == 2
+    assert 0 <= clock.sleeps[0] <= 0.001 and 0 <= clock.sleeps[1] <= 0.002
+
+
+def test_errors_that_are_not_retried(clock):
+    """Tests that client errors, exhausted retries and server errors of non idempotent APIs are raised"""
+    limiter = get_limiter()
+
+    call, calls = failing_call("ResourceAlreadyExistsException")
+    with pytest.raises(ClientError):
+        limiter.call("create_thing", call, thingName="thing-1")
+    assert len(calls) == 1
+
+    call, calls = failing_call("InternalFailureException")
+    with pytest.raises(ClientError):
+        limiter.call("create_keys_and_certificate", call, setAsActive=True)
+    assert len(calls) == 1
+
+    call, calls = failing_call(*["TooManyRequestsException"] * 3)
+    with pytest.raises(ClientError):
+        limiter.call("describe_thing", call, thingName="thing-1")
+    assert len(calls) == 3
+    assert limiter.stats()["describe_thing"]["failures"] == 1
+
+
+def test_token_bucket_rate(clock):
+    """Tests that calls beyond the bucket capacity wait for the refill rate"""
+    bucket = TokenBucket(rate=100, burst=5)
+
+    for _ in range(15):
+        bucket.acquire()
+
+    assert len(clock.sleeps) == 10
+    assert sum(clock.sleeps) == pytest.approx(0.1)
+
+
+def test_token_bucket_rate_adapts(clock):
+    """Tests that throttles halve the refill rate down to the minimum and successful calls grow it back"""
+    bucket = TokenBucket(rate=20, burst=1, min_rate=4)
+
+    for _ in range(4):
+        bucket.penalize()
+    assert bucket.rate == 4
+
+    for _ in range(30):
+        bucket.reward()
+    assert bucket.rate == 20
@@ -0,0 +1,29 @@
+import time
+
+from handlers.authorization.tokens import HashedTokenStore
+
+
+def test_tokens_hashed_once_per_check(monkeypatch):
+    """Tests that a check hashes the received token once and plain tokens are not kept"""
+    store = HashedTokenStore(tokens=["token-1", {"token": "token-2", "quota": 1}])
+    digests = list()
+    digest = store.digest
+    monkeypatch.setattr(store, "digest", lambda token: digests.append(token) or digest(token))
+
+    assert store.check("token-1") == (True, False)
+    assert store.check("token-2") == (True, True)
+    assert store.check("unknown") == (False, False)
+    assert digests == ["token-1", "token-2", "unknown"]
+    assert "token-1" not in str(store._digests)
+
+
+def test_token_limits():
+    """Tests that expired tokens and exhausted quotas are rejected and reported as limited"""
+    store = HashedTokenStore(
+        tokens=[{"token": "expired", "expiresAt": time.time() - 1}, {"token": "quota", "quota": 2}, {"token": "plain"}]
+    )
+
+    assert store.check("expired") == (False, True)
+    assert [store.authorize("quota") for _ in range(3)] == [True, True, False]
+    assert store.check("plain") == (True, False)
+    assert len(store) == 3
@@ -0,0 +1,93 @@
+from marshmallow import Schema, ValidationError, fields, validate, validates, validates_schema
+
+from handlers.authorization.schemas import (
+    RegisterAwsIoTThingSchema,
+    RequestAwsIoTThingSchema,
+    RequestRegistrationAuthorizationSchema,
+)
+from handlers.authorization.validators import PrecompiledValidator, get_validator
+
+valid_authorization_request = {
+    "type": "TOKEN",
+    "methodArn": "arn:aws:execute-api:us-east-1:112646120612:n8il2c2eic/prod/POST/register",
+    "authorizationToken": "DeviceToken NjWO2tVh6fVAeNuLwRsPi-c6N7SP5-DT",
+}
+valid_registration_request = {"thingName": "thing-1", "accountToken": "token", "version": "1.0"}
+
+
+def test_same_result_as_marshmallow():
+    """Tests that the precompiled validators accept and reject the same payloads as the schemas"""
+    payloads = [
+        (RequestRegistrationAuthorizationSchema, valid_authorization_request),
+        (RequestRegistrationAuthorizationSchema, {"type": "TOKEN", "methodArn": "arn"}),
+        (RequestRegistrationAuthorizationSchema, dict(valid_authorization_request, extra="value")),
+        (RequestRegistrationAuthorizationSchema, dict(valid_authorization_request, type=1)),
+        (RequestAwsIoTThingSchema, valid_registration_request),
+        (RequestAwsIoTThingSchema, dict(valid_registration_request, csr="csr")),
+        (RequestAwsIoTThingSchema, dict(valid_registration_request, version=None)),
+        (RequestAwsIoTThingSchema, []),
+        (RegisterAwsIoTThingSchema, {"thingName": "thing-1", "thingTypeName": "type", "thingAttributes": {"a": "1"}}),
+        (RegisterAwsIoTThingSchema, {"thingName": "thing-1", "thingTypeName": "type", "thingAttributes": "a"}),
+    ]
+
+    for schema_class, payload in payloads:
+        assert get_validator(schema_class).validate(payload) == schema_class().validate(payload)
+
+    many = [valid_registration_request, dict(valid_registration_request, thingName=None)]
+    assert get_validator(RequestAwsIoTThingSchema).validate(many, many=True) == RequestAwsIoTThingSchema().validate(
+        many, many=True
+    )
+
+
+class ValidatedThingSchema(Schema):
+    thingName = fields.String(required=True, validate=validate.Length(max=8))
+    version = fields.String(required=True)
+
+
+class HookedThingSchema(Schema):
+    thingName = fields.String(required=True)
+    version = fields.String(required=True)
+
+    @validates("version")
+    def validate_version(self, value):
+        if not value[:1].isdigit():
+            raise ValidationError("Version must start with a digit")
+
+    @validates_schema
+    def validate_names(self, data, **kwargs):
+        if data["thingName"] == data["version"]:
+            raise ValidationError("Thing name and version must differ")
+
+
+def test_schemas_with_validators_use_marshmallow():
+    """Tests that field validators and schema hooks give the same result as marshmallow"""
+    payloads = [
+        (ValidatedThingSchema, {"thingName": "thing-1", "version": "1"}),
+        (ValidatedThingSchema, {"thingName": "thing-name-too-long", "version": "1"}),
+        (HookedThingSchema, {"thingName": "thing-1", "version": "1"}),
+        (HookedThingSchema, {"thingName": "thing-1", "version": "v1"}),
+        (HookedThingSchema, {"thingName": "1", "version": "1"}),
+    ]
+
+    for schema_class, payload in payloads:
+        assert PrecompiledValidator(schema_class).validate(payload) == schema_class().validate(payload)
+
+    assert PrecompiledValidator(ValidatedThingSchema).validate({"thingName": "thing-name-too-long", "version": "1"})
+    assert PrecompiledValidator(HookedThingSchema).validate({"thingName": "thing-1", "version": "v1"})
+
+
+def test_valid_payload_skips_marshmallow(monkeypatch):
+    """Tests that valid payloads are accepted without building or running the schema, invalid ones run it once"""
+    validator = PrecompiledValidator(RequestRegistrationAuthorizationSchema)
+    calls = list()
+    monkeypatch.setattr(
+        "handlers.authorization.validators.get_schema",
+        lambda schema_class: calls.append(schema_class) or schema_class(),
+    )
+
+    for _ in range(100):
+        assert validator.validate(valid_authorization_request) == {}
+    assert calls == []
+
+    assert validator.validate(dict(valid_authorization_request, type=1))
+    assert calls == [RequestRegistrationAuthorizationSchema]